@@ -0,0 +1,202 @@
+"""本地检索增强（RAG）
+
+把本地资料（Markdown / 文本）切分成块、批量向量化后写入内存映射的向量索引，
+智能体通过 ``retrieve_knowledge`` 工具检索相关片段，检索在本地完成，只需毫秒级，不需要额外的模型调用。
+
+- 切块：按段落和句末标点切分后合并到 RAGConfig.CHUNK_SIZE 左右，相邻块之间保留少量重叠；
+- 向量化：见 embedding.py，默认使用本地哈希向量；
+- 增量更新：按来源记录内容哈希，未变化的文档跳过，变化的文档先删除旧块再写入新块。
+
+用法：
+    python agent_rag.py ingest docs/ notes.md
+    python agent_rag.py search "人工智能对就业的影响"
+"""
+from agentscope.message import TextBlock
+from agentscope.tool import ToolResponse
+from embedding import get_embedder
+from settings import settings
+from vector_store import VectorStore
+
+import argparse, asyncio, hashlib, os, re, time
+
+
+class RAGConfig:
+    """检索增强配置"""
+
+    # 每块的目标字符数与相邻块的重叠字符数
+    CHUNK_SIZE = 400
+    CHUNK_OVERLAP = 60
+
+    # 单次向量化的最大块数
+    EMBED_BATCH = 64
+
+    # 默认返回的片段数
+    TOP_K = 4
+
+    # 低于该相似度的片段不返回
+    MIN_SCORE = 0.2
+
+    # 导入时识别的文件类型
+    EXTENSIONS = (".md", ".txt")
+
+
+def chunk_text(text: str, size: int = RAGConfig.CHUNK_SIZE, overlap: int = RAGConfig.CHUNK_OVERLAP) -> list[str]:
+    """按段落和句子切分文本并合并为长度接近 ``size`` 的块"""
+    # 在句末标点和换行之后切开，保留标点
+    pieces = [_.strip() for _ in re.split(r"(?<=[。！？!?；;\n])", text) if _.strip()]
+    chunks: list[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > size:
+            chunks.append(current)
+            current = current[-overlap:] if overlap else ""
+        # 单句过长时硬切，接在已缓冲的内容之后，保持原文顺序
+        while len(current) + len(piece) > size:
+            take = size - len(current)
+            chunks.append(current + piece[:take])
+            current = ""
+            piece = piece[max(take - overlap, 1):]
+        current += piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+class KnowledgeBase:
+    """本地知识库：切块、向量化、增量写入与 top-k 检索
+
+    Args:
+        name (``str``):
+            知识库名称，决定索引文件名
+    """
+
+    def __init__(self, name: str = "knowledge") -> None:
+        self.name = name
+        self._store: VectorStore | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            embedder = get_embedder()
+            # 不同向量化后端的向量不可比，分文件存放
+            path = (
+                os.path.join(settings.vector_dir, f"{self.name}.{embedder.backend}")
+                if settings.vector_dir else None
+            )
+            self._store = VectorStore(path, embedder.dim)
+        return self._store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def _indexed_hashes(self) -> dict[str, str]:
+        """来源 -> 当前已索引内容的哈希"""
+        return {_["source"]: _["doc_hash"] for _ in self.store.alive_records()}
+
+    async def add_documents(self, documents: dict[str, str]) -> int:
+        """增量导入文档，返回新写入的块数
+
+        Args:
+            documents (``dict[str, str]``):
+                来源（文件路径或标识）-> 文档内容
+        """
+        async with self._lock:
+            indexed = self._indexed_hashes()
+            records = []
+            for source, text in documents.items():
+                doc_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                if indexed.get(source) == doc_hash:
+                    continue
+                if source in indexed:
+                    self.store.remove(lambda _: _["source"] == source)
+                records += [
+                    {"source": source, "doc_hash": doc_hash, "chunk": i, "text": chunk, "created_at": time.time()}
+                    for i, chunk in enumerate(chunk_text(text))
+                ]
+
+            embedder = get_embedder()
+            for i in range(0, len(records), RAGConfig.EMBED_BATCH):
+                batch = records[i:i + RAGConfig.EMBED_BATCH]
+                self.store.add(await embedder.embed([_["text"] for _ in batch]), batch)
+            if len(self.store.records) > 2 * len(self.store):
+                self.store.compact()
+            return len(records)
+
+    async def add_paths(self, paths: list[str]) -> int:
+        """导入文件或目录（递归查找 RAGConfig.EXTENSIONS 中的文件）"""
+        documents = {}
+        for path in paths:
+            files = [path]
+            if os.path.isdir(path):
+                files = [
+                    os.path.join(root, name)
+                    for root, _, names in os.walk(path)
+                    for name in sorted(names)
+                    if name.endswith(RAGConfig.EXTENSIONS)
+                ]
+            for file in files:
+                with open(file, encoding="utf-8") as f:
+                    documents[os.path.abspath(file)] = f.read()
+        return await self.add_documents(documents)
+
+    async def search(self, query: str, top_k: int = RAGConfig.TOP_K) -> list[tuple[dict, float]]:
+        """检索与 ``query`` 最相关的片段"""
+        vector = (await get_embedder().embed([query]))[0]
+        return [
+            (record, score)
+            for record, score in self.store.search(vector, top_k)
+            if score >= RAGConfig.MIN_SCORE
+        ]
+
+
+knowledge_base = KnowledgeBase()
+
+
+async def retrieve_knowledge(query: str, top_k: int = RAGConfig.TOP_K) -> ToolResponse:
+    """从本地知识库中检索与问题相关的资料片段，可用于引用真实的数据、案例和事实
+
+    Args:
+        query (`str`):
+            要检索的问题或关键词
+        top_k (`int`):
+            返回的片段数
+    """
+    results = await knowledge_base.search(query, top_k)
+    if not results:
+        return ToolResponse(content=[TextBlock(type="text", text="知识库中没有找到相关资料。")])
+    text = "\n\n".join(
+        f"[{i + 1}] 来源：{os.path.basename(record['source'])}（相似度 {score:.2f}）\n{record['text']}"
+        for i, (record, score) in enumerate(results)
+    )
+    return ToolResponse(
+        content=[TextBlock(type="text", text=text)],
+        metadata={"sources": [record["source"] for record, _ in results]},
+    )
+
+
+async def _cli(args: argparse.Namespace) -> None:
+    if args.command == "ingest":
+        start = time.perf_counter()
+        added = await knowledge_base.add_paths(args.paths)
+        print(f"新增 {added} 个片段，知识库共 {len(knowledge_base)} 个片段，耗时 {time.perf_counter() - start:.2f}s")
+    else:
+        start = time.perf_counter()
+        res = await retrieve_knowledge(args.query, args.top_k)
+        print(res.content[0]["text"])
+        print(f"检索耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地知识库")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="导入文件或目录")
+    ingest.add_argument("paths", nargs="+")
+    search = sub.add_parser("search", help="检索")
+    search.add_argument("query")
+    search.add_argument("-k", "--top-k", type=int, default=RAGConfig.TOP_K)
+    asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""批量辩论评测
+
+从文件读取辩题（每行一个，或每行一个带 ``topic`` 字段的 JSON），在信号量控制下并发运行多场
+start_debate，并把每场的辩论结果、耗时和 token 用量逐行写入 JSONL 文件。
+重新运行时会跳过输出文件中已经成功完成的辩题，中断后可直接续跑。
+
+用法：
+    python batch_debate.py topics.txt -o results.jsonl -c 8 --rate-limit qwen-plus-latest=5
+"""
+from contextlib import redirect_stdout
+from model_pool import ModelRegistry, PoolConfig, track_usage
+from metrics import MetricsRegistry
+from workflow_debate import start_debate
+
+import argparse, asyncio, json, os, time
+
+
+def load_topics(path: str) -> list[str]:
+    """读取辩题列表，去重并保持原有顺序；无法解析或缺少 topic 的 JSON 行打印提示后跳过"""
+    topics = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or not str(record.get("topic") or "").strip():
+                    print(f"[批量辩论] 跳过 {path} 第 {lineno} 行：不是合法的 JSON 对象或缺少 topic")
+                    continue
+                line = str(record["topic"]).strip()
+            if line not in topics:
+                topics.append(line)
+    return topics
+
+
+def load_finished(path: str) -> set[str]:
+    """读取已成功完成的辩题，用于断点续跑"""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 进程崩溃时可能留下写了一半的行
+                continue
+            # 不完整的记录（非对象、缺辩题）视为未完成，续跑时重做
+            if isinstance(record, dict) and record.get("topic") and record.get("error") is None:
+                finished.add(record["topic"])
+    return finished
+
+
+async def run_one(topic: str, semaphore: asyncio.Semaphore, sink, lock: asyncio.Lock) -> bool:
+    """运行一场辩论并写入结果，返回是否成功"""
+    async with semaphore:
+        record: dict = {"topic": topic}
+        start = time.perf_counter()
+        with track_usage() as usage:
+            try:
+                res = await start_debate(topic)
+                record["result"] = res.metadata or {
+                    "text": "".join(_["text"] for _ in res.content if _["type"] == "text")
+                }
+                record["error"] = None
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+        record["elapsed"] = round(time.perf_counter() - start, 3)
+        record["usage"] = usage
+
+    async with lock:
+        sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sink.flush()
+    return record["error"] is None
+
+
+async def run_batch(
+    topics_path: str,
+    output_path: str,
+    concurrency: int = 4,
+    verbose: bool = False,
+) -> None:
+    """批量运行辩论
+
+    Args:
+        topics_path (``str``):
+            辩题文件路径
+        output_path (``str``):
+            JSONL 结果文件路径，已存在时追加写入并跳过已完成的辩题
+        concurrency (``int``):
+            同时进行的辩论场数
+        verbose (``bool``):
+            是否保留各智能体的控制台输出
+    """
+    MetricsRegistry.install()
+    topics = load_topics(topics_path)
+    finished = load_finished(output_path)
+    pending = [_ for _ in topics if _ not in finished]
+    print(f"共 {len(topics)} 个辩题，已完成 {len(topics) - len(pending)} 个，本次运行 {len(pending)} 个")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    lock = asyncio.Lock()
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as sink:
+        if verbose:
+            results = await asyncio.gather(*[run_one(_, semaphore, sink, lock) for _ in pending])
+        else:
+            # 并发辩论的流式输出交错在一起没有意义，这里直接丢弃
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                results = await asyncio.gather(*[run_one(_, semaphore, sink, lock) for _ in pending])
+
+    print(
+        f"完成 {sum(results)} 个，失败 {len(results) - sum(results)} 个，"
+        f"耗时 {time.perf_counter() - start:.1f}s，模型池：{ModelRegistry.stats()}"
+    )
+    MetricsRegistry.report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量运行辩论评测")
+    parser.add_argument("topics", help="辩题文件，每行一个辩题或一个带 topic 字段的 JSON")
+    parser.add_argument("-o", "--output", default="debate_results.jsonl", help="JSONL 结果文件")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="同时进行的辩论场数")
+    parser.add_argument(
+        "--rate-limit",
+        action="append",
+        default=[],
+        metavar="MODEL=RPS",
+        help="按模型限制每秒请求数，可重复指定",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="保留智能体的控制台输出")
+    args = parser.parse_args()
+
+    for item in args.rate_limit:
+        model_name, rate = item.split("=", 1)
+        PoolConfig.RATE_LIMITS[model_name] = float(rate)
+
+    asyncio.run(run_batch(args.topics, args.output, args.concurrency, args.verbose))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""辩论与旅游计划工作流的端到端基准测试
+
+在本地替身服务（mock_server.py）上运行 start_debate 和 generate_travel_plan，统计：
+
+- 各阶段的墙钟耗时（立场提取、教练建议、立论、攻辩、自由辩论、总结陈词、评委评分；旅游计划按 SubTask）
+- 模型调用次数与 token 用量
+- 事件循环延迟，以及截至该次运行结束时整个基准进程的峰值 RSS（ru_maxrss 是进程生命周期内的峰值，
+  同一进程中先后运行的多个配置会继承之前的峰值，不能当作单次运行的内存占用比较）
+
+结果保存为 JSON（附带当前 git 提交号），便于跨提交比较。``--sweep`` 会对
+DebateConfig.DEBATE_ROUNDS 与并发场数做扫描。``--free-debate`` 在较多的自由辩论轮数下对比
+滚动上下文开启与关闭时每一轮的耗时和每次调用的输入 token 数。``--compare-routing`` 对比
+所有角色使用原来的固定模型与按角色、环节路由时各路由的耗时和估算花费。``--startup`` 只测量 main.py 的冷启动耗时
+（新进程导入并创建好小元、可以接收第一条输入为止）。
+
+用法：
+    python benchmark.py --sessions 4 --rounds 4
+    python benchmark.py --sweep --output-dir bench_results
+    python benchmark.py --startup 10
+    python benchmark.py --compare-structured
+    python benchmark.py --free-debate --prefill-rate 2000
+    python benchmark.py --compare-routing
+"""
+from contextlib import redirect_stdout
+from mock_server import MockConfig, mock_env, run_mock_servers
+
+import argparse, asyncio, json, os, resource, statistics, subprocess, sys, time
+
+# 配置在首次访问时读取环境变量并缓存，必须先指向替身服务再导入
+os.environ.update(mock_env())
+# 断点写盘会计入耗时，基准测试中显式关闭断点续跑
+os.environ["CHECKPOINT_DIR"] = ""
+# 语义缓存只放在内存中，避免受上次运行影响
+os.environ["VECTOR_DIR"] = ""
+
+from metrics import MetricsRegistry
+from model_pool import track_usage
+from model_router import route_summary
+from workflow_debate import DebateConfig, debate_router, start_debate
+from mcp_gaode import close_gaode_pool, generate_travel_plan
+
+
+class BenchConfig:
+    """基准测试配置"""
+
+    TOPIC = "人工智能的发展利大于弊"
+    TRAVEL_QUERY = "五一假期从上海去杭州玩三天，两个人，预算中等"
+
+    # 旅游计划模拟完成的 SubTask 个数（与 generate_travel_plan 中的计划一致）
+    TRAVEL_SUBTASKS = 7
+
+    # 扫描参数
+    SWEEP_ROUNDS = [1, 2, 4, 8]
+    SWEEP_SESSIONS = [1, 4, 16]
+
+    # 自由辩论逐轮对比的轮数
+    FREE_ROUNDS = 12
+
+    # 路由对比的基线：各角色使用原来的固定模型，不限制输出长度
+    BASELINE_ROUTES = {
+        "host": {"model": "qwen-plus", "enable_thinking": False},
+        "teacher": {"model": "qwen-plus", "enable_thinking": True},
+        "debater": {"model": "qwen-plus-latest", "enable_thinking": False},
+        "judge": {"model": "qwen-plus-latest", "enable_thinking": True},
+        "summary": {"model": "qwen-turbo", "enable_thinking": False},
+    }
+
+    # 事件循环延迟采样间隔（秒）
+    LAG_INTERVAL = 0.01
+
+
+class LoopLagMonitor:
+    """周期性睡眠并记录实际唤醒的延迟，衡量事件循环是否被阻塞"""
+
+    def __init__(self, interval: float = BenchConfig.LAG_INTERVAL) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def __enter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *args) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+
+def _process_peak_rss_mb() -> float:
+    # 整个进程迄今为止的峰值；Linux 下 ru_maxrss 的单位是 KB，macOS 下是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _phase_summary(snapshot: dict) -> dict:
+    """把 phase_seconds 整理为 {阶段: {次数, 平均耗时, 最大耗时}}"""
+    result = {}
+    for label, stat in snapshot.get("phase_seconds", {}).items():
+        name = label.split("=", 1)[1]
+        result[name] = {
+            "count": stat["count"],
+            "mean_s": round(stat["total"] / stat["count"], 4),
+            "max_s": stat["max"],
+        }
+    return result
+
+
+def _phase_input_tokens(snapshot: dict) -> dict:
+    """各阶段、各模型每次调用的平均输入 token 数：{阶段: {模型: token 数}}"""
+    result: dict[str, dict[str, int]] = {}
+    for label, stat in snapshot.get("model_input_tokens", {}).items():
+        labels = dict(_.split("=", 1) for _ in label.split(","))
+        if stat["count"]:
+            result.setdefault(labels["phase"], {})[labels["model"]] = round(stat["total"] / stat["count"])
+    return result
+
+
+async def _run_sessions(workflow, sessions: int) -> dict:
+    """并发运行 ``sessions`` 个工作流实例并汇总指标"""
+    MetricsRegistry.reset()
+    with LoopLagMonitor() as lag, track_usage() as usage:
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            results = await asyncio.gather(
+                *[workflow() for _ in range(sessions)], return_exceptions=True
+            )
+        elapsed = time.perf_counter() - start
+
+    errors = [f"{type(_).__name__}: {_}" for _ in results if isinstance(_, BaseException)]
+    routes = route_summary(MetricsRegistry.snapshot())
+    return {
+        "sessions": sessions,
+        "wall_s": round(elapsed, 4),
+        "errors": errors,
+        "model_calls": usage["calls"],
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "phases": _phase_summary(MetricsRegistry.snapshot()),
+        "phase_input_tokens": _phase_input_tokens(MetricsRegistry.snapshot()),
+        "routes": routes,
+        "cost_yuan": round(sum(_.get("cost_yuan", 0.0) for r in routes.values() for _ in r.values()), 6),
+        "event_loop_lag": lag.summary(),
+        "process_peak_rss_mb": _process_peak_rss_mb(),
+    }
+
+
+async def bench_debate(rounds: int, sessions: int) -> dict:
+    DebateConfig.DEBATE_ROUNDS = rounds
+    res = await _run_sessions(lambda: start_debate(BenchConfig.TOPIC), sessions)
+    return {
+        "workflow": "debate",
+        "rounds": rounds,
+        "structured_fast_path": DebateConfig.STRUCTURED_FAST_PATH,
+        "structured_fast_path_judge": DebateConfig.STRUCTURED_FAST_PATH_JUDGE,
+        **res,
+    }
+
+
+async def bench_free_debate(rounds: int, sessions: int) -> list[dict]:
+    """对比滚动上下文开启与关闭时自由辩论每一轮的耗时和输入 token 数"""
+    runs = []
+    for rolling in [False, True]:
+        DebateConfig.ROLLING_CONTEXT = rolling
+        res = await bench_debate(rounds, sessions)
+        per_round = [
+            {
+                "round": i + 1,
+                "mean_s": res["phases"].get(f"自由辩论第{i + 1}轮", {}).get("mean_s", 0.0),
+                # 只看辩手的调用，不含后台摘要
+                "input_tokens_per_call": res["phase_input_tokens"]
+                .get(f"自由辩论第{i + 1}轮", {})
+                .get(DebateConfig.DEBATER_MODEL, 0),
+            }
+            for i in range(rounds)
+        ]
+        runs.append({**res, "rolling_context": rolling, "free_rounds": per_round})
+    return runs
+
+
+async def bench_travel(sessions: int) -> dict:
+    res = await _run_sessions(lambda: generate_travel_plan(BenchConfig.TRAVEL_QUERY), sessions)
+    return {"workflow": "travel_plan", **res}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    MockConfig.LATENCY = args.latency
+    MockConfig.TOKEN_RATE = args.token_rate
+    MockConfig.PREFILL_RATE = args.prefill_rate
+    MockConfig.PLAN_SUBTASKS = BenchConfig.TRAVEL_SUBTASKS
+    # 旅游计划智能体完成全部 SubTask 后输出结束标记，避免等待用户输入
+    MockConfig.SCRIPT = [
+        {"match": "你是高德地图智能助手", "reply": "旅游计划已保存。Travel plan generation done!"}
+    ]
+    # 重复的辩题会命中准备阶段语义缓存，默认关闭以保证各次运行可比
+    DebateConfig.SEMANTIC_CACHE = args.semantic_cache
+    MetricsRegistry.install()
+
+    runs = []
+    async with run_mock_servers():
+        if args.sweep:
+            for rounds in BenchConfig.SWEEP_ROUNDS:
+                for sessions in BenchConfig.SWEEP_SESSIONS:
+                    runs.append(await bench_debate(rounds, sessions))
+            for sessions in BenchConfig.SWEEP_SESSIONS:
+                runs.append(await bench_travel(sessions))
+        elif args.free_debate:
+            runs += await bench_free_debate(BenchConfig.FREE_ROUNDS, args.sessions)
+        elif args.compare_routing:
+            for name, routes in [("baseline", BenchConfig.BASELINE_ROUTES), ("routed", DebateConfig.ROUTES)]:
+                debate_router.set_routes(routes)
+                runs.append({**await bench_debate(args.rounds, args.sessions), "routing": name})
+        elif args.compare_structured:
+            # 对比结构化快速通道与 ReAct 路径（看立场提取、教练建议、评委评分三个阶段，评委也走快速通道）
+            for fast_path in [False, True]:
+                DebateConfig.STRUCTURED_FAST_PATH = fast_path
+                DebateConfig.STRUCTURED_FAST_PATH_JUDGE = fast_path
+                runs.append(await bench_debate(args.rounds, args.sessions))
+        else:
+            runs.append(await bench_debate(args.rounds, args.sessions))
+            runs.append(await bench_travel(args.sessions))
+        await close_gaode_pool()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mock": {
+            "latency": MockConfig.LATENCY,
+            "token_rate": MockConfig.TOKEN_RATE,
+            "prefill_rate": MockConfig.PREFILL_RATE,
+        },
+        "runs": runs,
+    }
+
+
+def bench_startup(repeat: int) -> dict:
+    """在新进程中导入 main 并创建小元，统计冷启动耗时"""
+    code = "import main; main.build_agent()"
+    # 跳过 Studio 连接，避免把连接超时计入启动耗时
+    env = {**os.environ, "AGENTSCOPE_STUDIO_URL": ""}
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+        samples.append(time.perf_counter() - start)
+    return {
+        "workflow": "startup",
+        "repeat": repeat,
+        "mean_s": round(statistics.mean(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="辩论与旅游计划工作流基准测试")
+    parser.add_argument("--rounds", type=int, default=DebateConfig.DEBATE_ROUNDS, help="自由辩论轮数")
+    parser.add_argument("--sessions", type=int, default=1, help="并发场数")
+    parser.add_argument("--sweep", action="store_true", help="扫描辩论轮数与并发场数")
+    parser.add_argument("--latency", type=float, default=0.05, help="替身服务首包延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=0, help="替身服务流式速率，0 表示不限速")
+    parser.add_argument("--prefill-rate", type=float, default=0, help="替身服务输入处理速率（token/秒），0 表示不模拟")
+    parser.add_argument("--free-debate", action="store_true", help="逐轮对比自由辩论滚动上下文开启与关闭")
+    parser.add_argument("--compare-routing", action="store_true", help="对比固定模型与按角色、环节路由")
+    parser.add_argument("--compare-structured", action="store_true", help="对比结构化快速通道与 ReAct 路径")
+    parser.add_argument("--semantic-cache", action="store_true", help="启用辩论准备阶段的语义缓存")
+    parser.add_argument("--startup", type=int, default=0, metavar="N", help="只测量 N 次冷启动耗时")
+    parser.add_argument("--output-dir", default="bench_results", help="结果保存目录")
+    args = parser.parse_args()
+
+    if args.startup:
+        result = bench_startup(args.startup)
+        print(
+            f"startup      repeat={result['repeat']} mean={result['mean_s']:.3f}s "
+            f"min={result['min_s']:.3f}s max={result['max_s']:.3f}s"
+        )
+        return
+
+    report = asyncio.run(run(args))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{report['commit']}_{int(time.time())}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for r in report["runs"]:
+        print(
+            f"{r['workflow']:<12} rounds={r.get('rounds', '-'):<3} sessions={r['sessions']:<3} "
+            f"wall={r['wall_s']:.2f}s calls={r['model_calls']} tokens={r['input_tokens']}+{r['output_tokens']} "
+            f"lag_p99={r['event_loop_lag']['p99_ms']}ms process_rss={r['process_peak_rss_mb']}MB errors={len(r['errors'])}"
+        )
+    for r in report["runs"]:
+        if not r.get("routes"):
+            continue
+        print(f"{r['workflow']} {r.get('routing', '')} 估算花费 {r['cost_yuan']:.4f} 元：")
+        for route, models in sorted(r["routes"].items()):
+            for model, stat in models.items():
+                print(
+                    f"  {route:<24} {model:<18} calls={stat.get('calls', 0):<4} "
+                    f"mean={stat.get('mean_s', 0.0):.3f}s cost={stat.get('cost_yuan', 0.0):.4f} "
+                    f"fallbacks={stat.get('fallbacks', 0)}"
+                )
+    for r in report["runs"]:
+        if "free_rounds" not in r:
+            continue
+        print(f"自由辩论逐轮（滚动上下文{'开启' if r['rolling_context'] else '关闭'}）：")
+        for _ in r["free_rounds"]:
+            print(f"  第{_['round']:>2}轮 {_['mean_s']:.3f}s 输入 {_['input_tokens_per_call']} token/次")
+    print(f"结果已保存到 {path}")
+
+
+if __name__ == "__main__":
+    main()
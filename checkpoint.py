@@ -0,0 +1,126 @@
+"""工作流断点续跑
+
+辩论和旅游计划都要串行调用几十次模型，任何一步失败都会让前面的调用白白浪费。
+这里在每个环节（SubTask）完成后把智能体记忆、工作流的中间结果写入本地 JSON 文件，正常结束后删除断点。
+
+断点按运行编号存放：每次新的运行生成自己的编号，并发运行相同辩题 / 需求时互不干扰；
+只有显式传入上次的运行编号才会续跑，且断点中记录的辩题 / 需求必须一致、未超过有效期。
+
+断点目录由 ``CHECKPOINT_DIR`` 指定，默认不设置，即关闭断点续跑。
+"""
+from typing import Any
+from agentscope.agent import ReActAgent
+from agentscope.message import Msg
+from settings import settings
+
+import json, os, re, tempfile, time, uuid
+
+
+class CheckpointConfig:
+    """断点配置"""
+
+    # 断点有效期（秒），超过后不再续跑
+    TTL = 24 * 3600
+
+
+class Checkpoint:
+    """一次工作流运行的断点
+
+    Args:
+        kind (``str``):
+            工作流类型，作为子目录名，如 "debate"
+        key (``str``):
+            本次运行的内容（辩题、旅行需求），续跑时必须与断点中记录的一致
+        run_id (``str | None``):
+            运行编号，传入上次运行的编号即从其断点继续；为空时生成新的编号（未启用断点时为空）
+        ttl (``float``):
+            断点有效期（秒）
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        key: str,
+        run_id: str | None = None,
+        ttl: float = CheckpointConfig.TTL,
+    ) -> None:
+        self.key = key
+        self.ttl = ttl
+        self.run_id: str | None = None
+        self.path: str | None = None
+        if settings.checkpoint_dir:
+            # 编号只保留安全字符，不能跳出断点目录
+            self.run_id = re.sub(r"[^0-9A-Za-z_-]", "_", run_id) if run_id else uuid.uuid4().hex[:12]
+            self.path = os.path.join(settings.checkpoint_dir, kind, f"{self.run_id}.json")
+        self.state: dict[str, Any] = self._load()
+
+    def _load(self) -> dict[str, Any]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # 内容不一致或已过期的断点不续跑
+        if state.get("key") != self.key or time.time() - state.get("updated_at", 0) > self.ttl:
+            return {}
+        return state
+
+    @property
+    def resumed(self) -> bool:
+        """是否从已有断点恢复"""
+        return bool(self.state.get("completed"))
+
+    def done(self, phase: str) -> bool:
+        """环节是否已在之前的运行中完成"""
+        return phase in self.state.get("completed", [])
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.state.get(name, default)
+
+    def save(self, phase: str | None = None, **values: Any) -> None:
+        """记录完成的环节及其状态，并立即写入磁盘"""
+        self.state.update(values)
+        if phase is not None and not self.done(phase):
+            self.state.setdefault("completed", []).append(phase)
+        if not self.path:
+            return
+        self.state["key"] = self.key
+        self.state["updated_at"] = time.time()
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def clear(self) -> None:
+        """工作流正常结束后删除断点"""
+        self.state = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def memory_states(agents: dict[str, ReActAgent]) -> dict[str, dict]:
+    """导出各智能体的短期记忆"""
+    return {name: agent.memory.state_dict() for name, agent in agents.items()}
+
+
+def load_memory_states(agents: dict[str, ReActAgent], states: dict[str, dict]) -> None:
+    """把 memory_states 导出的记忆恢复到对应的智能体"""
+    for name, agent in agents.items():
+        if name in states:
+            agent.memory.load_state_dict(states[name])
+
+
+def dump_msg(msg: Msg | None) -> dict | None:
+    return None if msg is None else msg.to_dict()
+
+
+def load_msg(data: dict | None) -> Msg | None:
+    return None if data is None else Msg.from_dict(data)
@@ -0,0 +1,85 @@
+"""文本向量化
+
+语义缓存、检索增强和长期记忆共用的向量化入口。默认使用本地的字符 n-gram 哈希向量：
+不需要网络、毫秒级，对中文近似重复文本（同一辩题的不同说法、同一段资料）足够区分；
+设置 ``EMBEDDING_BACKEND=dashscope`` 后改用 DashScope 的文本向量模型，按批调用。
+所有向量都做 L2 归一化，内积即余弦相似度。
+"""
+import numpy as np
+import zlib
+
+from settings import settings
+
+
+class EmbeddingConfig:
+    """向量化配置"""
+
+    # 本地哈希向量的维度和 n-gram 长度
+    LOCAL_DIM = 512
+    LOCAL_NGRAMS = (1, 2, 3)
+
+    # DashScope 向量模型及其维度、单次请求的最大文本数
+    DASHSCOPE_MODEL = "text-embedding-v4"
+    DASHSCOPE_DIM = 1024
+    BATCH_SIZE = 10
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _local_embed(texts: list[str]) -> np.ndarray:
+    vectors = np.zeros((len(texts), EmbeddingConfig.LOCAL_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        text = "".join(text.split()).lower()
+        for n in EmbeddingConfig.LOCAL_NGRAMS:
+            for i in range(len(text) - n + 1):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                # 用哈希的最高位决定符号，减小哈希冲突带来的偏差
+                vectors[row, h % EmbeddingConfig.LOCAL_DIM] += 1.0 if h >> 31 else -1.0
+    return _normalize(vectors)
+
+
+class Embedder:
+    """文本向量化器，按配置选择本地哈希向量或 DashScope 向量模型"""
+
+    def __init__(self, backend: str = "local") -> None:
+        self.backend = backend
+        self._model = None
+
+    @property
+    def dim(self) -> int:
+        return EmbeddingConfig.DASHSCOPE_DIM if self.backend == "dashscope" else EmbeddingConfig.LOCAL_DIM
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """返回形状为 (len(texts), dim) 的归一化向量"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self.backend != "dashscope":
+            return _local_embed(texts)
+
+        if self._model is None:
+            from agentscope.embedding import DashScopeTextEmbedding
+
+            self._model = DashScopeTextEmbedding(
+                api_key=settings.dashscope_api_key,
+                model_name=EmbeddingConfig.DASHSCOPE_MODEL,
+            )
+        batches = []
+        for i in range(0, len(texts), EmbeddingConfig.BATCH_SIZE):
+            res = await self._model(texts[i:i + EmbeddingConfig.BATCH_SIZE])
+            batches.append(np.asarray(res.embeddings, dtype=np.float32))
+        return _normalize(np.concatenate(batches))
+
+
+_embedder: Embedder | None = None
+
+
+def get_embedder() -> Embedder:
+    """获取进程内共享的向量化器"""
+    global _embedder
+    if _embedder is None:
+        _embedder = Embedder(settings.embedding_backend)
+    return _embedder
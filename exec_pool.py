@@ -0,0 +1,362 @@
+"""代码执行工作进程池
+
+agentscope 自带的 execute_python_code / execute_shell_command 每次调用都启动一个新的解释器或 shell，
+多个会话并发时既慢又没有上限。这里提供同名的替代工具：
+
+- Python 代码交给一组常驻工作进程执行（启动时调用 ``python_pool.preload()`` 在后台预热），
+  池的大小就是并发上限；
+  超时的工作进程会被杀掉并替换，执行一定次数后自动回收，避免状态在调用之间累积；
+- shell 命令仍然每次启动子进程，但受信号量限制并发，超时后杀掉整个进程组；
+- 两者都截断过长的输出，子进程的环境变量中去掉了 API 密钥，并限制了内存和写文件大小；
+- 保存文本文件（如 travel_plan.md）直接在本进程内完成，不再需要启动子进程。
+"""
+from agentscope.message import TextBlock
+from agentscope.tool import ToolResponse
+
+import asyncio, json, os, signal, sys
+
+
+class ExecConfig:
+    """执行池配置"""
+
+    # 常驻 Python 工作进程数，即 Python 代码的最大并发数
+    PYTHON_WORKERS = 4
+
+    # 单个工作进程最多执行的次数，超过后替换为新进程
+    MAX_TASKS_PER_WORKER = 50
+
+    # shell 命令的最大并发数
+    MAX_SHELL_CONCURRENCY = 4
+
+    # 默认超时（秒）
+    TIMEOUT = 300
+
+    # 等待空闲 Python 工作进程的最长时间（秒）
+    ACQUIRE_TIMEOUT = 60
+
+    # stdout / stderr 各自保留的最大字符数
+    MAX_OUTPUT_CHARS = 32 * 1024
+
+    # 子进程资源限制（字节），仅在支持 resource 模块的平台生效
+    MEMORY_LIMIT = 2 * 1024 ** 3
+    FILE_SIZE_LIMIT = 256 * 1024 ** 2
+
+    # 不传给子进程的环境变量
+    HIDDEN_ENV = ["DASHSCOPE_API_KEY", "AMAP_MAPS_API_KEY"]
+
+
+# 工作进程主循环：每行一个 JSON 请求，执行期间把 fd 1/2 重定向到临时文件，
+# 这样代码里启动的子进程输出也能被捕获，协议本身走 dup 出来的原始 stdin / stdout；
+# 用户代码的 stdin 指向 /dev/null，input() 不会读走协议数据
+_WORKER_SOURCE = r"""
+import json, os, sys, tempfile, traceback
+
+requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+channel = os.fdopen(os.dup(1), "w", encoding="utf-8")
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+os.close(devnull)
+sys.stdin = open(os.devnull, encoding="utf-8")
+for line in requests:
+    req = json.loads(line)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        saved = os.dup(1), os.dup(2)
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        returncode = 0
+        try:
+            exec(compile(req["code"], "<code>", "exec"), {"__name__": "__main__"})
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+        res = {"returncode": returncode}
+        for name, f in [("stdout", out), ("stderr", err)]:
+            f.seek(0)
+            data = f.read(req["limit"] * 4 + 1).decode("utf-8", errors="replace")
+            res[name] = data[: req["limit"]]
+            res[name + "_truncated"] = len(data) > req["limit"]
+    # 不转义非 ASCII 字符，响应行长度不超过 UTF-8 编码后的输出长度
+    channel.write(json.dumps(res, ensure_ascii=False) + "\n")
+    channel.flush()
+"""
+
+
+def _child_env() -> dict[str, str]:
+    return {k: v for k, v in os.environ.items() if k not in ExecConfig.HIDDEN_ENV}
+
+
+def _limit_resources() -> None:
+    """在子进程中设置资源上限"""
+    try:
+        import resource
+    except ImportError:
+        return
+    for limit, value in [
+        (resource.RLIMIT_AS, ExecConfig.MEMORY_LIMIT),
+        (resource.RLIMIT_FSIZE, ExecConfig.FILE_SIZE_LIMIT),
+    ]:
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def _format_result(returncode: int, stdout: str, stderr: str) -> ToolResponse:
+    # 与 agentscope 内置工具的返回格式保持一致
+    return ToolResponse(
+        content=[
+            TextBlock(
+                type="text",
+                text=f"<returncode>{returncode}</returncode>"
+                f"<stdout>{stdout}</stdout>"
+                f"<stderr>{stderr}</stderr>",
+            ),
+        ],
+    )
+
+
+def _truncate(text: str, truncated: bool = False) -> str:
+    if len(text) > ExecConfig.MAX_OUTPUT_CHARS:
+        text, truncated = text[: ExecConfig.MAX_OUTPUT_CHARS], True
+    return text + "\n...[输出过长，已截断]" if truncated else text
+
+
+class _PythonWorker:
+    """一个常驻的 Python 工作进程"""
+
+    def __init__(self) -> None:
+        self.process: asyncio.subprocess.Process | None = None
+        self.tasks = 0
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-I", "-u", "-c", _WORKER_SOURCE,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=_child_env(),
+            preexec_fn=_limit_resources if os.name == "posix" else None,
+            # 单行响应包含两段截断后的输出，每个字符的 UTF-8 编码最多 4 字节
+            limit=ExecConfig.MAX_OUTPUT_CHARS * 16,
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def run(self, code: str, timeout: float) -> dict:
+        assert self.process is not None and self.process.stdin and self.process.stdout
+        self.tasks += 1
+        request = json.dumps({"code": code, "limit": ExecConfig.MAX_OUTPUT_CHARS})
+        self.process.stdin.write(request.encode("utf-8") + b"\n")
+        await self.process.stdin.drain()
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        if not line:
+            raise RuntimeError("Python 工作进程意外退出")
+        return json.loads(line)
+
+    async def stop(self) -> None:
+        if self.alive:
+            self.process.kill()  # type: ignore[union-attr]
+            await self.process.wait()  # type: ignore[union-attr]
+
+
+class PythonWorkerPool:
+    """预热的 Python 工作进程池
+
+    Args:
+        size (``int``):
+            工作进程数
+    """
+
+    def __init__(self, size: int = ExecConfig.PYTHON_WORKERS) -> None:
+        self.size = size
+        self._idle: asyncio.Queue[_PythonWorker] = asyncio.Queue()
+        # 启动失败、尚未补上的工作进程数，下次执行代码时再启动
+        self._missing = 0
+        self._lock = asyncio.Lock()
+        self._started = False
+        self._preload: asyncio.Task | None = None
+
+    async def _spawn(self) -> _PythonWorker:
+        worker = _PythonWorker()
+        await worker.start()
+        return worker
+
+    async def start(self) -> None:
+        """启动全部工作进程，重复调用无副作用"""
+        if self._started:
+            return
+        async with self._lock:
+            if self._started:
+                return
+            workers = await asyncio.gather(*[self._spawn() for _ in range(self.size)], return_exceptions=True)
+            for worker in workers:
+                if isinstance(worker, _PythonWorker):
+                    self._idle.put_nowait(worker)
+                elif isinstance(worker, Exception):
+                    self._missing += 1
+                else:
+                    raise worker
+            self._started = True
+
+    def preload(self) -> None:
+        """在后台启动工作进程（需在事件循环中调用），不等待；失败时第一次执行代码时会重试"""
+        if self._started or self._preload is not None:
+            return
+        self._preload = asyncio.create_task(self.start())
+        # 取走异常，避免 "exception was never retrieved"
+        self._preload.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def close(self) -> None:
+        if self._preload is not None:
+            if not self._preload.done():
+                self._preload.cancel()
+            await asyncio.gather(self._preload, return_exceptions=True)
+            self._preload = None
+        while not self._idle.empty():
+            await self._idle.get_nowait().stop()
+        self._missing = 0
+        self._started = False
+
+    async def _acquire(self) -> _PythonWorker:
+        """取一个空闲的工作进程，缺少进程时就地补上，所有进程都忙时最多等待 ACQUIRE_TIMEOUT 秒"""
+        if self._idle.empty() and self._missing:
+            self._missing -= 1
+            try:
+                return await self._spawn()
+            except BaseException:
+                self._missing += 1
+                raise
+        try:
+            return await asyncio.wait_for(self._idle.get(), ExecConfig.ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"等待空闲的 Python 工作进程超过 {ExecConfig.ACQUIRE_TIMEOUT} 秒") from None
+
+    async def run(self, code: str, timeout: float = ExecConfig.TIMEOUT) -> dict:
+        """在空闲的工作进程中执行代码，所有进程都忙时排队等待"""
+        await self.start()
+        worker = await self._acquire()
+        healthy = False
+        try:
+            result = await worker.run(code, timeout)
+            healthy = worker.alive and worker.tasks < ExecConfig.MAX_TASKS_PER_WORKER
+            return result
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                # 超时、崩溃或到达执行次数上限：换一个新进程；启动失败时记下缺口，不影响本次的结果
+                await worker.stop()
+                try:
+                    self._idle.put_nowait(await self._spawn())
+                except Exception:
+                    self._missing += 1
+
+
+python_pool = PythonWorkerPool()
+_shell_semaphore: asyncio.Semaphore | None = None
+
+
+async def execute_python_code(code: str, timeout: float = ExecConfig.TIMEOUT) -> ToolResponse:
+    """执行给定的 Python 代码并返回 returncode、stdout 和 stderr。需要看到结果时必须用 print 输出。
+
+    Args:
+        code (`str`):
+            要执行的 Python 代码
+        timeout (`float`):
+            最长执行时间（秒）
+    """
+    try:
+        res = await python_pool.run(code, timeout)
+    except asyncio.TimeoutError:
+        return _format_result(-1, "", f"TimeoutError: 代码执行超过 {timeout} 秒，已终止")
+    except (ValueError, RuntimeError, OSError) as e:
+        # 响应行超长、工作进程崩溃等，工作进程已被替换
+        return _format_result(-1, "", f"{type(e).__name__}: 工作进程执行失败：{e}")
+    return _format_result(
+        res["returncode"],
+        _truncate(res["stdout"], res["stdout_truncated"]),
+        _truncate(res["stderr"], res["stderr_truncated"]),
+    )
+
+
+async def execute_shell_command(command: str, timeout: float = ExecConfig.TIMEOUT) -> ToolResponse:
+    """执行给定的 shell 命令并返回 returncode、stdout 和 stderr
+
+    Args:
+        command (`str`):
+            要执行的 shell 命令
+        timeout (`float`):
+            最长执行时间（秒）
+    """
+    global _shell_semaphore
+    if _shell_semaphore is None:
+        _shell_semaphore = asyncio.Semaphore(ExecConfig.MAX_SHELL_CONCURRENCY)
+
+    async with _shell_semaphore:
+        try:
+            proc = await asyncio.create_subprocess_shell(
+                command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=_child_env(),
+                start_new_session=True,
+                preexec_fn=_limit_resources if os.name == "posix" else None,
+            )
+        except OSError as e:
+            return _format_result(-1, "", f"{type(e).__name__}: 无法启动命令：{e}")
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            # 连同命令启动的子进程一起结束；进程组可能恰好已经退出
+            try:
+                if os.name == "posix":
+                    os.killpg(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            return _format_result(-1, "", f"TimeoutError: 命令执行超过 {timeout} 秒，已终止")
+
+    return _format_result(
+        proc.returncode or 0,
+        _truncate(stdout.decode("utf-8", errors="replace")),
+        _truncate(stderr.decode("utf-8", errors="replace")),
+    )
+
+
+def _write(path: str, content: str, append: bool) -> int:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        return f.write(content)
+
+
+async def save_text_file(file_path: str, content: str, append: bool = False) -> ToolResponse:
+    """把文本内容保存到文件，不存在的目录会自动创建。保存 Markdown 等文本文件时优先使用本工具。
+
+    Args:
+        file_path (`str`):
+            文件路径，支持 `~` 表示用户主目录
+        content (`str`):
+            要写入的文本内容
+        append (`bool`):
+            为 True 时追加到文件末尾，否则覆盖原文件
+    """
+    path = os.path.abspath(os.path.expanduser(file_path))
+    try:
+        written = await asyncio.to_thread(_write, path, content, append)
+    except OSError as e:
+        return ToolResponse(content=[TextBlock(type="text", text=f"保存失败：{e}")])
+    return ToolResponse(content=[TextBlock(type="text", text=f"已保存 {written} 个字符到 {path}")])
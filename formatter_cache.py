@@ -0,0 +1,93 @@
+"""带前缀缓存的多智能体格式化器
+
+DashScopeMultiAgentFormatter 每次调用都会把整段对话历史重新拼成一条 ``<history>`` 消息。
+辩论中同一份历史每轮只在末尾追加几条发言，这里对纯文本消息做两级缓存：
+
+- 单条消息渲染后的文本按消息 id 缓存，所有智能体共享（同一条发言会出现在多个辩手的记忆里）；
+- 每个格式化器记住上一次渲染的各行，本次的消息若是上一次的延续，只渲染并追加新增部分。
+
+渲染结果与父类逐字一致：每个文本块一行 ``名字: 文本``，没有文本块的消息不占行。
+包含工具调用、图片等非文本内容的消息仍交给父类处理。
+"""
+from collections import OrderedDict
+from typing import Any
+from agentscope.formatter import DashScopeMultiAgentFormatter
+from agentscope.message import Msg
+
+
+class FormatterCacheConfig:
+    """格式化缓存配置"""
+
+    # 单条消息渲染结果的最大缓存条数
+    MAX_RENDERED_MSGS = 4096
+
+
+# 消息 id -> (各文本块, 渲染后的各行)
+_rendered: OrderedDict[str, tuple[tuple[str, ...], list[str]]] = OrderedDict()
+
+
+def _plain_text(msg: Msg) -> tuple[str, ...] | None:
+    """纯文本消息返回其各文本块，否则返回 None"""
+    if isinstance(msg.content, str):
+        return (msg.content,)
+    if all(_.get("type") == "text" for _ in msg.content):
+        return tuple(_["text"] for _ in msg.content)
+    return None
+
+
+def _render(msg: Msg, texts: tuple[str, ...]) -> list[str]:
+    cached = _rendered.get(msg.id)
+    if cached is not None and cached[0] == texts:
+        _rendered.move_to_end(msg.id)
+        return cached[1]
+
+    rendered = [f"{msg.name}: {_}" for _ in texts]
+    _rendered[msg.id] = (texts, rendered)
+    while len(_rendered) > FormatterCacheConfig.MAX_RENDERED_MSGS:
+        _rendered.popitem(last=False)
+    return rendered
+
+
+class CachedDashScopeMultiAgentFormatter(DashScopeMultiAgentFormatter):
+    """对纯文本对话历史做增量格式化的 DashScopeMultiAgentFormatter"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # 上一次的历史：消息 id 列表、各条消息的文本块、渲染后的各行
+        self._last_ids: list[str] = []
+        self._last_texts: list[tuple[str, ...]] = []
+        self._last_lines: list[str] = []
+        self.hits = 0
+        self.misses = 0
+
+    async def _format_agent_message(
+        self,
+        msgs: list[Msg],
+        is_first: bool = True,
+    ) -> list[dict[str, Any]]:
+        texts = [_plain_text(_) for _ in msgs]
+        if not msgs or any(_ is None for _ in texts):
+            return await super()._format_agent_message(msgs, is_first)
+
+        ids = [_.id for _ in msgs]
+        n = len(self._last_ids)
+        if n and ids[:n] == self._last_ids and texts[:n] == self._last_texts:
+            # 本次是上一次的延续，只渲染新增的消息并追加到上一次的各行之后
+            self.hits += 1
+            lines = self._last_lines
+            start = n
+        else:
+            self.misses += 1
+            lines = []
+            start = 0
+        for m, t in zip(msgs[start:], texts[start:]):
+            lines.extend(_render(m, t))  # type: ignore[arg-type]
+
+        self._last_ids, self._last_texts, self._last_lines = ids, texts, lines  # type: ignore[assignment]
+        if not lines:
+            # 与父类一致：没有任何文本时不生成消息
+            return []
+
+        prompt = self.conversation_history_prompt if is_first else ""
+        history = "\n".join(lines)
+        return [{"role": "user", "content": f"{prompt}<history>\n{history}\n</history>"}]
@@ -0,0 +1,238 @@
+"""自由辩论引擎
+
+原流程中自由辩论的每一轮都给辩手一条固定的“请开始第三轮自由辩论环节！”，上一轮的交锋
+没有传下去，辩手的记忆随轮数不断增长，每次发言都要把越来越长的历史重新格式化、重新送进模型。
+
+这里每次发言的上下文固定为：进入自由辩论前的记忆（立论、攻辩）+ 滚动摘要 + 尚未摘要的最近发言，
+对手的上一条发言作为本次输入：
+
+- 尚未摘要的发言累积到 2 × 窗口时，在后台用便宜的模型把较早的部分并入摘要，只保留最近一个窗口；
+  摘要完成前不阻塞发言，落后到 3 × 窗口时才等待，因此每次发言的提示词大小有上界，与总轮数无关；
+- 辩手的记忆是共享记录上的视图（transcript.py）时，不重写记忆，而是在视图中把已摘要的发言折叠为摘要；
+- 摘要更新之间上下文只在末尾追加，配合 CachedDashScopeMultiAgentFormatter，
+  当前辩手发言时提前为下一位辩手格式化上下文，轮到它时只需渲染对手刚完成的那一条发言。
+"""
+from agentscope.agent import ReActAgent
+from agentscope.message import Msg
+from agentscope.model import ChatModelBase
+from metrics import MetricsRegistry
+from model_pool import ModelRegistry
+from transcript import TranscriptView
+from turn_scheduler import prewarm_context
+
+import asyncio, re
+
+
+class FreeDebateConfig:
+    """自由辩论引擎配置"""
+
+    # 原样保留的最近交锋轮数（每轮双方各发言一次）
+    WINDOW = 2
+
+    # 生成摘要用的模型
+    SUMMARY_MODEL = "qwen-turbo"
+
+    # 摘要的目标字数
+    SUMMARY_CHARS = 300
+
+
+def _first_sentence(msg: Msg) -> str:
+    text = (msg.get_text_content() or "").strip()
+    return re.split(r"(?<=[。！？!?])", text, maxsplit=1)[0][:80]
+
+
+class FreeDebateEngine:
+    """以“滚动窗口 + 滚动摘要”推进自由辩论
+
+    Args:
+        debaters (``list[ReActAgent]``):
+            按发言顺序排列的辩手
+        host (``ReActAgent | None``):
+            主持人，记录完整的发言（评委和非增量评分路径依赖主持人的记忆）
+        window (``int``):
+            原样保留的最近交锋轮数
+        summary_model_name (``str``):
+            生成摘要用的模型
+        summary_model (``ChatModelBase | None``):
+            直接指定生成摘要用的非流式模型（如 ModelRouter 的路由模型），优先于 ``summary_model_name``
+    """
+
+    def __init__(
+        self,
+        debaters: list[ReActAgent],
+        host: ReActAgent | None = None,
+        window: int = FreeDebateConfig.WINDOW,
+        summary_model_name: str = FreeDebateConfig.SUMMARY_MODEL,
+        summary_model: ChatModelBase | None = None,
+    ) -> None:
+        self.debaters = debaters
+        self.host = host
+        self.window = max(1, window) * len(debaters)
+        self.summary_model_name = summary_model_name
+        self.summary_model = summary_model
+
+        self.speeches: list[Msg] = []
+        self.summary: str = ""
+        # self.speeches 中已并入摘要的条数
+        self.summarized: int = 0
+        self.summaries: int = 0
+        # 摘要失败、退化为保留首句的次数
+        self.summary_fallbacks: int = 0
+        self._summary_msg: Msg | None = None
+        self._summary_task: asyncio.Task | None = None
+        # 辩手名 -> 进入自由辩论前的记忆条数
+        self._base: dict[str, int] = {}
+        # 使用共享记录时，自由辩论开始时记录的长度
+        self._start_seq: int | None = None
+
+    async def start(self, msg: Msg | None = None) -> None:
+        """记录各辩手进入自由辩论前的记忆，之后每次发言都在此基础上拼接上下文
+
+        Args:
+            msg (``Msg | None``):
+                主持人宣布自由辩论开始的消息，会写入每位辩手的记忆
+        """
+        for agent in self.debaters:
+            if msg is not None:
+                await agent.observe(msg)
+            if isinstance(agent.memory, TranscriptView):
+                self._start_seq = len(agent.memory.transcript)
+            else:
+                self._base[agent.name] = len(agent.memory.content)
+
+    def _context(self) -> list[Msg]:
+        """摘要 + 尚未并入摘要的发言"""
+        context = self.speeches[self.summarized:]
+        if self._summary_msg is not None:
+            context = [self._summary_msg, *context]
+        return context
+
+    def _reset(self, agent: ReActAgent, context: list[Msg]) -> None:
+        """把 ``agent`` 的记忆重置为 进入自由辩论前的记忆 + ``context``"""
+        memory = agent.memory
+        if isinstance(memory, TranscriptView):
+            # 尚未摘要的发言本来就在视图中，只需折叠已摘要的部分
+            if self.summarized and self._start_seq is not None:
+                end = memory.transcript.seq(self.speeches[self.summarized].id)
+                memory.fold(self._start_seq, len(memory.transcript) if end is None else end, self._summary_msg)
+            return
+        memory.content = memory.content[: self._base[agent.name]] + context
+
+    async def _prewarm(self, agent: ReActAgent, context: list[Msg]) -> None:
+        self._reset(agent, context)
+        await prewarm_context(agent)
+
+    async def speak(self, agent: ReActAgent, next_agent: ReActAgent | None = None) -> Msg:
+        """让 ``agent`` 发言，并在其发言期间为 ``next_agent`` 预热上下文"""
+        # 摘要落后太多时等待，保证上下文有上界
+        if (
+            self._summary_task is not None
+            and len(self.speeches) - self.summarized >= 3 * self.window
+        ):
+            await self._summary_task
+
+        context = self._context()
+        # 对手的上一条发言作为本次输入，其余作为记忆
+        msg = context.pop() if self.speeches else None
+        self._reset(agent, context)
+
+        prewarm = None
+        if next_agent is not None and next_agent is not agent:
+            prewarm = asyncio.create_task(self._prewarm(next_agent, self._context()))
+
+        try:
+            reply = await agent(msg)
+            self.speeches.append(reply)
+            if self.host is not None:
+                await self.host.memory.add(reply)
+            if prewarm is not None:
+                await prewarm
+        finally:
+            # 发言失败或被取消时不留下孤立的预热任务
+            if prewarm is not None and not prewarm.done():
+                prewarm.cancel()
+        self._maybe_summarize()
+        return reply
+
+    async def run_round(self) -> list[Msg]:
+        """双方按顺序各发言一次，返回本轮的发言"""
+        speeches = []
+        for i, agent in enumerate(self.debaters):
+            next_agent = self.debaters[(i + 1) % len(self.debaters)]
+            speeches.append(await self.speak(agent, next_agent))
+        return speeches
+
+    async def finish(self) -> None:
+        """自由辩论结束：把摘要和最近的发言留在各辩手的记忆中，供总结陈词使用"""
+        if self._summary_task is not None:
+            await self._summary_task
+        context = self._context()
+        for agent in self.debaters:
+            self._reset(agent, context)
+
+    def _maybe_summarize(self) -> None:
+        end = len(self.speeches) - self.window
+        if end - self.summarized < self.window:
+            return
+        if self._summary_task is None or self._summary_task.done():
+            # 在后台摘要，不阻塞下一位辩手发言
+            self._summary_task = asyncio.create_task(self._summarize(end))
+
+    async def _summarize(self, end: int) -> None:
+        batch = self.speeches[self.summarized:end]
+        transcript = "\n".join(f"{_.name}：{_.get_text_content()}" for _ in batch)
+        model = self.summary_model or ModelRegistry.get_model(self.summary_model_name, stream=False)
+        summary = ""
+        reason = "empty"
+        try:
+            res = await model(
+                [
+                    {
+                        "role": "system",
+                        "content": "你负责记录辩论赛自由辩论环节的交锋要点。请将已有要点与新增发言合并为一份简洁的要点记录，"
+                        f"分别列出正反双方的主要论点、对方已回应和尚未回应的质疑，不超过{FreeDebateConfig.SUMMARY_CHARS}字。",
+                    },
+                    {
+                        "role": "user",
+                        "content": f"已有要点：\n{self.summary or '无'}\n\n新增发言：\n{transcript}",
+                    },
+                ]
+            )
+            summary = "".join(_["text"] for _ in res.content if _["type"] == "text").strip()
+        except Exception as e:
+            reason = type(e).__name__
+        if not summary:
+            # 摘要失败时退化为保留每条发言的首句，上下文仍然有界
+            self.summary_fallbacks += 1
+            MetricsRegistry.observe("free_debate_summary_fallbacks", 1, reason=reason)
+            print(f"自由辩论摘要失败（{reason}），本次保留每条发言的首句")
+            lines = [self.summary, *(f"{_.name}：{_first_sentence(_)}" for _ in batch)]
+            summary = "\n".join(filter(None, lines))[-2 * FreeDebateConfig.SUMMARY_CHARS:]
+
+        self._set_summary(summary)
+        self.summarized = end
+        self.summaries += 1
+
+    def _set_summary(self, summary: str) -> None:
+        self.summary = summary
+        self._summary_msg = Msg(
+            name="自由辩论要点",
+            content=f"以下是此前自由辩论的交锋要点：\n{summary}",
+            role="user",
+        ) if summary else None
+
+    def state_dict(self) -> dict:
+        return {
+            "base": self._base,
+            "start_seq": self._start_seq,
+            "speeches": [_.to_dict() for _ in self.speeches],
+            "summary": self.summary,
+            "summarized": self.summarized,
+        }
+
+    def load_state_dict(self, state_dict: dict) -> None:
+        self._base = dict(state_dict.get("base", {}))
+        self._start_seq = state_dict.get("start_seq")
+        self.speeches = [Msg.from_dict(_) for _ in state_dict.get("speeches", [])]
+        self._set_summary(state_dict.get("summary", ""))
+        self.summarized = state_dict.get("summarized", 0)
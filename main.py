@@ -1,86 +1,190 @@
-import json
-from agentscope.agent import ReActAgent, UserAgent
-from agentscope.embedding import DashScopeTextEmbedding
-from agentscope.formatter import DashScopeChatFormatter
-from agentscope.memory import Mem0LongTermMemory
-from agentscope.model import DashScopeChatModel
-from agentscope.formatter import DashScopeMultiAgentFormatter
-from agentscope.memory import InMemoryMemory
-from agentscope.message import Msg
-from agentscope.tool import Toolkit, execute_python_code, execute_shell_command, ToolResponse
-
-from workflow_debate import start_debate
-from mcp_gaode import generate_travel_plan, stateless_client_gaode
-
-from dotenv import load_dotenv
-import os, asyncio, agentscope
-
-agentscope.init(studio_url="http://localhost:3000")
-load_dotenv()
-
-async def register_tools() -> Toolkit:
+from typing import TYPE_CHECKING
+from agentscope.tool import Toolkit, ToolResponse
+
+from exec_pool import execute_python_code, execute_shell_command, python_pool, save_text_file
+from settings import settings
+
+import asyncio, copy, json, sys
+
+if TYPE_CHECKING:
+    from agentscope.agent import ReActAgent
+
+
+# 导入本模块只需要注册工具用到的 agentscope.tool；智能体、模型客户端、指标和长期记忆
+# 在 build_agent / main 中用到时才导入，长期记忆关闭时完全不导入。
+# 工作流和高德 MCP 模块较重，且高德密钥只在查地图时才需要，
+# 这里注册轻量的包装函数，第一次调用工具时才导入对应模块、建立会话
+
+async def start_debate(debate_subject: str, run_id: str | None = None) -> ToolResponse:
+    """开始一场辩论
+
+    Args:
+        debate_subject (``str``):
+            辩论的主题
+        run_id (``str | None``):
+            仅在用户要求继续上次中断的辩论时传入上次的运行编号，否则不传
+    """
+    from workflow_debate import start_debate as _start_debate
+
+    return await _start_debate(debate_subject, run_id)
+
+
+async def generate_travel_plan(query: str, run_id: str | None = None) -> ToolResponse:
+    """生成一份旅游计划
+
+    Args:
+        query (`str`):
+            用户输入的旅行需求，如目的地、预算、时间等
+        run_id (`str | None`):
+            仅在用户要求继续上次中断的计划时传入上次的运行编号，否则不传
+    """
+    from mcp_gaode import generate_travel_plan as _generate_travel_plan
+
+    return await _generate_travel_plan(query, run_id)
+
+
+async def maps_weather(city: str) -> ToolResponse:
+    """根据城市名称或者标准adcode查询指定城市的天气
+
+    Args:
+        city (`str`):
+            城市名称或者adcode
+    """
+    from mcp_gaode import get_gaode_pool
+
+    func = await get_gaode_pool().get_callable_function(
+        func_name="maps_weather",
+        wrap_tool_result=True,  # 确保返回 ToolResponse 而不是 CallToolResult
+    )
+    return await func(city=city)
+
+
+async def retrieve_knowledge(query: str, top_k: int = 4) -> ToolResponse:
+    """从本地知识库中检索与问题相关的资料片段，可用于引用真实的数据、案例和事实
+
+    Args:
+        query (`str`):
+            要检索的问题或关键词
+        top_k (`int`):
+            返回的片段数
+    """
+    from agent_rag import retrieve_knowledge as _retrieve_knowledge
+
+    return await _retrieve_knowledge(query, top_k)
+
+
+def register_tools(code_execution: bool = True, interactive: bool = True) -> Toolkit:
+    """注册小元的工具
+
+    Args:
+        code_execution (``bool``):
+            是否注册执行代码、执行命令和写文件的工具，对外提供服务时不应开启
+        interactive (``bool``):
+            是否注册需要在控制台与用户交互的工具（旅游计划会读取标准输入），服务端不能使用
+    """
     tk = Toolkit()
-    tk.register_tool_function(execute_python_code)
-    tk.register_tool_function(execute_shell_command)
+    if code_execution:
+        tk.register_tool_function(execute_python_code)
+        tk.register_tool_function(execute_shell_command)
+        tk.register_tool_function(save_text_file)
 
     # 工作流
     tk.register_tool_function(tool_func=start_debate, func_description="只有当用户请求中包含'辩论'相关的字词时被调用")
 
     # 计划书
-    tk.register_tool_function(tool_func=generate_travel_plan, func_description="为用户生成一份详尽的旅游计划")
+    if interactive:
+        tk.register_tool_function(tool_func=generate_travel_plan, func_description="为用户生成一份详尽的旅游计划")
 
     # 高德 mcp - 天气查询
-    get_weather_by_city = await stateless_client_gaode.get_callable_function(
-        func_name="maps_weather",
-        wrap_tool_result=True,  # 确保返回 ToolResponse 而不是 CallToolResult
-    )
-    tk.register_tool_function(get_weather_by_city)  # type: ignore
+    tk.register_tool_function(maps_weather)
+
+    # 本地知识库检索
+    tk.register_tool_function(retrieve_knowledge)
 
     return tk
 
-async def main():
-    # 注册（工具）智能体
-    toolkit = await register_tools()
-
-    # 加载 AK
-    api_key: str | None = os.getenv("DASHSCOPE_API_KEY")
-    if not api_key:
-        raise ValueError("DASHSCOPE_API_KEY 环境变量未设置或为空")
-
-    # # 注册长期记忆
-    # long_term_memory = Mem0LongTermMemory(
-    #     agent_name="小元",
-    #     user_name="User",
-    #     model=DashScopeChatModel(
-    #         model_name="qwen-plus",
-    #         api_key=api_key,
-    #         stream=False,
-    #     ),
-    #     embedding_model=DashScopeTextEmbedding(
-    #         api_key=api_key,
-    #         model_name="text-embedding-v4"
-    #     ),
-    #     on_disk=False,
-    # )
+
+def clone_toolkit(toolkit: Toolkit) -> Toolkit:
+    """复制 ``toolkit`` 中已注册的工具，得到一个独立的 Toolkit
+
+    工具的 JSON Schema 和函数直接共用，不重新解析 docstring；ReActAgent 会把自己的结束函数和
+    结构化输出模型注册进 Toolkit，每个智能体需要一份自己的 Toolkit，不能直接共用。
+    """
+    clone = Toolkit()
+    clone.tools = {name: copy.copy(tool) for name, tool in toolkit.tools.items()}
+    clone.groups = copy.deepcopy(toolkit.groups)
+    return clone
+
+
+def build_agent(
+    toolkit: Toolkit | None = None,
+    user_id: str | None = None,
+    long_term: bool | None = None,
+) -> "ReActAgent":
+    """创建小元，不发起任何网络请求
+
+    Args:
+        toolkit (``Toolkit | None``):
+            工具集，为空时新建
+        user_id (``str | None``):
+            用户标识，长期记忆按用户隔离
+        long_term (``bool | None``):
+            是否启用长期记忆，为空时取 LONG_TERM_MEMORY 配置
+    """
+    from agentscope.agent import ReActAgent
+    from agentscope.formatter import DashScopeChatFormatter
+    from memory_bounded import SummarizingMemory
+    from model_pool import ModelRegistry
+
+    if toolkit is None:
+        toolkit = register_tools()
+    if long_term is None:
+        long_term = settings.long_term_memory
+
+    # 长期记忆：写入在后台批量完成，检索走本地向量索引和 LRU 缓存，不拖慢回复
+    long_term_memory = None
+    if long_term:
+        from memory_long_term import get_long_term_memory
+
+        long_term_memory = get_long_term_memory("小元", user_id)
 
     xiao_yuan = ReActAgent(
         name="小元",
         sys_prompt="你是一个多智能体助手，你的名字是小元。",
-        model=DashScopeChatModel(
-            model_name="qwen-plus",
-            api_key=api_key,
-            stream=True,
-        ),
-        memory=InMemoryMemory(),
-        # long_term_memory=long_term_memory,
-        # long_term_memory_mode="static_control",
+        model=ModelRegistry.get_model("qwen-plus", stream=True),
+        # 长会话使用有 token 预算的摘要记忆，避免提示词无限增长
+        memory=SummarizingMemory(),
+        long_term_memory=long_term_memory,
+        long_term_memory_mode="static_control",
         formatter=DashScopeChatFormatter(),
         toolkit=toolkit,
     )
 
-    print(json.dumps(xiao_yuan.toolkit.get_json_schemas(), indent=4, ensure_ascii=False))
+    if settings.dump_schemas:
+        print(json.dumps(xiao_yuan.toolkit.get_json_schemas(), indent=4, ensure_ascii=False))
+
+    return xiao_yuan
+
+
+async def main():
+    from agentscope.agent import UserAgent
+    from metrics import MetricsRegistry
+
+    if settings.studio_url:
+        import agentscope
+
+        agentscope.init(studio_url=settings.studio_url)
 
+    # 记录每次智能体回复、模型调用与工具调用的耗时
+    MetricsRegistry.install()
+
+    xiao_yuan = build_agent()
     user = UserAgent(name="User")
+    # 等待用户输入期间在后台启动 Python 工作进程
+    python_pool.preload()
+    if xiao_yuan.long_term_memory is not None:
+        # 等待用户输入期间在后台加载长期记忆索引
+        xiao_yuan.long_term_memory.preload()
 
     msg = None
     while True:
@@ -89,6 +193,14 @@ async def main():
         if msg.get_text_content() == "exit":
             break
 
+    # 只有用过高德工具时 mcp_gaode 才会被导入
+    if "mcp_gaode" in sys.modules:
+        await sys.modules["mcp_gaode"].close_gaode_pool()
+    await python_pool.close()
+    if "memory_long_term" in sys.modules:
+        await sys.modules["memory_long_term"].close_long_term_memories()
+    MetricsRegistry.report()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,235 @@
+"""MCP 工具调用结果缓存
+
+以“工具名 + 规范化参数”为键缓存高德 MCP 的调用结果，每个工具有独立的 TTL，整体按 LRU 限制条目数。
+同一时刻的相同请求只会真正发出一次，其余调用等待同一个结果；真正的请求在独立的任务中执行，
+某个调用方被取消不影响其他等待者，所有等待者都取消时才取消请求。
+可选地将缓存持久化到磁盘（新增条目后定期在后台线程写入，关闭时再写一次），重启后仍可命中未过期的条目；
+写盘失败只打印提示，不影响已成功的调用。
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+from mcp.types import CallToolResult
+
+import asyncio, json, os, re, time
+
+
+class CacheConfig:
+    """缓存配置"""
+
+    # 最大缓存条目数
+    MAX_ENTRIES = 2048
+
+    # 有新增条目时，距上次写盘超过该时长（秒）即写入持久化文件
+    SAVE_INTERVAL = 60
+
+    # 各工具的缓存时长（秒），未列出的工具不缓存
+    TOOL_TTL = {
+        # 天气变化快，只短时间缓存
+        "maps_weather": 10 * 60,
+        # 地理编码、POI 基本不变
+        "maps_geo": 7 * 24 * 3600,
+        "maps_regeocode": 7 * 24 * 3600,
+        "maps_text_search": 24 * 3600,
+        "maps_around_search": 24 * 3600,
+        "maps_search_detail": 24 * 3600,
+        # 路径规划受路况影响，缓存一小时
+        "maps_direction_driving": 3600,
+        "maps_direction_walking": 3600,
+        "maps_direction_bicycling": 3600,
+        "maps_direction_transit_integrated": 3600,
+        "maps_distance": 3600,
+    }
+
+
+def _normalize(value: Any) -> Any:
+    """规范化参数：去掉首尾空白和逗号两侧空白，丢弃空值，字典按键排序"""
+    if isinstance(value, str):
+        return re.sub(r"\s*,\s*", ",", value.strip())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class _Flight:
+    """一次进行中的请求及其等待者数"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class ToolResultCache:
+    """TTL + LRU 的工具结果缓存
+
+    Args:
+        persist_path (``str | None``):
+            持久化文件路径，为空时只在内存中缓存
+        max_entries (``int``):
+            最大缓存条目数
+        tool_ttl (``dict[str, float] | None``):
+            各工具的缓存时长，默认使用 CacheConfig.TOOL_TTL
+    """
+
+    def __init__(
+        self,
+        persist_path: str | None = None,
+        max_entries: int = CacheConfig.MAX_ENTRIES,
+        tool_ttl: dict[str, float] | None = None,
+    ) -> None:
+        self.persist_path = persist_path
+        self.max_entries = max_entries
+        self.tool_ttl = tool_ttl if tool_ttl is not None else CacheConfig.TOOL_TTL
+
+        # key -> (过期时间戳, 序列化后的 CallToolResult)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[str, _Flight] = {}
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+        # 加入进行中请求的次数，不计入命中
+        self._coalesced: dict[str, int] = {}
+        self._loaded = False
+        self._saved_at = time.monotonic()
+        self._flushing: asyncio.Task | None = None
+
+    @staticmethod
+    def make_key(tool_name: str, arguments: dict) -> str:
+        return tool_name + ":" + json.dumps(
+            _normalize(arguments), ensure_ascii=False, sort_keys=True
+        )
+
+    async def get_or_call(
+        self,
+        tool_name: str,
+        arguments: dict,
+        call: Callable[[], Awaitable[CallToolResult]],
+    ) -> CallToolResult:
+        """命中缓存时直接返回，否则执行 ``call`` 并缓存成功的结果"""
+        ttl = self.tool_ttl.get(tool_name, 0)
+        if ttl <= 0:
+            return await call()
+
+        self._load()
+        key = self.make_key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self._hits[tool_name] = self._hits.get(tool_name, 0) + 1
+            return CallToolResult.model_validate(entry[1])
+
+        # 合并并发的相同请求
+        flight = self._inflight.get(key)
+        if flight is None or flight.task.done():
+            self._misses[tool_name] = self._misses.get(tool_name, 0) + 1
+            flight = _Flight(asyncio.create_task(self._fetch(key, ttl, call)))
+            self._inflight[key] = flight
+        else:
+            self._coalesced[tool_name] = self._coalesced.get(tool_name, 0) + 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有调用方都已取消，不再需要结果
+                flight.task.cancel()
+
+    async def _fetch(
+        self,
+        key: str,
+        ttl: float,
+        call: Callable[[], Awaitable[CallToolResult]],
+    ) -> CallToolResult:
+        try:
+            res = await call()
+        finally:
+            self._inflight.pop(key, None)
+        if not res.isError:
+            self._put(key, time.time() + ttl, res.model_dump(mode="json"))
+            if (
+                time.monotonic() - self._saved_at >= CacheConfig.SAVE_INTERVAL
+                and (self._flushing is None or self._flushing.done())
+            ):
+                # 在独立任务中写盘，本次调用不等待，也不会因写盘失败而失败
+                self._saved_at = time.monotonic()
+                self._flushing = asyncio.create_task(self.flush())
+        return res
+
+    def _put(self, key: str, expires_at: float, value: dict) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, expires_at, value in data:
+            if expires_at > now:
+                self._put(key, expires_at, value)
+
+    def _snapshot(self) -> list:
+        now = time.time()
+        return [[k, exp, v] for k, (exp, v) in self._entries.items() if exp > now]
+
+    def _write(self, data: list) -> None:
+        tmp_path = self.persist_path + ".tmp"  # type: ignore[operator]
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)  # type: ignore[arg-type]
+        except OSError as e:
+            print(f"[MCP 缓存] 写入 {self.persist_path} 失败：{e}")
+
+    def save(self) -> None:
+        """将未过期的条目写入磁盘（同步），写入失败时只打印提示"""
+        self._saved_at = time.monotonic()
+        if self.persist_path:
+            self._write(self._snapshot())
+
+    async def flush(self) -> None:
+        """等待进行中的后台写盘结束，再在线程中写入一次，写入失败时只打印提示"""
+        flushing = self._flushing
+        if flushing is not None and flushing is not asyncio.current_task():
+            await asyncio.gather(flushing, return_exceptions=True)
+        self._saved_at = time.monotonic()
+        if self.persist_path:
+            # 条目本身写入后不再修改，只需在事件循环中复制一份列表
+            await asyncio.to_thread(self._write, self._snapshot())
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """命中率统计，按工具细分；coalesced 为加入进行中请求的次数，不计入命中"""
+        hits = sum(self._hits.values())
+        misses = sum(self._misses.values())
+        tools = {
+            name: {
+                "hits": self._hits.get(name, 0),
+                "misses": self._misses.get(name, 0),
+                "coalesced": self._coalesced.get(name, 0),
+            }
+            for name in sorted(set(self._hits) | set(self._misses) | set(self._coalesced))
+        }
+        return {
+            "entries": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "coalesced": sum(self._coalesced.values()),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tools": tools,
+        }
@@ -1,39 +1,57 @@
 from agentscope.formatter import DashScopeChatFormatter
-from agentscope.message import TextBlock
-from agentscope.model import DashScopeChatModel
-from agentscope.mcp import HttpStatelessClient, HttpStatefulClient
+from agentscope.message import Msg, TextBlock
 from agentscope.plan import Plan, PlanNotebook, SubTask
 from agentscope.agent import ReActAgent, UserAgent
 from agentscope.memory import InMemoryMemory
-from agentscope.tool import Toolkit, execute_shell_command, execute_python_code
+from agentscope.tool import Toolkit
 from agentscope.tool import ToolResponse
+from model_router import ModelRouter
+import metrics
+from mcp_pool import MCPSessionPool
+from mcp_cache import ToolResultCache
+from route_planner import create_route_tool
+from exec_pool import execute_python_code, execute_shell_command, save_text_file
+from agent_rag import knowledge_base, retrieve_knowledge
+from checkpoint import Checkpoint, load_memory_states, memory_states
+from settings import settings
 
-from dotenv import load_dotenv
-import os, asyncio, json
+import asyncio, json
 
-load_dotenv()
+# 高德 MCP 会话池，首次使用时才创建（见 get_gaode_pool），导入本模块不会校验密钥或建立连接
+_gaode_pool: MCPSessionPool | None = None
 
-amap_maps_api_key: str | None = os.getenv("AMAP_MAPS_API_KEY")
-if not amap_maps_api_key:
-    raise ValueError("请检查AMAP_MAPS_API_KEY配置")
 
-dashscope_api_key_temp: str | None = os.getenv("DASHSCOPE_API_KEY")
-if not dashscope_api_key_temp:
-    raise ValueError("请检查DASHSCOPE_API_KEY配置")
-dashscope_api_key = dashscope_api_key_temp
+def get_gaode_pool() -> MCPSessionPool:
+    """获取进程内共享的高德 MCP 会话池
 
-stateful_client_gaode = HttpStatefulClient(
-    name="map_service_stateless",
-    transport="streamable_http",
-    url=f"https://mcp.amap.com/mcp?key={amap_maps_api_key}"
-)
-stateless_client_gaode = HttpStatelessClient(
-    name="map_service_stateless",
-    transport="streamable_http",
-    url=f"https://mcp.amap.com/mcp?key={amap_maps_api_key}"
-)
+    会话池在第一次调用工具时建立会话并缓存工具列表，调用结果按工具缓存，
+    设置 AMAP_CACHE_PATH 后会持久化到磁盘。
+    """
+    global _gaode_pool
+    if _gaode_pool is None:
+        _gaode_pool = MCPSessionPool(
+            name="map_service",
+            url=f"{settings.amap_mcp_url}?key={settings.amap_maps_api_key}",
+            cache=ToolResultCache(persist_path=settings.amap_cache_path),
+        )
+    return _gaode_pool
+
+
+async def close_gaode_pool() -> None:
+    """关闭会话池（如果已经创建过）"""
+    global _gaode_pool
+    if _gaode_pool is not None:
+        await _gaode_pool.close()
+        _gaode_pool = None
+
+
+# 旅游计划智能体的模型路由（见 model_router.py），环节为当前进行中的 SubTask；
+# 计划作为工具在后台生成，不需要逐字输出，默认关闭流式。
+# 路线、预算等子任务常输出较长的表格，不限制最大输出 token 数，需要时在配置文件中按环节设置
+travel_router = ModelRouter("travel", {
+    "planner": {"model": "qwen-plus", "fallback": ["qwen-turbo"], "enable_thinking": False, "stream": False},
+})
 
-# await tk.register_mcp_client(stateless_client_gaode, group_name="map_services")
 
 class GaodePlans:
     mcp = Toolkit()
@@ -63,12 +81,14 @@ class GaodePlans:
             ]
         )
 
-async def generate_travel_plan(query: str):
+async def generate_travel_plan(query: str, run_id: str | None = None):
     """生成一份旅游计划
 
     Args:
         query (`str`):
             用户输入的旅行需求，如目的地、预算、时间等
+        run_id (`str | None`):
+            运行编号，传入上次中断时打印的编号可以从断点继续，为空时开始新的运行
     """
     
     # 计划书模板
@@ -125,10 +145,11 @@ async def generate_travel_plan(query: str):
                 SubTask(
                     name="规划交通与动线",
                     description="""
-                    规划可行的移动路径，降低通勤成本与时间。内容包括：
+                    规划可行的移动路径，降低通勤成本与时间。先调用 plan_day_routes，一次传入每天的全部地点
+                    （每天以住宿地点开头），直接采用它返回的游览顺序、距离和耗时，不要再逐段查询路线。内容包括：
                     各点之间的交通方式建议（地铁/公交/打车/步行）
                     预估通勤时间和费用
-                    提供路线图或顺序优化建议
+                    按优化后的顺序给出每天的动线
                     若跨城，加入大交通建议（高铁/航班/自驾）
                     """,
                     expected_outcome="简洁的语言表述各地点之间的线路和通行方式",
@@ -156,10 +177,24 @@ async def generate_travel_plan(query: str):
     tk = Toolkit()
     tk.register_tool_function(execute_shell_command)
     tk.register_tool_function(execute_python_code)
+    tk.register_tool_function(save_text_file)
+    if len(knowledge_base):
+        # 本地知识库（游记、攻略等资料）
+        tk.register_tool_function(retrieve_knowledge)
     
-    # 连接有状态MCP客户端
-    # await stateful_client_gaode.connect()
-    await tk.register_mcp_client(stateless_client_gaode)
+    # 复用会话池中的高德 MCP 会话和缓存的工具列表
+    pool = get_gaode_pool()
+    await pool.register_tools(tk)
+
+    # 批量查询：一次 ReAct 步骤内并发完成多次地图查询
+    batch_map_query = await pool.get_batch_function(
+        func_name="batch_map_query",
+        description="批量并发调用高德地图工具（天气、POI搜索、路线规划等），一次返回所有结果。需要多次查询地图时优先使用。",
+    )
+    tk.register_tool_function(batch_map_query, json_schema=batch_map_query.json_schema)  # type: ignore
+
+    # 动线规划：本地根据距离矩阵求游览顺序
+    tk.register_tool_function(create_route_tool(pool))
 
     agent = ReActAgent(
         name="小徳",
@@ -168,28 +203,61 @@ async def generate_travel_plan(query: str):
             - macOS: `/Users/{username}/Desktop/`
             - Windows: `C:\\Users\\{username}\\Desktop\\`
             - Linux: `/home/{username}/Desktop/`
-        请确保有写入权限，并以 Markdown 格式保存为 `travel_plan.md`。
+        请确保有写入权限，并以 Markdown 格式保存为 `travel_plan.md`，保存文件时直接使用 `save_text_file`。
+
+        需要查询多个地点、天气或路线时，使用 `batch_map_query` 一次性提交所有查询，不要逐个调用地图工具。
 
         文件保存完后，请在结尾处附上`Travel plan generation done!`
         """,
-        model=DashScopeChatModel(
-            model_name="qwen-plus",
-            api_key=dashscope_api_key,
-            stream=True,
-            enable_thinking=False,
-        ),
+        model=travel_router.model("planner"),
         formatter=DashScopeChatFormatter(),
         memory=InMemoryMemory(),
         toolkit=tk,
         plan_notebook=plan_notebook,
     )
 
+    # 按当前进行中的 SubTask 给指标打标签
+    def _switch_subtask_phase(self, kwargs):
+        plan = plan_notebook.current_plan
+        if plan is not None:
+            for subtask in plan.subtasks:
+                if subtask.state == "in_progress":
+                    metrics.switch_phase(subtask.name)
+                    break
+
+    agent.register_instance_hook("pre_reasoning", "metrics_subtask", _switch_subtask_phase)
+
+    # 每完成一个 SubTask 保存一次计划和记忆，传入同一运行编号重新运行时从断点继续
+    checkpoint = Checkpoint("travel_plan", query, run_id)
+    if checkpoint.path and not checkpoint.resumed:
+        print(f"运行编号：{checkpoint.run_id}（中断后传入该编号可从断点继续）")
+
+    def _save_checkpoint(self, kwargs, output):
+        plan = plan_notebook.current_plan
+        if plan is None:
+            return
+        finished = [_.name for _ in plan.subtasks if _.state == "done"]
+        if len(finished) > len(checkpoint.get("completed", [])):
+            checkpoint.save(
+                completed=finished,
+                plan_notebook=plan_notebook.state_dict(),
+                memories=memory_states({"agent": agent}),
+            )
+
+    agent.register_instance_hook("post_acting", "checkpoint", _save_checkpoint)
+
     user = UserAgent(name="User")
     msg = None
+    if checkpoint.resumed:
+        plan_notebook.load_state_dict(checkpoint.get("plan_notebook"))
+        load_memory_states({"agent": agent}, checkpoint.get("memories", {}))
+        msg = Msg(name="User", content="请从上次中断的地方继续，完成计划中尚未完成的子任务", role="user")
     while True:
-        msg = await agent(msg)
+        with metrics.phase("旅游计划"):
+            msg = await agent(msg)
         assistant_msg = msg.get_text_content()
         if assistant_msg and "Travel plan generation done!" in assistant_msg:
+            checkpoint.clear()
             return ToolResponse(content=[TextBlock(type="text", text="Travel plan generation done!")])
         msg = await user(msg)
         if msg.get_text_content() == "exit":
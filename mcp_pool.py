@@ -0,0 +1,448 @@
+"""MCP 会话池
+
+基于 HttpStatefulClient 维护一组常驻的 MCP 会话，避免 HttpStatelessClient 每次工具调用都重新建立
+streamable-HTTP 会话。工具列表（JSON Schema）只在首次启动时拉取一次并缓存。
+
+每个会话的 connect/close 都在各自的守护任务中完成（MCP 客户端要求进入和退出在同一个任务里），
+调用方只借用其中的 ClientSession。会话出现传输层异常或健康检查失败时会被替换，重连采用指数退避；
+重连失败的空位由健康检查继续补齐，借用会话最多等待 ACQUIRE_TIMEOUT 秒，不会无限期挂起。
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Callable
+from agentscope.mcp import HttpStatefulClient, MCPClientBase
+from agentscope.message import TextBlock
+from agentscope.tool import Toolkit, ToolResponse
+from mcp_cache import ToolResultCache
+
+import anyio, httpx, mcp
+import asyncio, json
+
+
+class MCPPoolConfig:
+    """MCP 会话池配置"""
+
+    # 常驻会话数
+    POOL_SIZE = 4
+
+    # 健康检查间隔（秒）
+    HEALTH_CHECK_INTERVAL = 30
+
+    # ping 超时（秒）
+    PING_TIMEOUT = 5
+
+    # 重连退避参数（秒）
+    RECONNECT_BASE_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30
+    MAX_RECONNECT_ATTEMPTS = 5
+
+    # 借用会话的最长等待时间（秒），超时说明所有会话都不可用
+    ACQUIRE_TIMEOUT = 30
+
+    # 批量调用工具单次最多包含的调用数
+    MAX_BATCH_CALLS = 20
+
+
+# 说明会话本身已不可用的异常；工具报错、参数错误、调用方取消等不会让会话失效
+_TRANSPORT_ERRORS = (
+    OSError,
+    EOFError,
+    httpx.TransportError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+def _is_transport_error(e: BaseException) -> bool:
+    if isinstance(e, BaseExceptionGroup):
+        # anyio 的任务组会把传输层异常包在异常组中
+        return any(_is_transport_error(_) for _ in e.exceptions)
+    return isinstance(e, _TRANSPORT_ERRORS)
+
+
+class _PooledSession:
+    """一个有状态 MCP 客户端及其守护任务"""
+
+    def __init__(self, name: str, url: str) -> None:
+        self.client = HttpStatefulClient(
+            name=name,
+            transport="streamable_http",
+            url=url,
+        )
+        self.error: BaseException | None = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def session(self) -> mcp.ClientSession:
+        assert self.client.session is not None
+        return self.client.session
+
+    @property
+    def alive(self) -> bool:
+        """守护任务仍在运行"""
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._keep())
+        await self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def _keep(self) -> None:
+        try:
+            await self.client.connect()
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+
+        self._ready.set()
+        try:
+            await self._stop.wait()
+        finally:
+            await self.client.close()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception:
+                pass
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(
+                self.session.send_ping(),
+                timeout=MCPPoolConfig.PING_TIMEOUT,
+            )
+            return True
+        except Exception:
+            return False
+
+
+class MCPSessionPool:
+    """MCP 会话池
+
+    Args:
+        name (``str``):
+            MCP 服务名称
+        url (``str``):
+            streamable-HTTP 服务地址
+        size (``int``):
+            常驻会话数
+        cache (``ToolResultCache | None``):
+            工具调用结果缓存，为空时不缓存
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        size: int = MCPPoolConfig.POOL_SIZE,
+        cache: ToolResultCache | None = None,
+    ) -> None:
+        self.name = name
+        self.url = url
+        self.size = size
+        self.cache = cache
+
+        self._idle: asyncio.Queue[_PooledSession] = asyncio.Queue()
+        # 借出中的会话，关闭时一并停止
+        self._borrowed: set[_PooledSession] = set()
+        # 进行中的替换任务
+        self._replacing: set[asyncio.Task] = set()
+        # 重连失败、等待健康检查补齐的空位数
+        self._missing = 0
+        self.last_error: BaseException | None = None
+        self._tools: list[mcp.types.Tool] = []
+        self._callables: dict[tuple[str, bool], Callable] = {}
+        self._lock = asyncio.Lock()
+        self._started = False
+        self._closed = False
+        self._health_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """预热会话并缓存工具列表，重复调用无副作用"""
+        if self._started:
+            return
+        async with self._lock:
+            if self._started:
+                return
+            self._closed = False
+            results = await asyncio.gather(
+                *[self._connect_with_backoff() for _ in range(self.size)],
+                return_exceptions=True,
+            )
+            sessions = [_ for _ in results if isinstance(_, _PooledSession)]
+            errors = [_ for _ in results if not isinstance(_, _PooledSession)]
+            if errors:
+                # 部分会话已经连上，不能留下无人管理的守护任务
+                for s in sessions:
+                    await s.stop()
+                raise errors[0]
+            try:
+                self._tools = (await sessions[0].session.list_tools()).tools
+            except BaseException:
+                for s in sessions:
+                    await s.stop()
+                raise
+            for s in sessions:
+                self._idle.put_nowait(s)
+            self._health_task = asyncio.create_task(self._health_check_loop())
+            self._started = True
+
+    async def close(self) -> None:
+        """关闭所有会话，包括借出中的会话和正在重连的会话"""
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for task in list(self._replacing):
+            task.cancel()
+        if self._replacing:
+            await asyncio.gather(*self._replacing, return_exceptions=True)
+        while not self._idle.empty():
+            await self._idle.get_nowait().stop()
+        for pooled in list(self._borrowed):
+            await pooled.stop()
+        self._borrowed.clear()
+        self._missing = 0
+        self._started = False
+        if self.cache is not None:
+            await self.cache.flush()
+
+    async def _connect_with_backoff(self) -> _PooledSession:
+        delay = MCPPoolConfig.RECONNECT_BASE_DELAY
+        for attempt in range(MCPPoolConfig.MAX_RECONNECT_ATTEMPTS):
+            pooled = _PooledSession(self.name, self.url)
+            try:
+                await pooled.start()
+                return pooled
+            except asyncio.CancelledError:
+                # 守护任务连上后会自行退出
+                pooled._stop.set()
+                raise
+            except Exception:
+                if attempt == MCPPoolConfig.MAX_RECONNECT_ATTEMPTS - 1:
+                    raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MCPPoolConfig.RECONNECT_MAX_DELAY)
+        raise RuntimeError("unreachable")
+
+    async def _replace(self, pooled: _PooledSession | None) -> None:
+        """停止 ``pooled`` 并补充一个新会话；重连失败时记下空位，由健康检查重试"""
+        if pooled is not None:
+            await pooled.stop()
+        try:
+            new = await self._connect_with_backoff()
+        except Exception as e:
+            self.last_error = e
+            self._missing += 1
+            return
+        if self._closed:
+            await new.stop()
+            return
+        self._idle.put_nowait(new)
+
+    def _spawn_replace(self, pooled: _PooledSession | None) -> None:
+        task = asyncio.create_task(self._replace(pooled))
+        self._replacing.add(task)
+        task.add_done_callback(self._replacing.discard)
+
+    async def _health_check_loop(self) -> None:
+        while True:
+            await asyncio.sleep(MCPPoolConfig.HEALTH_CHECK_INTERVAL)
+            try:
+                # 补齐之前重连失败的空位
+                missing, self._missing = self._missing, 0
+                for _ in range(missing):
+                    self._spawn_replace(None)
+                # 只检查当前空闲的会话，正在使用的会话出错时由 session() 负责替换
+                for _ in range(self._idle.qsize()):
+                    try:
+                        pooled = self._idle.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if pooled.alive and await pooled.ping():
+                        self._idle.put_nowait(pooled)
+                    else:
+                        self._spawn_replace(pooled)
+            except Exception as e:
+                self.last_error = e
+
+    async def _acquire(self) -> _PooledSession:
+        try:
+            pooled = await asyncio.wait_for(self._idle.get(), MCPPoolConfig.ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"MCP 服务 {self.name} 在 {MCPPoolConfig.ACQUIRE_TIMEOUT} 秒内没有可用会话"
+            ) from self.last_error
+        self._borrowed.add(pooled)
+        return pooled
+
+    async def _release(self, pooled: _PooledSession, broken: bool) -> None:
+        self._borrowed.discard(pooled)
+        if self._closed:
+            await pooled.stop()
+        elif broken or not pooled.alive:
+            self._spawn_replace(pooled)
+        else:
+            self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[mcp.ClientSession, None]:
+        """从池中借出一个会话，用完归还；只有出现传输层异常时才丢弃并重连"""
+        await self.start()
+        pooled = await self._acquire()
+        try:
+            yield pooled.session
+        except BaseException as e:
+            await self._release(pooled, _is_transport_error(e))
+            raise
+        await self._release(pooled, False)
+
+    async def list_tools(self) -> list[mcp.types.Tool]:
+        """返回缓存的工具列表"""
+        await self.start()
+        return self._tools
+
+    async def get_callable_function(
+        self,
+        func_name: str,
+        wrap_tool_result: bool = True,
+    ) -> Callable:
+        """获取走会话池的工具函数，带有 ``json_schema`` 属性，可直接注册到 Toolkit"""
+        key = (func_name, wrap_tool_result)
+        if key in self._callables:
+            return self._callables[key]
+
+        for tool in await self.list_tools():
+            if tool.name == func_name:
+                break
+        else:
+            raise ValueError(f"MCP 服务 {self.name} 中不存在工具 {func_name}")
+
+        async def _fetch(arguments: dict) -> mcp.types.CallToolResult:
+            async with self.session() as session:
+                return await session.call_tool(tool.name, arguments=arguments)
+
+        async def _call(**kwargs: Any) -> ToolResponse | mcp.types.CallToolResult:
+            if self.cache is None:
+                res = await _fetch(kwargs)
+            else:
+                res = await self.cache.get_or_call(
+                    tool.name, kwargs, lambda: _fetch(kwargs)
+                )
+            if not wrap_tool_result:
+                return res
+            return ToolResponse(
+                content=MCPClientBase._convert_mcp_content_to_as_blocks(res.content),
+                metadata=res.meta,
+            )
+
+        _call.__name__ = tool.name
+        _call.__doc__ = tool.description
+        _call.json_schema = {  # type: ignore[attr-defined]
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.inputSchema,
+            },
+        }
+        self._callables[key] = _call
+        return _call
+
+    async def get_batch_function(
+        self,
+        func_name: str = "batch_call",
+        description: str | None = None,
+        max_calls: int = MCPPoolConfig.MAX_BATCH_CALLS,
+    ) -> Callable:
+        """获取批量调用工具：一次传入多个工具调用，在会话池上并发执行，合并为一个 ToolResponse
+
+        单个调用失败不影响其他调用，失败信息会写在对应结果中。返回的函数同样带有 ``json_schema`` 属性。
+        """
+        tool_names = [_.name for _ in await self.list_tools()]
+
+        async def _run_one(index: int, call: Any) -> list[TextBlock]:
+            header = f"[{index}]"
+            try:
+                # 每一项单独校验，格式错误只影响这一项
+                if not isinstance(call, dict):
+                    raise TypeError(f"调用应为包含 tool_name 和 arguments 的对象，收到 {type(call).__name__}")
+                name, arguments = call.get("tool_name"), call.get("arguments") or {}
+                if not isinstance(arguments, dict):
+                    raise TypeError(f"arguments 应为对象，收到 {type(arguments).__name__}")
+                header = f"[{index}] {name} {json.dumps(arguments, ensure_ascii=False, default=str)}"
+                if name not in tool_names:
+                    return [TextBlock(type="text", text=f"{header}\n错误：工具 {name} 不存在")]
+                func = await self.get_callable_function(name, wrap_tool_result=False)
+                res = await func(**arguments)
+            except Exception as e:
+                return [TextBlock(type="text", text=f"{header}\n错误：{type(e).__name__}: {e}")]
+            if res.isError:
+                header += "\n错误："
+            return [
+                TextBlock(type="text", text=header),
+                *MCPClientBase._convert_mcp_content_to_as_blocks(res.content),
+            ]
+
+        async def _batch(calls: list[dict]) -> ToolResponse:
+            if not isinstance(calls, list):
+                return ToolResponse(content=[TextBlock(type="text", text="calls 应为调用列表")])
+            if len(calls) > max_calls:
+                return ToolResponse(
+                    content=[TextBlock(type="text", text=f"单次最多 {max_calls} 个调用，收到 {len(calls)} 个")],
+                )
+            results = await asyncio.gather(*[_run_one(i, _) for i, _ in enumerate(calls)])
+            return ToolResponse(content=[block for blocks in results for block in blocks])
+
+        _batch.__name__ = func_name
+        _batch.json_schema = {  # type: ignore[attr-defined]
+            "type": "function",
+            "function": {
+                "name": func_name,
+                "description": description or f"一次并发调用多个 {self.name} 工具，按序号返回各自的结果",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "calls": {
+                            "type": "array",
+                            "maxItems": max_calls,
+                            "description": "要执行的工具调用列表",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "tool_name": {"type": "string", "enum": tool_names},
+                                    "arguments": {"type": "object", "description": "该工具的参数"},
+                                },
+                                "required": ["tool_name", "arguments"],
+                            },
+                        },
+                    },
+                    "required": ["calls"],
+                },
+            },
+        }
+        return _batch
+
+    async def register_tools(
+        self,
+        toolkit: Toolkit,
+        group_name: str = "basic",
+        enable_funcs: list[str] | None = None,
+    ) -> None:
+        """将池中的工具注册到 Toolkit，使用缓存的 schema，不会再次请求远端"""
+        for tool in await self.list_tools():
+            if enable_funcs is not None and tool.name not in enable_funcs:
+                continue
+            func = await self.get_callable_function(tool.name)
+            toolkit.register_tool_function(
+                func,
+                group_name=group_name,
+                json_schema=func.json_schema,  # type: ignore[attr-defined]
+            )
@@ -0,0 +1,160 @@
+"""有上限的摘要记忆
+
+InMemoryMemory 会无限增长，小元这样的长会话里每一轮的提示词和格式化耗时都会越来越大。
+SummarizingMemory 给记忆设定 token 预算：超出预算后，在后台用一个便宜的模型把较早的普通对话
+压缩成滚动摘要，最近的若干条消息、工具调用/结果以及带结构化 metadata 的消息始终原样保留。
+"""
+from agentscope.memory import InMemoryMemory
+from agentscope.message import Msg
+from model_pool import ModelRegistry
+
+import asyncio, json, re
+
+
+class MemoryConfig:
+    """摘要记忆配置"""
+
+    # 记忆的 token 预算
+    TOKEN_BUDGET = 6000
+
+    # 始终原样保留的最近消息条数
+    KEEP_RECENT = 8
+
+    # 生成摘要用的模型
+    SUMMARY_MODEL = "qwen-turbo"
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中日韩字符按每字 1 个 token，其余按每 4 个字符 1 个 token"""
+    cjk = len(re.findall(r"[\u3000-\u9fff\uff00-\uffef]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _msg_tokens(msg: Msg) -> int:
+    if isinstance(msg.content, str):
+        text = msg.content
+    else:
+        text = json.dumps(msg.content, ensure_ascii=False)
+    return estimate_tokens(text) + 4
+
+
+class SummarizingMemory(InMemoryMemory):
+    """带 token 预算的摘要记忆，可直接通过 ``memory=`` 参数替换 InMemoryMemory
+
+    Args:
+        token_budget (``int``):
+            记忆的 token 预算，超出后触发压缩
+        keep_recent (``int``):
+            始终原样保留的最近消息条数
+        summary_model_name (``str``):
+            生成摘要用的模型
+    """
+
+    def __init__(
+        self,
+        token_budget: int = MemoryConfig.TOKEN_BUDGET,
+        keep_recent: int = MemoryConfig.KEEP_RECENT,
+        summary_model_name: str = MemoryConfig.SUMMARY_MODEL,
+    ) -> None:
+        super().__init__()
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary_model_name = summary_model_name
+
+        self.summary: str = ""
+        self.compactions: int = 0
+        self.tokens_compacted: int = 0
+        self._compact_task: asyncio.Task | None = None
+
+    @staticmethod
+    def _is_verbatim(msg: Msg) -> bool:
+        """工具调用/结果以及带结构化 metadata 的消息不参与摘要"""
+        return bool(msg.metadata) or (
+            not isinstance(msg.content, str)
+            and (msg.has_content_blocks("tool_use") or msg.has_content_blocks("tool_result"))
+        )
+
+    def token_count(self) -> int:
+        """当前记忆（含摘要）的估计 token 数"""
+        return estimate_tokens(self.summary) + sum(_msg_tokens(_) for _ in self.content)
+
+    def stats(self) -> dict:
+        return {
+            "messages": len(self.content),
+            "tokens": self.token_count(),
+            "token_budget": self.token_budget,
+            "summary_tokens": estimate_tokens(self.summary),
+            "compactions": self.compactions,
+            "tokens_compacted": self.tokens_compacted,
+        }
+
+    async def add(self, memories: Msg | list[Msg] | None, *args, **kwargs) -> None:
+        await super().add(memories, *args, **kwargs)
+        if self.token_count() > self.token_budget and (
+            self._compact_task is None or self._compact_task.done()
+        ):
+            # 在后台压缩，不阻塞当前回复
+            self._compact_task = asyncio.create_task(self._compact())
+
+    async def get_memory(self, *args, **kwargs) -> list[Msg]:
+        msgs = await super().get_memory(*args, **kwargs)
+        if not self.summary:
+            return msgs
+        return [
+            Msg(
+                name="历史摘要",
+                content=f"以下是更早对话的摘要：\n{self.summary}",
+                role="user",
+            ),
+            *msgs,
+        ]
+
+    async def clear(self) -> None:
+        await super().clear()
+        self.summary = ""
+
+    async def _compact(self) -> None:
+        candidates = [
+            _ for _ in self.content[: -self.keep_recent or None] if not self._is_verbatim(_)
+        ]
+        if not candidates:
+            return
+
+        transcript = "\n".join(f"{_.name}：{_.get_text_content()}" for _ in candidates)
+        model = ModelRegistry.get_model(self.summary_model_name, stream=False)
+        try:
+            res = await model(
+                [
+                    {
+                        "role": "system",
+                        "content": "你负责压缩对话记忆。请将已有摘要与新增对话合并为一份简洁的摘要，"
+                        "保留用户的需求、偏好、已做出的决定和关键事实，去掉寒暄与重复内容。",
+                    },
+                    {
+                        "role": "user",
+                        "content": f"已有摘要：\n{self.summary or '无'}\n\n新增对话：\n{transcript}",
+                    },
+                ]
+            )
+        except Exception:
+            # 摘要失败时保持原样，下次写入时再尝试
+            return
+        summary = "".join(_["text"] for _ in res.content if _["type"] == "text").strip()
+        if not summary:
+            return
+
+        # 压缩期间可能有新消息写入，只移除参与了摘要的那些
+        compacted_ids = {_.id for _ in candidates}
+        self.tokens_compacted += sum(_msg_tokens(_) for _ in candidates)
+        self.content = [_ for _ in self.content if _.id not in compacted_ids]
+        self.summary = summary
+        self.compactions += 1
+
+    def state_dict(self) -> dict:
+        return {**super().state_dict(), "summary": self.summary}
+
+    def load_state_dict(self, state_dict: dict, strict: bool = True) -> None:
+        self.summary = state_dict.get("summary", "")
+        super().load_state_dict(
+            {k: v for k, v in state_dict.items() if k != "summary"}, strict=strict
+        )
@@ -0,0 +1,293 @@
+"""不阻塞对话的本地长期记忆
+
+Mem0LongTermMemory 在 static_control 模式下每一轮回复前都要调用一次向量模型检索、回复后再同步写入，
+这些耗时都压在回复路径上。LocalLongTermMemory 把代价移出回复路径：
+
+- 写入：``record`` 只把新出现的消息（按 id 去重）放进队列立即返回，后台任务攒够一批或等待片刻后
+  统一向量化并追加到本地向量索引（vector_store.py），多轮对话的向量化合并成一次调用；
+- 读取：最近的检索结果按查询文本放在 LRU 缓存中，索引新增条目后只对新增部分打分并合并进缓存结果；
+- 启动：索引文件在第一次用到时才在线程中加载，加载完成前的检索直接返回空结果，不等待；
+  索引文件损坏或无法读取时打印提示，本次运行改用内存中的空索引，不影响对话。
+
+向量化后端与语义缓存、知识库相同（见 embedding.py），默认的本地哈希向量检索只需毫秒级。
+"""
+from collections import OrderedDict
+from typing import Any
+from agentscope.memory import LongTermMemoryBase
+from agentscope.message import Msg, TextBlock
+from agentscope.tool import ToolResponse
+from settings import settings
+
+import asyncio, os, re, time
+
+
+class LongTermConfig:
+    """长期记忆配置"""
+
+    # 攒够多少条消息立即向量化，否则最多等待 FLUSH_INTERVAL 秒
+    BATCH_SIZE = 16
+    FLUSH_INTERVAL = 2.0
+
+    # 检索返回的条数与最低相似度
+    TOP_K = 3
+    MIN_SCORE = 0.3
+
+    # 检索结果 LRU 缓存的条数
+    CACHE_SIZE = 128
+
+    # 每条记忆保存的最大字数，过短的消息（“好的”“exit”）不保存
+    MAX_CHARS = 500
+    MIN_CHARS = 4
+
+    # 不写入长期记忆的消息：短期记忆的摘要和长期记忆自身的检索结果
+    SKIP_NAMES = ("历史摘要", "long_term_memory")
+
+
+def _text(msg: Msg) -> str:
+    if not isinstance(msg.content, str) and (
+        msg.has_content_blocks("tool_use") or msg.has_content_blocks("tool_result")
+    ):
+        return ""
+    return (msg.get_text_content() or "").strip()
+
+
+class LocalLongTermMemory(LongTermMemoryBase):
+    """本地向量索引上的长期记忆，可直接通过 ``long_term_memory=`` 参数传给 ReActAgent
+
+    Args:
+        agent_name (``str``):
+            智能体名称，与 ``user_id`` 一起决定索引文件名
+        user_id (``str | None``):
+            用户标识，不同用户的记忆存放在不同的索引中，为空时为本机的单用户
+        top_k (``int``):
+            每次检索返回的条数
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        user_id: str | None = None,
+        top_k: int = LongTermConfig.TOP_K,
+    ) -> None:
+        super().__init__()
+        self.agent_name = agent_name
+        self.user_id = user_id
+        self.top_k = top_k
+
+        self._store = None
+        self._loader: asyncio.Task | None = None
+        # 已写入或排队中的消息 id
+        self._seen: set[str] = set()
+        self._queue: list[dict] = []
+        self._batch_ready = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._closing = False
+        # 查询文本 -> (查询向量, 检索结果, 检索时的索引条数)
+        self._cache: OrderedDict[str, tuple[Any, list[tuple[dict, float]], int]] = OrderedDict()
+
+        self.indexed = 0
+        self.dropped = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _open_store(self, persistent: bool = True):
+        # 在线程中执行：导入 numpy、映射索引文件、读取记录；persistent 为 False 时只建内存索引
+        from embedding import get_embedder
+        from vector_store import VectorStore
+
+        embedder = get_embedder()
+        if not persistent:
+            return VectorStore(None, embedder.dim), set()
+        name = self.agent_name
+        if self.user_id is not None:
+            # 用户标识只保留安全字符，不能跳出索引目录
+            name += "." + re.sub(r"[^0-9A-Za-z_-]", "_", self.user_id)
+        path = (
+            os.path.join(settings.vector_dir, f"long_term.{name}.{embedder.backend}")
+            if settings.vector_dir else None
+        )
+        store = VectorStore(path, embedder.dim)
+        seen = {_["msg_id"] for _ in store.alive_records()}
+        return store, seen
+
+    def preload(self) -> None:
+        """在后台开始加载索引（需在事件循环中调用），不等待加载完成"""
+        self._ensure_loading()
+
+    def _ensure_loading(self) -> bool:
+        """索引已加载时返回 True，否则在后台开始加载并返回 False"""
+        if self._store is not None:
+            return True
+        if self._loader is None:
+            self._loader = asyncio.create_task(self._load())
+        return False
+
+    async def _load(self) -> None:
+        try:
+            store, seen = await asyncio.to_thread(self._open_store)
+        except Exception as e:
+            print(f"[长期记忆] 加载 {self.agent_name} 的索引失败，本次运行只在内存中保存：{type(e).__name__}: {e}")
+            try:
+                store, seen = await asyncio.to_thread(self._open_store, False)
+            except Exception:
+                # 连内存索引也建不起来（如向量化后端不可用），下次用到时重试
+                self._loader = None
+                return
+        self._seen |= seen
+        self._store = store
+
+    async def record(self, msgs: list[Msg | None], **kwargs: Any) -> None:
+        """把新出现的消息放入后台写入队列，立即返回"""
+        self._ensure_loading()
+        for msg in msgs:
+            if msg is None or msg.id in self._seen or msg.name in LongTermConfig.SKIP_NAMES:
+                continue
+            self._seen.add(msg.id)
+            text = _text(msg)
+            if len(text) < LongTermConfig.MIN_CHARS:
+                continue
+            self._queue.append({
+                "msg_id": msg.id,
+                "name": msg.name,
+                "role": msg.role,
+                "text": text[: LongTermConfig.MAX_CHARS],
+                "created_at": time.time(),
+            })
+
+        if len(self._queue) >= LongTermConfig.BATCH_SIZE:
+            self._batch_ready.set()
+        if self._queue and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        from embedding import get_embedder
+
+        while self._queue:
+            if len(self._queue) < LongTermConfig.BATCH_SIZE and not self._closing:
+                try:
+                    # 等待片刻，把接下来几轮对话合并成一批
+                    await asyncio.wait_for(self._batch_ready.wait(), LongTermConfig.FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            if self._store is None:
+                self._ensure_loading()
+                await self._loader  # type: ignore[misc]
+            if self._store is None:
+                # 索引无法加载，丢弃排队的消息
+                self.dropped += len(self._queue)
+                self._queue = []
+                break
+
+            batch = self._queue[: LongTermConfig.BATCH_SIZE]
+            self._queue = self._queue[LongTermConfig.BATCH_SIZE:]
+            try:
+                vectors = await get_embedder().embed([f"{_['name']}：{_['text']}" for _ in batch])
+                self._store.add(vectors, batch)
+            except Exception:
+                # 向量化或写入失败只影响长期记忆，丢弃这一批，不影响对话
+                self.dropped += len(batch)
+                continue
+            self.indexed += len(batch)
+
+    async def retrieve(self, msg: Msg | list[Msg] | None, limit: int | None = None, **kwargs: Any) -> str:
+        """检索与 ``msg`` 相关的记忆，索引尚未加载完成时返回空字符串"""
+        if msg is None:
+            return ""
+        msgs = msg if isinstance(msg, list) else [msg]
+        query = "\n".join(_text(_) for _ in msgs if _ is not None).strip()
+        if not query or not self._ensure_loading():
+            return ""
+        return self._format(await self._search(query, limit or self.top_k))
+
+    async def _search(self, query: str, k: int) -> list[tuple[dict, float]]:
+        from embedding import get_embedder
+
+        store = self._store
+        total = len(store.records)
+        cached = self._cache.get(query)
+        if cached is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(query)
+            vector, results, indexed = cached
+            if indexed < total:
+                # 只对缓存之后新增的记忆打分，与缓存结果合并
+                results = sorted(results + store.search(vector, k, start=indexed), key=lambda _: -_[1])[:k]
+        else:
+            self.cache_misses += 1
+            vector = (await get_embedder().embed([query]))[0]
+            results = store.search(vector, k)
+        results = [_ for _ in results if _[1] >= LongTermConfig.MIN_SCORE]
+
+        self._cache[query] = (vector, results, total)
+        while len(self._cache) > LongTermConfig.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return results
+
+    @staticmethod
+    def _format(results: list[tuple[dict, float]]) -> str:
+        return "\n".join(
+            f"- [{time.strftime('%Y-%m-%d %H:%M', time.localtime(record['created_at']))}] "
+            f"{record['name']}：{record['text']}"
+            for record, _ in results
+        )
+
+    async def record_to_memory(self, thinking: str, content: list[str], **kwargs: Any) -> ToolResponse:
+        """把重要的信息记入长期记忆，例如用户的偏好、身份信息和明确的要求
+
+        Args:
+            thinking (`str`):
+                为什么要记住这些信息
+            content (`list[str]`):
+                要记住的内容，每条一句话
+        """
+        await self.record([Msg(name=self.agent_name, content=_, role="assistant") for _ in content])
+        return ToolResponse(content=[TextBlock(type="text", text=f"已记录 {len(content)} 条信息。")])
+
+    async def retrieve_from_memory(self, keywords: list[str], **kwargs: Any) -> ToolResponse:
+        """根据关键词从长期记忆中检索相关信息
+
+        Args:
+            keywords (`list[str]`):
+                检索关键词，如人名、地点、偏好
+        """
+        text = await self.retrieve(Msg(name="user", content=" ".join(keywords), role="user"))
+        return ToolResponse(content=[TextBlock(type="text", text=text or "没有找到相关的记忆。")])
+
+    async def close(self) -> None:
+        """立即写入队列中剩余的消息，退出前调用，不会抛出异常"""
+        self._closing = True
+        self._batch_ready.set()
+        if self._worker is not None:
+            try:
+                await self._worker
+            except Exception as e:
+                print(f"[长期记忆] 写入 {self.agent_name} 的剩余消息失败：{type(e).__name__}: {e}")
+
+    def stats(self) -> dict:
+        total = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._store) if self._store is not None else None,
+            "indexed": self.indexed,
+            "queued": len(self._queue),
+            "dropped": self.dropped,
+            "cache_hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+        }
+
+
+# (智能体名, 用户标识) -> 长期记忆；同一索引文件只能有一个写入者，同一用户的多个会话共享同一个实例
+_memories: dict[tuple[str, str | None], LocalLongTermMemory] = {}
+
+
+def get_long_term_memory(agent_name: str, user_id: str | None = None) -> LocalLongTermMemory:
+    """获取进程内 ``agent_name`` 在用户 ``user_id`` 下的长期记忆，不同用户之间互不可见"""
+    key = (agent_name, user_id)
+    if key not in _memories:
+        _memories[key] = LocalLongTermMemory(agent_name, user_id)
+    return _memories[key]
+
+
+async def close_long_term_memories() -> None:
+    """写入所有长期记忆队列中剩余的消息"""
+    for memory in _memories.values():
+        await memory.close()
@@ -0,0 +1,232 @@
+"""耗时、token 与工具调用指标
+
+统一记录每次模型调用（首 token 时间、总耗时、输入/输出 token）、每次智能体回复和每次工具调用的耗时，
+按“阶段”（辩论环节、旅游计划等）打标签，可以导出为 Prometheus 文本格式（可交给 node_exporter 的
+textfile collector 采集），也可以打印一张本次运行的汇总表。
+
+模型调用由 model_pool 直接上报；智能体回复和工具调用通过 ReActAgent 的类级 hook 采集，
+调用一次 ``MetricsRegistry.install()`` 即对所有 ReActAgent 生效。
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Generator
+from agentscope.agent import ReActAgent
+from settings import settings
+
+import os, time
+
+
+# 当前阶段及其开始时间，用于给指标打标签并统计各阶段的墙钟耗时
+_phase: ContextVar[tuple[str, float]] = ContextVar("metrics_phase", default=("default", 0.0))
+
+
+@contextmanager
+def phase(name: str) -> Generator[None, None, None]:
+    """在上下文内把指标归到阶段 ``name`` 下，退出时记录该阶段的墙钟耗时
+
+    上下文内用 switch_phase 切换过子阶段时，退出时先结束当前子阶段，再记录 ``name`` 本身的耗时。
+    """
+    start = time.perf_counter()
+    token = _phase.set((name, start))
+    try:
+        yield
+    finally:
+        if _phase.get() != (name, start):
+            _close_phase()
+        MetricsRegistry.observe("phase_seconds", time.perf_counter() - start, phase=name)
+        _phase.reset(token)
+
+
+def switch_phase(name: str) -> None:
+    """在当前阶段内切换到新的子阶段（如旅游计划的各个 SubTask），并结束上一个子阶段的计时"""
+    if _phase.get()[0] == name:
+        return
+    _close_phase()
+    _phase.set((name, time.perf_counter()))
+
+
+def _close_phase() -> None:
+    name, start = _phase.get()
+    if start:
+        MetricsRegistry.observe("phase_seconds", time.perf_counter() - start, phase=name)
+
+
+def current_phase() -> str:
+    return _phase.get()[0]
+
+
+def _escape(value: str) -> str:
+    """Prometheus 标签值转义"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Stat:
+    """计数、总和与最大值"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+class MetricsRegistry:
+    """进程级指标注册表"""
+
+    # (指标名, 标签) -> 统计值
+    _stats: dict[tuple[str, tuple[tuple[str, str], ...]], _Stat] = {}
+
+    _HELP = {
+        "model_latency_seconds": "模型调用总耗时",
+        "model_ttft_seconds": "模型首 token 时间",
+        "model_input_tokens": "模型输入 token 数",
+        "model_output_tokens": "模型输出 token 数",
+        "agent_reply_seconds": "智能体单次回复耗时",
+        "tool_latency_seconds": "工具调用耗时",
+        "phase_seconds": "各阶段的墙钟耗时",
+        "route_latency_seconds": "各路由的模型调用耗时（流式调用到输出结束为止）",
+        "route_cost_yuan": "各路由按单价估算的花费（元）",
+        "route_fallbacks": "各路由因限流或超时换用后备模型的次数",
+        "free_debate_summary_fallbacks": "自由辩论摘要失败、退化为保留首句的次数",
+    }
+
+    _installed = False
+    _reply_starts: dict[int, list[float]] = {}
+    _tool_starts: dict[str, float] = {}
+
+    @classmethod
+    def observe(cls, metric: str, value: float, **labels: str) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        stat = cls._stats.get(key)
+        if stat is None:
+            stat = cls._stats[key] = _Stat()
+        stat.observe(value)
+
+    @classmethod
+    def record_model_call(
+        cls,
+        model: str,
+        latency: float,
+        ttft: float,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+    ) -> None:
+        labels = {"model": model, "phase": current_phase()}
+        cls.observe("model_latency_seconds", latency, **labels)
+        cls.observe("model_ttft_seconds", ttft, **labels)
+        cls.observe("model_input_tokens", input_tokens, **labels)
+        cls.observe("model_output_tokens", output_tokens, **labels)
+
+    @classmethod
+    def install(cls) -> None:
+        """为所有 ReActAgent 注册回复与工具调用的计时 hook，重复调用无副作用"""
+        if cls._installed:
+            return
+        cls._installed = True
+        ReActAgent.register_class_hook("pre_reply", "metrics", cls._pre_reply)
+        ReActAgent.register_class_hook("post_reply", "metrics", cls._post_reply)
+        ReActAgent.register_class_hook("pre_acting", "metrics", cls._pre_acting)
+        ReActAgent.register_class_hook("post_acting", "metrics", cls._post_acting)
+
+    @classmethod
+    def _pre_reply(cls, self: ReActAgent, kwargs: dict[str, Any]) -> None:
+        cls._reply_starts.setdefault(id(self), []).append(time.perf_counter())
+
+    @classmethod
+    def _post_reply(cls, self: ReActAgent, kwargs: dict[str, Any], output: Any) -> None:
+        starts = cls._reply_starts.get(id(self))
+        if not starts:
+            return
+        cls.observe(
+            "agent_reply_seconds",
+            time.perf_counter() - starts.pop(),
+            agent=self.name,
+            phase=current_phase(),
+        )
+        if not starts:
+            del cls._reply_starts[id(self)]
+
+    @classmethod
+    def _pre_acting(cls, self: ReActAgent, kwargs: dict[str, Any]) -> None:
+        cls._tool_starts[kwargs["tool_call"]["id"]] = time.perf_counter()
+
+    @classmethod
+    def _post_acting(cls, self: ReActAgent, kwargs: dict[str, Any], output: Any) -> None:
+        tool_call = kwargs["tool_call"]
+        start = cls._tool_starts.pop(tool_call["id"], None)
+        if start is None:
+            return
+        cls.observe(
+            "tool_latency_seconds",
+            time.perf_counter() - start,
+            tool=tool_call["name"],
+            phase=current_phase(),
+        )
+
+    @classmethod
+    def to_prometheus(cls) -> str:
+        """导出为 Prometheus 文本格式，每个指标以 summary 的 _count/_sum 形式给出"""
+        lines = []
+        for metric in sorted({_[0] for _ in cls._stats}):
+            name = f"agentscope_{metric}"
+            lines.append(f"# HELP {name} {cls._HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {name} summary")
+            for (m, labels), stat in sorted(cls._stats.items()):
+                if m != metric:
+                    continue
+                label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}_count{{{label_str}}} {stat.count}")
+                lines.append(f"{name}_sum{{{label_str}}} {stat.total:.6f}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def write_prometheus(cls, path: str) -> None:
+        """原子地写入 Prometheus 文本文件"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(cls.to_prometheus())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def summary_table(cls) -> str:
+        """本次运行的汇总表"""
+        header = f"{'指标':<24}{'标签':<48}{'次数':>8}{'总计':>12}{'平均':>10}{'最大':>10}"
+        rows = [header, "-" * len(header)]
+        for (metric, labels), stat in sorted(cls._stats.items()):
+            label_str = ",".join(f"{k}={v}" for k, v in labels)
+            rows.append(
+                f"{metric:<24}{label_str:<48}{stat.count:>8}{stat.total:>12.2f}"
+                f"{stat.total / stat.count:>10.2f}{stat.max:>10.2f}"
+            )
+        return "\n".join(rows)
+
+    @classmethod
+    def report(cls) -> None:
+        """打印汇总表；设置了 METRICS_PROM_PATH 时同时写出 Prometheus 文件"""
+        print(cls.summary_table())
+        path = settings.metrics_prom_path
+        if path:
+            cls.write_prometheus(path)
+
+    @classmethod
+    def snapshot(cls) -> dict[str, dict[str, dict[str, float]]]:
+        """按指标、标签汇总的统计值，便于保存为 JSON"""
+        result: dict[str, dict[str, dict[str, float]]] = {}
+        for (metric, labels), stat in sorted(cls._stats.items()):
+            label_str = ",".join(f"{k}={v}" for k, v in labels)
+            result.setdefault(metric, {})[label_str] = {
+                "count": stat.count,
+                "total": round(stat.total, 6),
+                "max": round(stat.max, 6),
+            }
+        return result
+
+    @classmethod
+    def reset(cls) -> None:
+        cls._stats.clear()
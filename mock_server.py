@@ -0,0 +1,544 @@
+"""本地 DashScope / 高德 MCP 替身服务
+
+在没有网络、没有真实 API Key 的环境下运行 start_debate、generate_travel_plan 和 main() 的压测与性能分析。
+
+- DashScope：实现原生的文本生成接口 ``/api/v1/services/aigc/text-generation/generation``，
+  支持流式（SSE）与非流式、思考模式（reasoning_content）以及工具调用。请求里带有
+  ``generate_response`` 工具时（即 ReActAgent 的结构化输出），按其 JSON Schema 生成参数并发起调用。
+- 高德 MCP：用 FastMCP 提供 streamable-HTTP 的同名工具（天气、地理编码、POI、路径规划等）。
+
+所有输出（包括工具调用 id 和错误注入）都由请求内容的哈希决定，相同请求得到相同结果，
+同一请求的重试按第几次出现派生不同的随机数；首包延迟、token 速率和错误注入比例均可配置。
+
+用法：
+    python mock_server.py --latency 0.2 --token-rate 80 --error-rate 0.01
+
+    DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8100/api/v1 \\
+    AMAP_MCP_URL=http://127.0.0.1:8101/mcp \\
+    DASHSCOPE_API_KEY=mock AMAP_MAPS_API_KEY=mock python main.py
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+from aiohttp import web
+from mcp.server.fastmcp import FastMCP
+
+import argparse, asyncio, hashlib, json, random
+
+
+class MockConfig:
+    """替身服务配置"""
+
+    HOST = "127.0.0.1"
+    DASHSCOPE_PORT = 8100
+    MCP_PORT = 8101
+
+    # 首包延迟（秒）
+    LATENCY = 0.2
+
+    # 流式输出速率（token/秒），0 表示不限速
+    TOKEN_RATE = 80.0
+
+    # 输入处理速率（token/秒），首包前按输入 token 数额外等待，0 表示不模拟
+    PREFILL_RATE = 0.0
+
+    # 每次回复的 token 数（按字计）
+    REPLY_TOKENS = 120
+
+    # 请求失败的比例（DashScope 返回 429，MCP 工具返回错误）
+    ERROR_RATE = 0.0
+
+    # MCP 工具调用延迟（秒）
+    TOOL_LATENCY = 0.05
+
+    # 脚本化回复：[{"match": "出现在最后一条消息或系统提示词中的子串", "reply": "回复内容"}]
+    SCRIPT: list[dict] = []
+
+    # 带有计划工具（PlanNotebook）的请求中，依次完成的 SubTask 个数；
+    # 每个 SubTask 先调用一次高德工具再调用 finish_subtask，0 表示不模拟计划执行
+    PLAN_SUBTASKS = 0
+
+
+_SENTENCES = [
+    "从数据上看，这一趋势在近五年内持续增强。",
+    "对方的论证忽略了一个关键前提。",
+    "我们需要区分短期成本与长期收益。",
+    "以实际案例来说明，这种做法已经被多地验证。",
+    "这一观点在逻辑上并不自洽。",
+    "公平与效率之间并非简单的取舍关系。",
+    "权威机构的评测结果支持这一判断。",
+    "如果按照对方的逻辑推演下去，结论将难以接受。",
+]
+
+
+def _rng(*parts: Any) -> random.Random:
+    """由请求内容派生的确定性随机数发生器"""
+    digest = hashlib.sha256(
+        json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode()
+    ).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _call_id(rng: random.Random) -> str:
+    return f"call_{rng.getrandbits(48):012x}"
+
+
+class _Attempts:
+    """记录每个请求第几次出现，重试时派生不同但确定的随机数"""
+
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+
+    def rng(self, *parts: Any) -> random.Random:
+        key = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        attempt = self._counts.get(key, 0)
+        self._counts[key] = attempt + 1
+        return _rng("attempt", key, attempt)
+
+
+def _text(rng: random.Random, n_tokens: int) -> str:
+    text = ""
+    while len(text) < n_tokens:
+        text += rng.choice(_SENTENCES)
+    return text[:n_tokens]
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(str(_.get("text", "")) for _ in content if isinstance(_, dict))
+    return str(content)
+
+
+def _fake_value(schema: dict, key: str, rng: random.Random, defs: dict) -> Any:
+    """按 JSON Schema 生成一个合法的值"""
+    if "$ref" in schema:
+        schema = defs.get(schema["$ref"].split("/")[-1], {})
+    if "anyOf" in schema:
+        schema = next((_ for _ in schema["anyOf"] if _.get("type") != "null"), {})
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    kind = schema.get("type", "string")
+    if kind == "object":
+        return {
+            k: _fake_value(v, k, rng, defs)
+            for k, v in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        n = max(schema.get("minItems", 4), 1)
+        return [_fake_value(schema.get("items", {}), key, rng, defs) for _ in range(n)]
+    if kind == "integer":
+        return rng.randint(5, 9)
+    if kind == "number":
+        return round(rng.uniform(5, 9), 1)
+    if kind == "boolean":
+        return True
+    return f"{key}：{_text(rng, 40)}"
+
+
+class MockDashScope:
+    """DashScope 文本生成接口替身"""
+
+    def __init__(self, config: type[MockConfig] = MockConfig) -> None:
+        self.config = config
+        self.requests = 0
+        self._attempts = _Attempts()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(
+            "/api/v1/services/aigc/text-generation/generation", self.generation
+        )
+        return app
+
+    def _plan(self, body: dict) -> tuple[dict, dict]:
+        """决定本次的回复消息和 usage"""
+        messages = body.get("input", {}).get("messages", [])
+        parameters = body.get("parameters", {})
+        tools = parameters.get("tools") or []
+        rng = _rng(body.get("model"), messages, [_["function"]["name"] for _ in tools])
+
+        last = _message_text(messages[-1]) if messages else ""
+        system = _message_text(messages[0]) if messages and messages[0].get("role") == "system" else ""
+
+        reply = None
+        for item in self.config.SCRIPT:
+            if item["match"] in last or item["match"] in system:
+                reply = item["reply"]
+                break
+        if reply is None:
+            # 与真实服务一样，回复长度不超过请求的 max_tokens
+            reply = _text(rng, min(self.config.REPLY_TOKENS, parameters.get("max_tokens") or self.config.REPLY_TOKENS))
+
+        message: dict = {"role": "assistant", "content": reply}
+        tool_call = self._plan_tool_call(messages, tools, rng)
+        if tool_call is not None:
+            message = {"role": "assistant", "content": "", "tool_calls": [tool_call]}
+            # 计划尚未执行完，不调用 generate_response 结束回复
+            tools = []
+
+        response_format = parameters.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            # 结构化输出：按请求中的 Schema 生成合法的 JSON
+            schema = response_format.get("json_schema", {}).get("schema", {})
+            arguments = _fake_value(schema, "response", rng, schema.get("$defs", {}))
+            message = {"role": "assistant", "content": json.dumps(arguments, ensure_ascii=False)}
+
+        finish = next(
+            (_ for _ in tools if _["function"]["name"] == "generate_response"), None
+        )
+        if finish is not None:
+            schema = finish["function"].get("parameters", {})
+            arguments = _fake_value(schema, "response", rng, schema.get("$defs", {}))
+            if "response" in arguments:
+                arguments["response"] = reply
+            message = {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "index": 0,
+                        "id": _call_id(rng),
+                        "type": "function",
+                        "function": {
+                            "name": "generate_response",
+                            "arguments": json.dumps(arguments, ensure_ascii=False),
+                        },
+                    }
+                ],
+            }
+        if parameters.get("enable_thinking"):
+            message["reasoning_content"] = _text(rng, self.config.REPLY_TOKENS // 4)
+
+        input_tokens = sum(len(_message_text(_)) for _ in messages)
+        output_tokens = len(reply) + len(message.get("reasoning_content", ""))
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return message, usage
+
+    def _plan_tool_call(
+        self, messages: list[dict], tools: list[dict], rng: random.Random
+    ) -> dict | None:
+        """模拟按计划逐个完成 SubTask：每个 SubTask 先调用一次高德工具，再调用 finish_subtask"""
+        schemas = {_["function"]["name"]: _["function"].get("parameters", {}) for _ in tools}
+        if not self.config.PLAN_SUBTASKS or "finish_subtask" not in schemas:
+            return None
+
+        calls = [
+            c["function"]["name"]
+            for m in messages
+            if m.get("role") == "assistant"
+            for c in m.get("tool_calls") or []
+        ]
+        done = calls.count("finish_subtask")
+        if done >= self.config.PLAN_SUBTASKS:
+            return None
+
+        map_tool = next((_ for _ in ["maps_text_search", "maps_weather"] if _ in schemas), None)
+        if map_tool is not None and (not calls or calls[-1] == "finish_subtask"):
+            name = map_tool
+            arguments = _fake_value(schemas[name], name, rng, {})
+        else:
+            name = "finish_subtask"
+            arguments = _fake_value(schemas[name], name, rng, {})
+            if "subtask_idx" in arguments:
+                arguments["subtask_idx"] = done
+        return {
+            "index": 0,
+            "id": _call_id(rng),
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+        }
+
+    async def generation(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(self.config.LATENCY)
+
+        rng = self._attempts.rng(body)
+        request_id = f"{rng.getrandbits(128):032x}"
+        if rng.random() < self.config.ERROR_RATE:
+            return web.json_response(
+                {
+                    "code": "Throttling.RateQuota",
+                    "message": "Injected error from mock server.",
+                    "request_id": request_id,
+                },
+                status=429,
+            )
+
+        message, usage = self._plan(body)
+        if self.config.PREFILL_RATE > 0:
+            await asyncio.sleep(usage["input_tokens"] / self.config.PREFILL_RATE)
+        stream = request.headers.get("X-DashScope-SSE") == "enable" or "text/event-stream" in request.headers.get("Accept", "")
+        if not stream:
+            finish_reason = "tool_calls" if "tool_calls" in message else "stop"
+            return web.json_response(
+                {
+                    "output": {"choices": [{"finish_reason": finish_reason, "message": message}]},
+                    "usage": usage,
+                    "request_id": request_id,
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        incremental = body.get("parameters", {}).get("incremental_output", False)
+        async for chunk in self._chunks(message, incremental):
+            data = {"output": {"choices": [chunk]}, "usage": usage, "request_id": request_id}
+            await response.write(
+                f"id:{request_id}\nevent:result\n:HTTP_STATUS/200\ndata:{json.dumps(data, ensure_ascii=False)}\n\n".encode()
+            )
+        await response.write_eof()
+        return response
+
+    async def _chunks(
+        self, message: dict, incremental: bool
+    ) -> AsyncGenerator[dict, None]:
+        """按 token 速率切分流式分块；工具调用在最后一个分块中一次性给出"""
+        delay = 1.0 / self.config.TOKEN_RATE if self.config.TOKEN_RATE > 0 else 0.0
+        step = 4
+        sent = {"reasoning_content": "", "content": ""}
+        for field in ["reasoning_content", "content"]:
+            text = message.get(field) or ""
+            for i in range(0, len(text), step):
+                piece = text[i : i + step]
+                sent[field] += piece
+                if incremental:
+                    delta = {"role": "assistant", "content": "", "reasoning_content": ""}
+                    delta[field] = piece
+                else:
+                    delta = {"role": "assistant", **sent}
+                yield {"finish_reason": "null", "message": delta}
+                if delay:
+                    await asyncio.sleep(delay * len(piece))
+
+        final: dict = {"role": "assistant", "content": "" if incremental else sent["content"]}
+        if "tool_calls" in message:
+            final["tool_calls"] = message["tool_calls"]
+        yield {
+            "finish_reason": "tool_calls" if "tool_calls" in message else "stop",
+            "message": final,
+        }
+
+
+def create_mock_amap(config: type[MockConfig] = MockConfig) -> FastMCP:
+    """高德 MCP 工具替身"""
+    server = FastMCP("mock-amap", host=config.HOST, port=config.MCP_PORT, stateless_http=False)
+    attempts = _Attempts()
+
+    async def _respond(tool: str, **kwargs: Any) -> str:
+        await asyncio.sleep(config.TOOL_LATENCY)
+        if attempts.rng(tool, kwargs).random() < config.ERROR_RATE:
+            raise RuntimeError("Injected error from mock server.")
+        rng = _rng(tool, kwargs)
+        if tool == "maps_weather":
+            return json.dumps(
+                {
+                    "city": kwargs.get("city"),
+                    "forecasts": [
+                        {
+                            "date": f"2025-01-0{i + 1}",
+                            "dayweather": rng.choice(["晴", "多云", "小雨"]),
+                            "daytemp": str(rng.randint(5, 30)),
+                            "nighttemp": str(rng.randint(-5, 20)),
+                        }
+                        for i in range(4)
+                    ],
+                },
+                ensure_ascii=False,
+            )
+        if tool in ("maps_geo", "maps_regeocode"):
+            return json.dumps(
+                {
+                    "results": [
+                        {
+                            "location": f"{rng.uniform(113, 117):.6f},{rng.uniform(22, 40):.6f}",
+                            "formatted_address": f"{kwargs.get('city') or ''}{kwargs.get('address') or kwargs.get('location')}",
+                        }
+                    ]
+                },
+                ensure_ascii=False,
+            )
+        if tool in ("maps_text_search", "maps_around_search"):
+            return json.dumps(
+                {
+                    "pois": [
+                        {
+                            "id": f"B0{rng.randint(10**7, 10**8 - 1)}",
+                            "name": f"{kwargs.get('keywords') or '景点'}{i + 1}号",
+                            "address": f"模拟路{rng.randint(1, 999)}号",
+                            "location": f"{rng.uniform(113, 117):.6f},{rng.uniform(22, 40):.6f}",
+                        }
+                        for i in range(5)
+                    ]
+                },
+                ensure_ascii=False,
+            )
+        if tool == "maps_search_detail":
+            return json.dumps(
+                {"id": kwargs.get("id"), "name": "模拟地点", "rating": f"{rng.uniform(3.5, 5):.1f}", "cost": str(rng.randint(0, 300))},
+                ensure_ascii=False,
+            )
+        if tool == "maps_distance":
+            return json.dumps(
+                {
+                    "results": [
+                        {
+                            "origin_id": str(i + 1),
+                            "dest_id": "1",
+                            "distance": str(rng.randint(500, 30000)),
+                            "duration": str(rng.randint(300, 5400)),
+                        }
+                        for i in range(len((kwargs.get("origins") or "").split("|")))
+                    ]
+                },
+                ensure_ascii=False,
+            )
+        # 路径规划
+        return json.dumps(
+            {
+                "distance": str(rng.randint(500, 30000)),
+                "duration": str(rng.randint(300, 5400)),
+            },
+            ensure_ascii=False,
+        )
+
+    @server.tool()
+    async def maps_weather(city: str) -> str:
+        """根据城市名称或者标准adcode查询指定城市的天气"""
+        return await _respond("maps_weather", city=city)
+
+    @server.tool()
+    async def maps_geo(address: str, city: str | None = None) -> str:
+        """将详细的结构化地址转换为经纬度坐标"""
+        return await _respond("maps_geo", address=address, city=city)
+
+    @server.tool()
+    async def maps_regeocode(location: str) -> str:
+        """将一个高德经纬度坐标转换为行政区划地址信息"""
+        return await _respond("maps_regeocode", location=location)
+
+    @server.tool()
+    async def maps_text_search(keywords: str, city: str | None = None, types: str | None = None) -> str:
+        """关键词搜索，根据用户传入关键词，搜索出相关的POI"""
+        return await _respond("maps_text_search", keywords=keywords, city=city, types=types)
+
+    @server.tool()
+    async def maps_around_search(location: str, keywords: str | None = None, radius: str | None = None) -> str:
+        """周边搜，根据用户传入关键词以及坐标location，搜索出radius半径范围的POI"""
+        return await _respond("maps_around_search", location=location, keywords=keywords, radius=radius)
+
+    @server.tool()
+    async def maps_search_detail(id: str) -> str:
+        """查询关键词搜或者周边搜获取到的POI ID的详细信息"""
+        return await _respond("maps_search_detail", id=id)
+
+    @server.tool()
+    async def maps_direction_driving(origin: str, destination: str) -> str:
+        """驾车路径规划"""
+        return await _respond("maps_direction_driving", origin=origin, destination=destination)
+
+    @server.tool()
+    async def maps_direction_walking(origin: str, destination: str) -> str:
+        """步行路径规划"""
+        return await _respond("maps_direction_walking", origin=origin, destination=destination)
+
+    @server.tool()
+    async def maps_direction_bicycling(origin: str, destination: str) -> str:
+        """骑行路径规划"""
+        return await _respond("maps_direction_bicycling", origin=origin, destination=destination)
+
+    @server.tool()
+    async def maps_direction_transit_integrated(origin: str, destination: str, city: str, cityd: str) -> str:
+        """公交路径规划"""
+        return await _respond("maps_direction_transit_integrated", origin=origin, destination=destination, city=city, cityd=cityd)
+
+    @server.tool()
+    async def maps_distance(origins: str, destination: str, type: str | None = None) -> str:
+        """距离测量"""
+        return await _respond("maps_distance", origins=origins, destination=destination, type=type)
+
+    return server
+
+
+@asynccontextmanager
+async def run_mock_servers(
+    config: type[MockConfig] = MockConfig,
+) -> AsyncGenerator[MockDashScope, None]:
+    """在后台启动两个替身服务，退出上下文时关闭"""
+    dashscope = MockDashScope(config)
+    runner = web.AppRunner(dashscope.app())
+    await runner.setup()
+    await web.TCPSite(runner, config.HOST, config.DASHSCOPE_PORT).start()
+
+    amap_task = asyncio.create_task(create_mock_amap(config).run_streamable_http_async())
+    # 等待 MCP 服务开始监听
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection(config.HOST, config.MCP_PORT)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+    try:
+        yield dashscope
+    finally:
+        amap_task.cancel()
+        try:
+            await amap_task
+        except asyncio.CancelledError:
+            pass
+        await runner.cleanup()
+
+
+def mock_env(config: type[MockConfig] = MockConfig) -> dict[str, str]:
+    """让本项目连接替身服务所需的环境变量"""
+    return {
+        "DASHSCOPE_HTTP_BASE_URL": f"http://{config.HOST}:{config.DASHSCOPE_PORT}/api/v1",
+        "AMAP_MCP_URL": f"http://{config.HOST}:{config.MCP_PORT}/mcp",
+        "DASHSCOPE_API_KEY": "mock",
+        "AMAP_MAPS_API_KEY": "mock",
+    }
+
+
+async def _serve_forever() -> None:
+    async with run_mock_servers():
+        print("替身服务已启动，设置以下环境变量即可连接：")
+        for k, v in mock_env().items():
+            print(f"  {k}={v}")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 DashScope / 高德 MCP 替身服务")
+    parser.add_argument("--latency", type=float, default=MockConfig.LATENCY, help="首包延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=MockConfig.TOKEN_RATE, help="流式输出速率（token/秒）")
+    parser.add_argument("--prefill-rate", type=float, default=MockConfig.PREFILL_RATE, help="输入处理速率（token/秒），0 表示不模拟")
+    parser.add_argument("--reply-tokens", type=int, default=MockConfig.REPLY_TOKENS, help="每次回复的 token 数")
+    parser.add_argument("--error-rate", type=float, default=MockConfig.ERROR_RATE, help="错误注入比例")
+    parser.add_argument("--tool-latency", type=float, default=MockConfig.TOOL_LATENCY, help="MCP 工具调用延迟（秒）")
+    parser.add_argument("--script", help="脚本化回复 JSON 文件")
+    args = parser.parse_args()
+
+    MockConfig.LATENCY = args.latency
+    MockConfig.TOKEN_RATE = args.token_rate
+    MockConfig.PREFILL_RATE = args.prefill_rate
+    MockConfig.REPLY_TOKENS = args.reply_tokens
+    MockConfig.ERROR_RATE = args.error_rate
+    MockConfig.TOOL_LATENCY = args.tool_latency
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            MockConfig.SCRIPT = json.load(f)
+
+    try:
+        asyncio.run(_serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""DashScope 模型客户端池
+
+进程内共享的模型注册表：相同 (model_name, stream, enable_thinking) 的智能体复用同一个模型客户端，
+不再每创建一个智能体就新建一个 DashScopeChatModel。
+
+DashScope SDK 在内部自行管理 HTTP 会话，无法从外部注入连接池，
+因此这里用两级信号量来约束连接数：全局信号量限制同时在途的请求总数，
+每个模型再单独限制自己的并发数。流式响应在整个流被消费完之前都会占用名额。
+此外可以按模型设置每秒请求数上限，并通过 ``track_usage`` 统计某段调用链上的 token 用量。
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Generator
+from agentscope.model import DashScopeChatModel, ChatResponse
+from metrics import MetricsRegistry
+from settings import settings
+
+import asyncio, time
+
+
+class PoolConfig:
+    """模型池配置"""
+
+    # 所有模型共享的最大在途请求数
+    MAX_CONNECTIONS = 32
+
+    # 单个模型的最大在途请求数
+    MAX_CONCURRENCY_PER_MODEL = 8
+
+    # 按模型名设置的每秒请求数上限，未设置的模型不限速
+    RATE_LIMITS: dict[str, float] = {}
+
+
+# 当前调用链上的 token 用量累加器，见 track_usage
+_usage: ContextVar[dict | None] = ContextVar("model_usage", default=None)
+
+
+@contextmanager
+def track_usage() -> Generator[dict, None, None]:
+    """统计上下文内（包括其中创建的子任务）所有模型调用的次数和 token 用量"""
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def _record_usage(res: ChatResponse | None) -> None:
+    usage = _usage.get()
+    if usage is None:
+        return
+    usage["calls"] += 1
+    if res is not None and res.usage is not None:
+        usage["input_tokens"] += res.usage.input_tokens
+        usage["output_tokens"] += res.usage.output_tokens
+
+
+class _RateLimiter:
+    """把请求均匀地分散到时间轴上，保证每秒不超过 ``rate`` 次"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class PooledDashScopeChatModel(DashScopeChatModel):
+    """带并发限制的 DashScopeChatModel，由 ModelRegistry 统一创建和复用"""
+
+    def __init__(self, *args: Any, max_concurrency: int, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __call__(
+        self, *args: Any, **kwargs: Any
+    ) -> ChatResponse | AsyncGenerator[ChatResponse, None]:
+        limiter = ModelRegistry.rate_limiter(self.model_name)
+        if limiter is not None:
+            await limiter.acquire()
+
+        await self._semaphore.acquire()
+        try:
+            await ModelRegistry.connections.acquire()
+        except BaseException:
+            # 等待全局连接时被取消（如 ModelRouter 超时），归还本模型的名额
+            self._semaphore.release()
+            raise
+        start = time.perf_counter()
+        try:
+            res = await super().__call__(*args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+
+        if isinstance(res, ChatResponse):
+            self._release()
+            _record_usage(res)
+            latency = time.perf_counter() - start
+            self._record_metrics(res, latency, latency)
+            return res
+        return self._hold_until_exhausted(res, start)
+
+    async def _hold_until_exhausted(
+        self, stream: AsyncGenerator[ChatResponse, None], start: float
+    ) -> AsyncGenerator[ChatResponse, None]:
+        """流式响应在消费完（或被中断）之后才释放名额"""
+        last = None
+        ttft = None
+        try:
+            async for chunk in stream:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                last = chunk
+                yield chunk
+        finally:
+            self._release()
+            # 流式响应的 usage 是累计值，以最后一个分块为准
+            _record_usage(last)
+            latency = time.perf_counter() - start
+            self._record_metrics(last, latency, latency if ttft is None else ttft)
+
+    def _record_metrics(self, res: ChatResponse | None, latency: float, ttft: float) -> None:
+        usage = res.usage if res is not None else None
+        MetricsRegistry.record_model_call(
+            self.model_name,
+            latency=latency,
+            ttft=ttft,
+            input_tokens=usage.input_tokens if usage else 0,
+            output_tokens=usage.output_tokens if usage else 0,
+        )
+
+    def _release(self) -> None:
+        ModelRegistry.connections.release()
+        self._semaphore.release()
+
+
+class ModelRegistry:
+    """进程级模型注册表
+
+    按 (model_name, stream, enable_thinking) 缓存模型客户端，并统计命中/未命中次数。
+    """
+
+    connections = asyncio.Semaphore(PoolConfig.MAX_CONNECTIONS)
+
+    _models: dict[tuple[str, bool, bool | None], PooledDashScopeChatModel] = {}
+    _limiters: dict[str, _RateLimiter] = {}
+    hits: int = 0
+    misses: int = 0
+
+    @classmethod
+    def get_model(
+        cls,
+        model_name: str,
+        stream: bool = True,
+        enable_thinking: bool | None = None,
+    ) -> PooledDashScopeChatModel:
+        """获取共享的模型客户端，不存在时创建"""
+        key = (model_name, stream, enable_thinking)
+        model = cls._models.get(key)
+        if model is not None:
+            cls.hits += 1
+            return model
+
+        cls.misses += 1
+        model = PooledDashScopeChatModel(
+            model_name=model_name,
+            api_key=settings.dashscope_api_key,
+            stream=stream,
+            enable_thinking=enable_thinking,
+            max_concurrency=PoolConfig.MAX_CONCURRENCY_PER_MODEL,
+        )
+        cls._models[key] = model
+        return model
+
+    @classmethod
+    def rate_limiter(cls, model_name: str) -> _RateLimiter | None:
+        """按 PoolConfig.RATE_LIMITS 获取模型的限速器"""
+        rate = PoolConfig.RATE_LIMITS.get(model_name)
+        if not rate:
+            return None
+        limiter = cls._limiters.get(model_name)
+        if limiter is None or limiter.interval != 1.0 / rate:
+            limiter = cls._limiters[model_name] = _RateLimiter(rate)
+        return limiter
+
+    @classmethod
+    def stats(cls) -> dict:
+        """模型池命中统计"""
+        total = cls.hits + cls.misses
+        return {
+            "models": len(cls._models),
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "hit_rate": cls.hits / total if total else 0.0,
+        }
@@ -0,0 +1,259 @@
+"""模型路由
+
+辩论中主持人只负责宣布流程，却和评委用同一档模型；旅游计划固定使用 qwen-plus 流式输出。
+ModelRouter 按“角色”和“角色/环节”选择模型、思考模式、最大输出 token 数以及是否流式：
+
+- 路由表的默认值由各工作流给出（如 DebateConfig.ROUTES），``MODEL_ROUTES`` 指向的 JSON 文件可以覆盖；
+- 环节取自 metrics.phase 的当前阶段，每次调用时解析，``"debater/自由辩论"`` 会匹配“自由辩论第3轮”，
+  同一个智能体在不同环节可以用不同的模型和输出上限；
+- 被限流（429 / Throttling）或超时（非流式为完整响应，流式为首个分块）时，依次换用 ``fallback`` 中的模型；
+- 每条路由的调用次数、耗时、换用次数和按单价估算的花费记入 MetricsRegistry（route_* 指标）。
+
+配置文件格式：
+    {
+        "prices": {"qwen-max": [0.0024, 0.0096]},
+        "debate": {
+            "host": {"model": "qwen-turbo"},
+            "debater/自由辩论": {"max_tokens": 300},
+            "judge": {"model": "qwen-max", "fallback": ["qwen-plus-latest"]}
+        },
+        "travel": {"planner": {"stream": true}}
+    }
+"""
+from typing import Any, AsyncGenerator
+from agentscope.model import ChatModelBase, ChatResponse
+from metrics import MetricsRegistry, current_phase
+from model_pool import ModelRegistry
+from settings import settings
+
+import asyncio, json, os, time
+
+
+class RouterConfig:
+    """模型路由配置"""
+
+    # 非流式调用等待完整响应、流式调用等待首个分块的超时时间（秒），超时后换用 fallback 模型
+    TIMEOUT = 60.0
+
+    # 单价（元 / 千 token，依次为输入、输出），仅用于估算花费，可在配置文件的 "prices" 中覆盖
+    PRICES: dict[str, tuple[float, float]] = {
+        "qwen-flash": (0.00015, 0.0015),
+        "qwen-turbo": (0.0003, 0.0006),
+        "qwen-plus": (0.0008, 0.002),
+        "qwen-plus-latest": (0.0008, 0.002),
+        "qwen-max": (0.0024, 0.0096),
+    }
+
+    # 错误信息中出现这些字样时视为限流
+    RATE_LIMIT_MARKERS = ("Throttling", "429", "RateQuota", "rate limit")
+
+
+_file_config: dict | None = None
+
+
+def _load_file_config() -> dict:
+    global _file_config
+    if _file_config is None:
+        _file_config = {}
+        path = settings.model_routes_path
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                _file_config = json.load(f)
+    return _file_config
+
+
+def _price(model_name: str) -> tuple[float, float]:
+    prices = _load_file_config().get("prices", {})
+    return tuple(prices.get(model_name) or RouterConfig.PRICES.get(model_name, (0.0, 0.0)))
+
+
+def _should_fall_back(e: BaseException) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    text = str(e)
+    return any(_ in text for _ in RouterConfig.RATE_LIMIT_MARKERS)
+
+
+class Route:
+    """一条解析后的路由"""
+
+    __slots__ = ("model", "fallback", "enable_thinking", "max_tokens", "stream")
+
+    def __init__(
+        self,
+        model: str,
+        fallback: list[str] | None = None,
+        enable_thinking: bool | None = None,
+        max_tokens: int | None = None,
+        stream: bool = True,
+    ) -> None:
+        self.model = model
+        self.fallback = list(fallback or [])
+        self.enable_thinking = enable_thinking
+        self.max_tokens = max_tokens
+        self.stream = stream
+
+    @property
+    def models(self) -> list[str]:
+        """首选模型及其后备模型，去掉重复"""
+        return list(dict.fromkeys([self.model, *self.fallback]))
+
+
+class ModelRouter:
+    """按角色和环节选择模型的路由表
+
+    Args:
+        name (``str``):
+            路由表名称，对应配置文件中的同名小节，如 "debate"
+        routes (``dict[str, dict]``):
+            默认路由表，键为 "角色" 或 "角色/环节"，值为 Route 的参数；
+            "角色/环节" 只需给出与 "角色" 不同的字段
+    """
+
+    def __init__(self, name: str, routes: dict[str, dict]) -> None:
+        self.name = name
+        self._defaults = routes
+        self._routes: dict[str, dict] | None = None
+
+    @property
+    def routes(self) -> dict[str, dict]:
+        """默认路由表与配置文件合并后的结果"""
+        if self._routes is None:
+            overrides = _load_file_config().get(self.name, {})
+            self._routes = {
+                key: {**self._defaults.get(key, {}), **overrides.get(key, {})}
+                for key in [*self._defaults, *overrides]
+            }
+        return self._routes
+
+    def set_routes(self, routes: dict[str, dict]) -> None:
+        """替换默认路由表（配置文件仍然生效），已创建的路由模型在下次调用时即按新表解析"""
+        self._defaults = routes
+        self._routes = None
+
+    def resolve(self, role: str, phase: str | None = None) -> Route:
+        """依次合并 "角色" 和所有前缀匹配 ``phase`` 的 "角色/环节"（越长越优先）"""
+        spec = dict(self.routes.get(role, {}))
+        if phase:
+            keys = [
+                key for key in self.routes
+                if key.startswith(f"{role}/") and phase.startswith(key.split("/", 1)[1])
+            ]
+            for key in sorted(keys, key=len):
+                spec.update(self.routes[key])
+        if "model" not in spec:
+            raise KeyError(f"路由 {self.name}/{role} 没有配置模型")
+        return Route(**spec)
+
+    def model(
+        self,
+        role: str,
+        stream: bool | None = None,
+        enable_thinking: bool | None = None,
+    ) -> "RoutedChatModel":
+        """创建 ``role`` 的路由模型
+
+        Args:
+            role (``str``):
+                角色
+            stream (``bool | None``):
+                是否流式，为空时取路由的配置
+            enable_thinking (``bool | None``):
+                强制开启 / 关闭思考（如结构化输出），为空时取路由的配置
+        """
+        if stream is None:
+            stream = self.resolve(role).stream
+        return RoutedChatModel(self, role, stream, enable_thinking)
+
+
+class RoutedChatModel(ChatModelBase):
+    """每次调用时按当前环节解析路由，并在限流或超时时换用后备模型"""
+
+    def __init__(
+        self,
+        router: ModelRouter,
+        role: str,
+        stream: bool,
+        enable_thinking: bool | None = None,
+    ) -> None:
+        super().__init__(model_name=f"{router.name}/{role}", stream=stream)
+        self.router = router
+        self.role = role
+        self.enable_thinking = enable_thinking
+
+    async def __call__(
+        self, *args: Any, **kwargs: Any
+    ) -> ChatResponse | AsyncGenerator[ChatResponse, None]:
+        route = self.router.resolve(self.role, current_phase())
+        thinking = route.enable_thinking if self.enable_thinking is None else self.enable_thinking
+        if route.max_tokens and "max_tokens" not in kwargs:
+            kwargs["max_tokens"] = route.max_tokens
+
+        models = route.models
+        for i, name in enumerate(models):
+            model = ModelRegistry.get_model(name, stream=self.stream, enable_thinking=thinking)
+            start = time.perf_counter()
+            try:
+                if not self.stream:
+                    res = await asyncio.wait_for(model(*args, **kwargs), RouterConfig.TIMEOUT)
+                    self._record(name, res, start)
+                    return res
+                stream = await asyncio.wait_for(model(*args, **kwargs), RouterConfig.TIMEOUT)
+                try:
+                    first = await asyncio.wait_for(stream.__anext__(), RouterConfig.TIMEOUT)
+                except BaseException:
+                    await stream.aclose()
+                    raise
+                return self._relay(name, first, stream, start)
+            except Exception as e:
+                if i == len(models) - 1 or not _should_fall_back(e):
+                    raise
+                MetricsRegistry.observe("route_fallbacks", 1, route=self.model_name, model=name)
+
+    async def _relay(
+        self,
+        name: str,
+        first: ChatResponse,
+        stream: AsyncGenerator[ChatResponse, None],
+        start: float,
+    ) -> AsyncGenerator[ChatResponse, None]:
+        last = first
+        try:
+            yield first
+            async for chunk in stream:
+                last = chunk
+                yield chunk
+        finally:
+            # 流式响应的 usage 是累计值，以最后一个分块为准
+            self._record(name, last, start)
+
+    def _record(self, name: str, res: ChatResponse | None, start: float) -> None:
+        labels = {"route": self.model_name, "model": name}
+        MetricsRegistry.observe("route_latency_seconds", time.perf_counter() - start, **labels)
+        usage = res.usage if res is not None else None
+        if usage is not None:
+            price_in, price_out = _price(name)
+            cost = (usage.input_tokens * price_in + usage.output_tokens * price_out) / 1000
+            MetricsRegistry.observe("route_cost_yuan", cost, **labels)
+
+
+def route_summary(snapshot: dict) -> dict:
+    """把 MetricsRegistry.snapshot() 中的 route_* 指标整理为 {路由: {模型: 统计}}"""
+    result: dict[str, dict[str, dict]] = {}
+    for metric, key in [
+        ("route_latency_seconds", "latency"),
+        ("route_cost_yuan", "cost"),
+        ("route_fallbacks", "fallbacks"),
+    ]:
+        for label, stat in snapshot.get(metric, {}).items():
+            labels = dict(_.split("=", 1) for _ in label.split(","))
+            entry = result.setdefault(labels["route"], {}).setdefault(labels["model"], {})
+            if key == "latency":
+                entry["calls"] = stat["count"]
+                entry["mean_s"] = round(stat["total"] / stat["count"], 4)
+                entry["max_s"] = stat["max"]
+            elif key == "cost":
+                entry["cost_yuan"] = round(stat["total"], 6)
+            else:
+                entry["fallbacks"] = stat["count"]
+    return result
@@ -0,0 +1,200 @@
+"""行程动线规划
+
+为“规划交通与动线”这一步提供确定性的计算：给定每天要去的地点，
+先并发地对地点做地理编码，再用高德 ``maps_distance`` 构建当天所有地点两两之间的
+距离/耗时矩阵（每个终点一次调用，走会话池和结果缓存），最后在本地用最近邻 + 2-opt
+求出耗时最短的游览顺序，以结构化数据返回给智能体，不再让模型逐对查询路线、自己排序。
+"""
+from typing import Any, Callable
+from agentscope.message import TextBlock
+from agentscope.tool import ToolResponse
+from mcp_pool import MCPSessionPool
+
+import asyncio, json, re
+
+
+class RouteConfig:
+    """动线规划配置"""
+
+    # 出行方式 -> maps_distance 的 type 参数（0 直线距离，1 驾车，3 步行）
+    DISTANCE_TYPES = {"driving": "1", "walking": "3"}
+
+    # 单日最多规划的地点数
+    MAX_STOPS_PER_DAY = 12
+
+    # 2-opt 最多迭代轮数
+    MAX_2OPT_ROUNDS = 50
+
+    # 查不到耗时的路段在求解时的代价（秒），远大于任何真实路段，求解时尽量避开
+    MISSING_COST = 1e7
+
+
+_COORDINATE = re.compile(r"^\s*-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?\s*$")
+
+
+def _payload(res: Any) -> dict:
+    """取出 MCP 调用结果中的 JSON 文本"""
+    if res.isError:
+        raise RuntimeError(" ".join(getattr(_, "text", "") for _ in res.content))
+    text = "".join(getattr(_, "text", "") for _ in res.content)
+    return json.loads(text)
+
+
+def path_cost(matrix: list[list[float | None]], order: list[int]) -> float:
+    """按顺序依次经过各点的总代价（不回到起点），未知路段不计入"""
+    return sum(matrix[a][b] or 0.0 for a, b in zip(order, order[1:]))
+
+
+def _solver_matrix(matrix: list[list[float | None]]) -> list[list[float]]:
+    """未知路段代之以 RouteConfig.MISSING_COST，不能让它看起来不花时间"""
+    return [
+        [0.0 if i == j else RouteConfig.MISSING_COST if v is None else v for j, v in enumerate(row)]
+        for i, row in enumerate(matrix)
+    ]
+
+
+def solve_order(matrix: list[list[float]], start: int = 0) -> list[int]:
+    """求从 ``start`` 出发、经过所有点一次的近似最短路径
+
+    先用最近邻构造初始解，再用 2-opt 反转子路径直到无法改进。起点固定，终点不限。
+    """
+    n = len(matrix)
+    if n <= 2:
+        return [start] + [_ for _ in range(n) if _ != start]
+
+    order = [start]
+    remaining = set(range(n)) - {start}
+    while remaining:
+        last = order[-1]
+        nearest = min(remaining, key=lambda _: matrix[last][_])
+        order.append(nearest)
+        remaining.remove(nearest)
+
+    best = path_cost(matrix, order)
+    for _ in range(RouteConfig.MAX_2OPT_ROUNDS):
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = path_cost(matrix, candidate)
+                if cost < best - 1e-9:
+                    order, best, improved = candidate, cost, True
+        if not improved:
+            break
+    return order
+
+
+class RoutePlanner:
+    """基于高德 MCP 会话池的距离矩阵与游览顺序计算
+
+    Args:
+        pool (``MCPSessionPool``):
+            高德 MCP 会话池
+    """
+
+    def __init__(self, pool: MCPSessionPool) -> None:
+        self.pool = pool
+
+    async def _call(self, tool_name: str, **kwargs: Any) -> dict:
+        func = await self.pool.get_callable_function(tool_name, wrap_tool_result=False)
+        return _payload(await func(**kwargs))
+
+    async def geocode(self, place: str, city: str) -> str | None:
+        """地点名称或地址转为 ``经度,纬度``，已是坐标时原样返回，查不到时返回 None"""
+        if _COORDINATE.match(place):
+            return re.sub(r"\s+", "", place)
+        try:
+            results = (await self._call("maps_geo", address=place, city=city)).get("results") or []
+        except Exception:
+            return None
+        return results[0].get("location") if results else None
+
+    async def build_matrix(
+        self,
+        locations: list[str],
+        mode: str = "driving",
+    ) -> tuple[list[list[float | None]], list[list[float | None]], int]:
+        """构建两两之间的耗时（秒）与距离（米）矩阵，每个终点并发查询一次
+
+        查不到的路段为 None；返回值的最后一项是失败的 maps_distance 调用数，单个终点失败不影响其他终点。
+        """
+        n = len(locations)
+        durations: list[list[float | None]] = [[0.0 if i == j else None for j in range(n)] for i in range(n)]
+        distances: list[list[float | None]] = [[0.0 if i == j else None for j in range(n)] for i in range(n)]
+        distance_type = RouteConfig.DISTANCE_TYPES.get(mode, "1")
+
+        async def _to(dest: int) -> None:
+            origins = [_ for _ in range(n) if _ != dest]
+            payload = await self._call(
+                "maps_distance",
+                origins="|".join(locations[_] for _ in origins),
+                destination=locations[dest],
+                type=distance_type,
+            )
+            for k, item in enumerate(payload.get("results") or []):
+                # origin_id 从 1 开始，对应 origins 中的位置
+                idx = int(item.get("origin_id") or k + 1) - 1
+                if 0 <= idx < len(origins) and item.get("duration") not in (None, ""):
+                    durations[origins[idx]][dest] = float(item["duration"])
+                    distances[origins[idx]][dest] = float(item.get("distance") or 0)
+
+        results = await asyncio.gather(*[_to(_) for _ in range(n)], return_exceptions=True)
+        return durations, distances, sum(isinstance(_, Exception) for _ in results)
+
+    async def plan_day(self, stops: list[str], city: str, mode: str = "driving") -> dict:
+        """规划一天的游览顺序，第一个地点作为当天的出发点"""
+        stops = stops[:RouteConfig.MAX_STOPS_PER_DAY]
+        locations = await asyncio.gather(*[self.geocode(_, city) for _ in stops])
+        resolved = [(s, loc) for s, loc in zip(stops, locations) if loc]
+        unresolved = [s for s, loc in zip(stops, locations) if not loc]
+        if len(resolved) < 2:
+            return {"order": [s for s, _ in resolved], "legs": [], "unresolved": unresolved}
+
+        names = [s for s, _ in resolved]
+        durations, distances, failed = await self.build_matrix([loc for _, loc in resolved], mode)
+        # 距离矩阵不完整时排序不可信，保持输入顺序，只给出查得到的路段
+        order = list(range(len(names))) if failed else solve_order(_solver_matrix(durations))
+        legs = [
+            {
+                "from": names[a],
+                "to": names[b],
+                "distance_m": distances[a][b],
+                "duration_min": None if durations[a][b] is None else round(durations[a][b] / 60, 1),
+            }
+            for a, b in zip(order, order[1:])
+        ]
+        plan = {
+            "order": [names[_] for _ in order],
+            "legs": legs,
+            "total_distance_km": round(path_cost(distances, order) / 1000, 2),
+            "total_duration_min": round(path_cost(durations, order) / 60, 1),
+            "unresolved": unresolved,
+        }
+        if failed:
+            plan["note"] = f"{failed} 次距离查询失败，未优化顺序，按输入顺序给出"
+        return plan
+
+
+def create_route_tool(pool: MCPSessionPool) -> Callable:
+    """创建可注册到 Toolkit 的动线规划工具"""
+    planner = RoutePlanner(pool)
+
+    async def plan_day_routes(days: list[list[str]], city: str, mode: str = "driving") -> ToolResponse:
+        """根据每天选定的地点，计算地点之间的距离和耗时，并给出耗时最短的游览顺序
+
+        Args:
+            days (`list[list[str]]`):
+                每天要去的地点名称或详细地址，每天一个列表，列表中第一个地点作为当天出发点（如酒店）
+            city (`str`):
+                地点所在城市
+            mode (`str`):
+                出行方式，driving（驾车/打车）或 walking（步行）
+        """
+        plans = await asyncio.gather(*[planner.plan_day(_, city, mode) for _ in days])
+        result = [{"day": i + 1, **plan} for i, plan in enumerate(plans)]
+        return ToolResponse(
+            content=[TextBlock(type="text", text=json.dumps(result, ensure_ascii=False))],
+            metadata={"days": result},
+        )
+
+    return plan_day_routes
@@ -0,0 +1,142 @@
+"""语义缓存
+
+按文本语义（而不是精确字符串）缓存结果：查询文本向量化后在本地向量索引中找最相似的条目，
+相似度超过阈值且未过期即命中。用于辩题 → 双方立场与教练建议的复用，
+同一辩题或换了说法的近似辩题可以直接跳过准备阶段。
+
+本地哈希向量只看字面重合，“应该禁止……”与“不应该禁止……”的相似度比真正的同义改写还高，
+因此本地后端只接受规范化后完全相同的文本；其他后端的近似命中还要求双方的否定词一致，
+避免把相反的辩题当成同一个。
+"""
+from typing import Any
+from embedding import get_embedder
+from settings import settings
+from vector_store import VectorStore
+
+import os, re, time
+
+
+class SemanticCacheConfig:
+    """语义缓存配置"""
+
+    # 命中所需的最小余弦相似度
+    THRESHOLD = 0.92
+
+    # 条目有效期（秒）
+    TTL = 7 * 24 * 3600
+
+    # 过期条目超过该比例时重写索引文件
+    COMPACT_RATIO = 0.3
+
+    # 只接受精确匹配（规范化后文本相同）的向量化后端
+    EXACT_ONLY_BACKENDS = ("local",)
+
+    # 近似命中时双方必须一致的否定词（按顺序计数，“没有”先于“无”“不”）
+    NEGATIONS = ("没有", "不", "非", "无")
+
+
+def normalize_key(text: str) -> str:
+    """去掉空白和标点并转为小写，作为精确匹配的键"""
+    return re.sub(r"[\s\W_]+", "", text).lower()
+
+
+def _negations(text: str) -> tuple[int, ...]:
+    counts = []
+    for word in SemanticCacheConfig.NEGATIONS:
+        counts.append(text.count(word))
+        text = text.replace(word, "")
+    return tuple(counts)
+
+
+class SemanticCache:
+    """基于向量索引的语义缓存
+
+    Args:
+        name (``str``):
+            缓存名称，决定索引文件名
+        threshold (``float``):
+            命中所需的最小相似度
+        ttl (``float``):
+            条目有效期（秒）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: float = SemanticCacheConfig.THRESHOLD,
+        ttl: float = SemanticCacheConfig.TTL,
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._store: VectorStore | None = None
+
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            embedder = get_embedder()
+            # 不同向量化后端的向量不可比，分文件存放
+            path = (
+                os.path.join(settings.vector_dir, f"{self.name}.{embedder.backend}")
+                if settings.vector_dir else None
+            )
+            self._store = VectorStore(path, embedder.dim)
+            self._expire()
+        return self._store
+
+    def _expire(self) -> None:
+        store = self.store
+        now = time.time()
+        removed = store.remove(lambda _: now - _["created_at"] > self.ttl)
+        if removed and removed >= SemanticCacheConfig.COMPACT_RATIO * (len(store) + removed):
+            store.compact()
+
+    def _fresh(self, record: dict, now: float) -> bool:
+        return now - record["created_at"] <= self.ttl
+
+    async def lookup(self, text: str) -> tuple[Any, float] | None:
+        """查找语义相近的缓存条目，命中时返回 (值, 相似度)"""
+        key = normalize_key(text)
+        now = time.time()
+        embedder = get_embedder()
+        if embedder.backend in SemanticCacheConfig.EXACT_ONLY_BACKENDS:
+            for record in reversed(self.store.alive_records()):
+                if record.get("norm", normalize_key(record["key"])) == key and self._fresh(record, now):
+                    self.hits += 1
+                    return record["value"], 1.0
+            self.misses += 1
+            return None
+
+        query = (await embedder.embed([text]))[0]
+        negations = _negations(key)
+        for record, score in self.store.search(query, k=5):
+            if score < self.threshold:
+                break
+            if not self._fresh(record, now):
+                continue
+            norm = record.get("norm", normalize_key(record["key"]))
+            # 否定词不一致时可能是相反的命题
+            if norm == key or _negations(norm) == negations:
+                self.hits += 1
+                return record["value"], score
+        self.misses += 1
+        return None
+
+    async def store_value(self, text: str, value: Any) -> None:
+        """写入缓存条目，``value`` 需可 JSON 序列化"""
+        vectors = await get_embedder().embed([text])
+        self.store.add(
+            vectors,
+            [{"key": text, "norm": normalize_key(text), "value": value, "created_at": time.time()}],
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,340 @@
+"""小元的多会话服务端
+
+main.py 是单用户的命令行循环，这里提供 HTTP / WebSocket 服务：每个会话拥有独立记忆的小元，
+所有会话共享工具的 Schema 和函数（只解析一次，每个会话复制一份 Toolkit）、模型客户端池和高德 MCP 会话池。
+
+接口：
+    POST   /sessions                    创建会话，可选 {"user_id": ...}，返回 {"session_id": ...}
+    POST   /sessions/{id}/messages      发送消息 {"content": ...}，返回完整回复
+    GET    /sessions/{id}/ws            WebSocket，发送 {"content": ...}，
+                                        依次收到 {"type": "delta", "text": ...} 和 {"type": "done", "text": ...}
+    DELETE /sessions/{id}               结束会话
+    GET    /stats                       会话数与模型池统计
+
+开启长期记忆（LONG_TERM_MEMORY）时，只有创建会话时给出 user_id 的会话才启用长期记忆，
+并且按 user_id 隔离：同一用户的会话共享记忆，不同用户的消息不会出现在彼此的提示词中。
+长时间不活跃的会话会被回收，同时存在的会话数受 ServerConfig.MAX_SESSIONS 限制。
+服务端不提供需要读取控制台输入的旅游计划工具；执行代码、执行命令和写文件的工具默认关闭，
+只应在仅本机可访问时用 --allow-code-execution 开启。
+
+用法：
+    python server.py --port 8000
+    python server.py load --clients 200 --turns 3     # 本地压测客户端
+"""
+from agentscope.agent import ReActAgent
+from agentscope.message import Msg
+from aiohttp import ClientSession, WSMsgType, web
+from main import build_agent, clone_toolkit, register_tools
+from metrics import MetricsRegistry
+from model_pool import ModelRegistry
+from exec_pool import python_pool
+from memory_long_term import close_long_term_memories
+from settings import settings
+
+import argparse, asyncio, json, statistics, sys, time, uuid
+
+
+class ServerConfig:
+    """服务端配置"""
+
+    HOST = "127.0.0.1"
+    PORT = 8000
+
+    # 同时存在的最大会话数
+    MAX_SESSIONS = 256
+
+    # 会话空闲多久后回收（秒）及检查间隔
+    IDLE_TIMEOUT = 600
+    EVICT_INTERVAL = 30
+
+    # 是否向客户端开放执行代码、执行命令和写文件的工具
+    ALLOW_CODE_EXECUTION = False
+
+
+class Session:
+    """一个用户会话：独立的小元实例，同一时刻只处理一条消息"""
+
+    def __init__(self, session_id: str, agent: ReActAgent) -> None:
+        self.id = session_id
+        self.agent = agent
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+        # 当前请求的流式输出队列，没有订阅者时为 None
+        self.stream: asyncio.Queue[str] | None = None
+        self._printed: dict[str, str] = {}
+
+        # 服务端不往控制台打印，流式内容通过 pre_print 钩子转发给客户端
+        agent.set_console_output_enabled(False)
+        agent.register_instance_hook("pre_print", "stream", self._forward)
+
+    def _forward(self, agent: ReActAgent, kwargs: dict) -> None:
+        msg: Msg = kwargs["msg"]
+        text = msg.get_text_content() or ""
+        # 流式打印每次传入的是累计内容，这里只转发新增部分
+        printed = self._printed.get(msg.id, "")
+        delta = text[len(printed):] if text.startswith(printed) else text
+        self._printed[msg.id] = text
+        if delta and self.stream is not None:
+            self.stream.put_nowait(delta)
+
+    async def reply(self, content: str, stream: asyncio.Queue[str] | None = None) -> str:
+        async with self.lock:
+            self.last_active = time.monotonic()
+            self.stream = stream
+            try:
+                res = await self.agent(Msg(name="User", content=content, role="user"))
+            finally:
+                self.stream = None
+                self._printed.clear()
+                self.last_active = time.monotonic()
+        return res.get_text_content() or ""
+
+
+class SessionManager:
+    """会话的创建、查找与空闲回收，所有会话共享已解析的工具"""
+
+    def __init__(
+        self,
+        max_sessions: int = ServerConfig.MAX_SESSIONS,
+        idle_timeout: float = ServerConfig.IDLE_TIMEOUT,
+        allow_code_execution: bool = ServerConfig.ALLOW_CODE_EXECUTION,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.allow_code_execution = allow_code_execution
+        self.sessions: dict[str, Session] = {}
+        self.toolkit = register_tools(code_execution=allow_code_execution, interactive=False)
+        self.evicted = 0
+        self._evict_task: asyncio.Task | None = None
+
+    def create(self, user_id: str | None = None) -> Session | None:
+        """创建会话，已满且没有可回收的空闲会话时返回 None
+
+        Args:
+            user_id (``str | None``):
+                用户标识，给出时启用该用户的长期记忆，否则会话不使用长期记忆
+        """
+        if len(self.sessions) >= self.max_sessions:
+            self.evict(0)
+        if len(self.sessions) >= self.max_sessions:
+            return None
+        # 智能体会往 Toolkit 中注册自己的结束函数，每个会话使用一份复制
+        agent = build_agent(
+            clone_toolkit(self.toolkit),
+            user_id=user_id,
+            long_term=user_id is not None and settings.long_term_memory,
+        )
+        session = Session(uuid.uuid4().hex, agent)
+        self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Session | None:
+        return self.sessions.get(session_id)
+
+    def remove(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def evict(self, idle_timeout: float | None = None) -> int:
+        """回收空闲超过 ``idle_timeout`` 秒（默认取创建时的设置）且没有在处理消息的会话"""
+        if idle_timeout is None:
+            idle_timeout = self.idle_timeout
+        now = time.monotonic()
+        expired = [
+            s.id for s in self.sessions.values()
+            if not s.lock.locked() and now - s.last_active >= idle_timeout
+        ]
+        if idle_timeout == 0 and expired:
+            # 容量不足时只回收最久未活跃的一个
+            expired = [min(expired, key=lambda _: self.sessions[_].last_active)]
+        for session_id in expired:
+            del self.sessions[session_id]
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def _evict_loop(self) -> None:
+        while True:
+            await asyncio.sleep(ServerConfig.EVICT_INTERVAL)
+            self.evict()
+
+    async def start(self, app: web.Application) -> None:
+        self._evict_task = asyncio.create_task(self._evict_loop())
+        if self.allow_code_execution:
+            python_pool.preload()
+
+    async def close(self, app: web.Application) -> None:
+        if self._evict_task is not None:
+            self._evict_task.cancel()
+        self.sessions.clear()
+        if "mcp_gaode" in sys.modules:
+            await sys.modules["mcp_gaode"].close_gaode_pool()
+        await python_pool.close()
+        await close_long_term_memories()
+        MetricsRegistry.report()
+
+
+def _session_or_404(request: web.Request) -> Session:
+    session = request.app["manager"].get(request.match_info["session_id"])
+    if session is None:
+        raise web.HTTPNotFound(text="会话不存在或已过期")
+    return session
+
+
+async def create_session(request: web.Request) -> web.Response:
+    user_id = None
+    if request.can_read_body:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="请求体不是合法的 JSON")
+        if isinstance(body, dict) and body.get("user_id"):
+            user_id = str(body["user_id"])
+    session = request.app["manager"].create(user_id)
+    if session is None:
+        raise web.HTTPServiceUnavailable(text="会话数已达上限")
+    return web.json_response({"session_id": session.id})
+
+
+async def delete_session(request: web.Request) -> web.Response:
+    if not request.app["manager"].remove(request.match_info["session_id"]):
+        raise web.HTTPNotFound(text="会话不存在或已过期")
+    return web.json_response({"ok": True})
+
+
+async def post_message(request: web.Request) -> web.Response:
+    session = _session_or_404(request)
+    try:
+        body = await request.json()
+        content = str(body["content"])
+    except (ValueError, TypeError, KeyError):
+        raise web.HTTPBadRequest(text='消息格式应为 {"content": ...}')
+    return web.json_response({"text": await session.reply(content)})
+
+
+async def websocket(request: web.Request) -> web.WebSocketResponse:
+    session = _session_or_404(request)
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    async for frame in ws:
+        if frame.type != WSMsgType.TEXT:
+            continue
+        try:
+            body = json.loads(frame.data)
+            content = str(body["content"])
+        except (ValueError, TypeError, KeyError):
+            await ws.send_json({"type": "error", "text": '消息格式应为 {"content": ...}'})
+            continue
+
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        task = asyncio.create_task(session.reply(content, queue))
+        try:
+            while not (task.done() and queue.empty()):
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    await ws.send_json({"type": "delta", "text": getter.result()})
+                else:
+                    getter.cancel()
+            try:
+                await ws.send_json({"type": "done", "text": task.result()})
+            except Exception as e:
+                await ws.send_json({"type": "error", "text": f"{type(e).__name__}: {e}"})
+        finally:
+            # 客户端断开（发送失败或处理器被取消）时不再继续生成回复
+            if not task.done():
+                task.cancel()
+    return ws
+
+
+async def stats(request: web.Request) -> web.Response:
+    manager: SessionManager = request.app["manager"]
+    return web.json_response(
+        {
+            "sessions": len(manager.sessions),
+            "busy": sum(_.lock.locked() for _ in manager.sessions.values()),
+            "evicted": manager.evicted,
+            "models": ModelRegistry.stats(),
+        }
+    )
+
+
+def create_app(
+    max_sessions: int = ServerConfig.MAX_SESSIONS,
+    idle_timeout: float = ServerConfig.IDLE_TIMEOUT,
+    allow_code_execution: bool = ServerConfig.ALLOW_CODE_EXECUTION,
+) -> web.Application:
+    MetricsRegistry.install()
+    manager = SessionManager(max_sessions, idle_timeout, allow_code_execution)
+    app = web.Application()
+    app["manager"] = manager
+    app.on_startup.append(manager.start)
+    app.on_cleanup.append(manager.close)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_get("/sessions/{session_id}/ws", websocket)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+async def _drive_one(http: ClientSession, base_url: str, turns: int, latencies: list[float]) -> None:
+    async with http.post(f"{base_url}/sessions") as resp:
+        resp.raise_for_status()
+        session_id = (await resp.json())["session_id"]
+    async with http.ws_connect(f"{base_url}/sessions/{session_id}/ws") as ws:
+        for i in range(turns):
+            start = time.perf_counter()
+            await ws.send_json({"content": f"你好，这是第{i + 1}条消息"})
+            async for frame in ws:
+                if frame.json()["type"] in ("done", "error"):
+                    break
+            latencies.append(time.perf_counter() - start)
+    await http.delete(f"{base_url}/sessions/{session_id}")
+
+
+async def drive(base_url: str, clients: int, turns: int) -> None:
+    """本地压测：``clients`` 个并发会话各进行 ``turns`` 轮对话"""
+    latencies: list[float] = []
+    start = time.perf_counter()
+    async with ClientSession() as http:
+        results = await asyncio.gather(
+            *[_drive_one(http, base_url, turns, latencies) for _ in range(clients)],
+            return_exceptions=True,
+        )
+    elapsed = time.perf_counter() - start
+    errors = [_ for _ in results if isinstance(_, BaseException)]
+    ordered = sorted(latencies) or [0.0]
+    print(
+        f"clients={clients} turns={turns} wall={elapsed:.2f}s errors={len(errors)} "
+        f"turn_mean={statistics.mean(ordered):.3f}s "
+        f"turn_p99={ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]:.3f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="小元多会话服务")
+    parser.add_argument("mode", nargs="?", choices=["serve", "load"], default="serve")
+    parser.add_argument("--host", default=ServerConfig.HOST)
+    parser.add_argument("--port", type=int, default=ServerConfig.PORT)
+    parser.add_argument("--max-sessions", type=int, default=ServerConfig.MAX_SESSIONS, help="最大会话数")
+    parser.add_argument("--idle-timeout", type=float, default=ServerConfig.IDLE_TIMEOUT, help="空闲会话回收时间（秒）")
+    parser.add_argument(
+        "--allow-code-execution",
+        action="store_true",
+        default=ServerConfig.ALLOW_CODE_EXECUTION,
+        help="开放执行代码、执行命令和写文件的工具，只应在仅本机可访问时开启",
+    )
+    parser.add_argument("--clients", type=int, default=100, help="load 模式的并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="load 模式每个会话的对话轮数")
+    args = parser.parse_args()
+
+    if args.mode == "load":
+        asyncio.run(drive(f"http://{args.host}:{args.port}", args.clients, args.turns))
+        return
+
+    app = create_app(args.max_sessions, args.idle_timeout, args.allow_code_execution)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""统一的运行配置
+
+所有模块都从这里读取环境变量，``.env`` 只在首次访问配置时加载一次。
+必填的密钥在第一次被用到时才校验，导入模块本身没有任何副作用，
+这样只用到部分功能（例如不查地图）时不必配置全部密钥。
+"""
+from functools import cached_property
+
+import os
+
+
+class Settings:
+    """进程内唯一的配置对象，属性在首次访问时读取并缓存"""
+
+    def __init__(self) -> None:
+        self._dotenv_loaded = False
+
+    def _get(self, key: str, default: str | None = None) -> str | None:
+        if not self._dotenv_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            self._dotenv_loaded = True
+        return os.getenv(key, default)
+
+    def _require(self, key: str) -> str:
+        value = self._get(key)
+        if not value:
+            raise ValueError(f"请检查{key}环境变量是否设置正确")
+        return value
+
+    @cached_property
+    def dashscope_api_key(self) -> str:
+        return self._require("DASHSCOPE_API_KEY")
+
+    @cached_property
+    def amap_maps_api_key(self) -> str:
+        return self._require("AMAP_MAPS_API_KEY")
+
+    @cached_property
+    def amap_mcp_url(self) -> str:
+        # 设置 AMAP_MCP_URL 可以改连本地替身服务（见 mock_server.py）
+        return self._get("AMAP_MCP_URL") or "https://mcp.amap.com/mcp"
+
+    @cached_property
+    def amap_cache_path(self) -> str | None:
+        # 设置后高德 MCP 调用结果会持久化到磁盘
+        return self._get("AMAP_CACHE_PATH")
+
+    @cached_property
+    def studio_url(self) -> str | None:
+        # 设置后启动时连接 AgentScope Studio（如 http://localhost:3000），默认不连接
+        return self._get("AGENTSCOPE_STUDIO_URL") or None
+
+    @cached_property
+    def dump_schemas(self) -> bool:
+        # 启动时是否打印工具的 JSON Schema，仅调试时打开
+        return self._get("DUMP_TOOL_SCHEMAS", "") not in ("", "0", "false")
+
+    @cached_property
+    def checkpoint_dir(self) -> str | None:
+        # 辩论与旅游计划的断点目录，设置后才启用断点续跑（如 .checkpoints）
+        return self._get("CHECKPOINT_DIR") or None
+
+    @cached_property
+    def embedding_backend(self) -> str:
+        # local：本地哈希向量，不需要网络；dashscope：DashScope 文本向量模型
+        return self._get("EMBEDDING_BACKEND", "local") or "local"
+
+    @cached_property
+    def vector_dir(self) -> str | None:
+        # 语义缓存等向量索引的存放目录，设为空字符串时只保存在内存中
+        return self._get("VECTOR_DIR", ".vectors") or None
+
+    @cached_property
+    def long_term_memory(self) -> bool:
+        # 小元是否启用本地长期记忆（向量索引存放在 VECTOR_DIR 下），默认关闭，设为 1 开启
+        return self._get("LONG_TERM_MEMORY", "0") not in ("", "0", "false")
+
+    @cached_property
+    def model_routes_path(self) -> str | None:
+        # 模型路由配置文件（JSON），未设置时使用各工作流的默认路由，见 model_router.py
+        return self._get("MODEL_ROUTES") or None
+
+    @cached_property
+    def metrics_prom_path(self) -> str | None:
+        return self._get("METRICS_PROM_PATH")
+
+
+settings = Settings()
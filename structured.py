@@ -0,0 +1,104 @@
+"""结构化输出快速通道
+
+ReActAgent 的 ``structured_model`` 会走完整的推理-行动循环（流式、可能开启思考、
+往往需要多次模型调用才能拿到 generate_response 的参数）。对于立场提取、教练建议、
+评委打分这类纯粹的模板抽取，这里直接发起一次非流式的 JSON Schema 模式调用，
+在本地用 pydantic 校验；校验失败时把错误反馈给模型修复，最多重试 StructuredConfig.MAX_REPAIRS 次。
+"""
+from typing import TypeVar
+from agentscope.formatter import DashScopeChatFormatter
+from agentscope.model import ChatModelBase
+from agentscope.message import Msg
+from model_pool import ModelRegistry
+from pydantic import BaseModel, ValidationError
+
+import json, re
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StructuredConfig:
+    """结构化输出配置"""
+
+    # 校验失败后的修复重试次数
+    MAX_REPAIRS = 2
+
+    # DashScope 的 response_format："json_schema" 按 Schema 约束输出，
+    # 模型不支持时可改为 "json_object"，仅约束为合法 JSON，由本地校验兜底
+    RESPONSE_FORMAT = "json_schema"
+
+
+_formatter = DashScopeChatFormatter()
+
+
+def _response_format(structured_model: type[BaseModel]) -> dict:
+    if StructuredConfig.RESPONSE_FORMAT == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": structured_model.__name__,
+                "schema": structured_model.model_json_schema(),
+            },
+        }
+    return {"type": "json_object"}
+
+
+def _parse(text: str, structured_model: type[T]) -> T:
+    # 个别模型仍会用代码块包裹 JSON
+    match = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+    return structured_model.model_validate_json(match.group(1) if match else text)
+
+
+async def generate_structured(
+    model_name: str | ChatModelBase,
+    sys_prompt: str,
+    content: str,
+    structured_model: type[T],
+) -> T:
+    """一次非流式调用生成并校验结构化结果
+
+    Args:
+        model_name (``str | ChatModelBase``):
+            模型名称，从 ModelRegistry 获取共享的非流式客户端；
+            也可以直接传入非流式、不开启思考的模型（如 ModelRouter 的路由模型）
+        sys_prompt (``str``):
+            系统提示词
+        content (``str``):
+            用户输入
+        structured_model (``type[BaseModel]``):
+            期望的输出结构
+
+    Raises:
+        ``ValueError``: 重试后仍无法得到合法结果
+    """
+    model = (
+        ModelRegistry.get_model(model_name, stream=False, enable_thinking=False)
+        if isinstance(model_name, str) else model_name
+    )
+    schema = json.dumps(structured_model.model_json_schema(), ensure_ascii=False)
+    msgs = [
+        Msg(
+            name="system",
+            content=f"{sys_prompt}\n\n请只输出一个符合以下 JSON Schema 的 JSON 对象，不要输出其他内容：\n{schema}",
+            role="system",
+        ),
+        Msg(name="user", content=content, role="user"),
+    ]
+
+    error: Exception | None = None
+    for _ in range(StructuredConfig.MAX_REPAIRS + 1):
+        res = await model(
+            await _formatter.format(msgs),
+            response_format=_response_format(structured_model),
+        )
+        text = "".join(_["text"] for _ in res.content if _["type"] == "text")
+        try:
+            return _parse(text, structured_model)
+        except (ValidationError, ValueError) as e:
+            error = e
+            # 把错误的输出和校验信息交给模型修复
+            msgs += [
+                Msg(name="assistant", content=text, role="assistant"),
+                Msg(name="user", content=f"上面的输出不符合要求：{e}\n请修正后重新输出完整的 JSON 对象。", role="user"),
+            ]
+    raise ValueError(f"结构化输出 {structured_model.__name__} 校验失败：{error}")
@@ -0,0 +1,36 @@
+"""增量格式化的结果与 DashScopeMultiAgentFormatter 逐字一致"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("agentscope")
+
+from agentscope.formatter import DashScopeMultiAgentFormatter
+from agentscope.message import Msg, TextBlock
+
+from formatter_cache import CachedDashScopeMultiAgentFormatter
+
+
+def _msgs() -> list[Msg]:
+    return [
+        Msg("主持人", "今天的辩题是……", "user"),
+        Msg("正方", [TextBlock(type="text", text="第一点"), TextBlock(type="text", text="第二点")], "assistant"),
+        Msg("反方", "", "assistant"),
+        Msg("旁白", [], "assistant"),
+        Msg("反方", [TextBlock(type="text", text="我方认为")], "assistant"),
+    ]
+
+
+@pytest.mark.parametrize("is_first", [True, False])
+def test_matches_parent(is_first):
+    async def run():
+        msgs = _msgs()
+        cached = CachedDashScopeMultiAgentFormatter()
+        parent = DashScopeMultiAgentFormatter()
+        for i in range(len(msgs) + 1):
+            # 逐条追加，覆盖首次渲染和增量追加两条路径
+            expected = await parent._format_agent_message(msgs[:i], is_first)
+            assert await cached._format_agent_message(msgs[:i], is_first) == expected
+        assert cached.hits > 0
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+"""准备阶段语义缓存只复用同一辩题的结果"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import embedding
+from semantic_cache import SemanticCache, normalize_key
+from vector_store import VectorStore
+
+
+def _cache(monkeypatch, backend: str = "local") -> SemanticCache:
+    embedder = embedding.Embedder(backend)
+    monkeypatch.setattr(embedding, "_embedder", embedder)
+    cache = SemanticCache("test")
+    cache._store = VectorStore(None, embedder.dim)
+    return cache
+
+
+def test_normalize_key():
+    assert normalize_key(" 人工智能的发展，利大于弊！") == normalize_key("人工智能的发展利大于弊")
+
+
+def test_local_backend_exact_topic_only(monkeypatch):
+    async def run():
+        cache = _cache(monkeypatch)
+        await cache.store_value("应该禁止在公共场所吸烟", {"pov_positive": "支持禁止"})
+
+        hit = await cache.lookup("应该禁止在公共场所吸烟。")
+        assert hit is not None and hit[0] == {"pov_positive": "支持禁止"}
+        # 相反的辩题字面相似度很高，也不能复用
+        assert await cache.lookup("不应该禁止在公共场所吸烟") is None
+        assert await cache.lookup("应该禁止在公共场所喝酒") is None
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_fuzzy_hit_requires_same_negations(monkeypatch):
+    async def run():
+        cache = _cache(monkeypatch)
+        # 模拟非本地后端的近似检索，阈值放宽到任何字面重合都算相似
+        monkeypatch.setattr("semantic_cache.SemanticCacheConfig.EXACT_ONLY_BACKENDS", ())
+        cache.threshold = 0.0
+        await cache.store_value("应该禁止在公共场所吸烟", {"side": "positive"})
+
+        assert await cache.lookup("不应该禁止在公共场所吸烟") is None
+        assert await cache.lookup("应当禁止公共场所吸烟") is not None
+
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+"""向量索引的压缩在任意时刻中断后，向量与记录仍然一一对应"""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vector_store import VectorStore
+
+
+def _store(tmp_path) -> VectorStore:
+    store = VectorStore(str(tmp_path / "index"), 2)
+    store.add(np.eye(2, dtype=np.float32)[[0, 1, 0, 1]], [{"i": i} for i in range(4)])
+    store.remove(lambda r: r["i"] == 0)
+    return store
+
+
+def _pairs(store: VectorStore) -> list[tuple[int, int]]:
+    store.alive_records()
+    return [(r["i"], int(np.argmax(store._vectors[n]))) for n, r in enumerate(store.records) if store._alive[n]]
+
+
+def test_compact_interrupted_after_marker(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    # 标记已创建、只替换了向量文件时崩溃
+    monkeypatch.setattr(VectorStore, "_finish_compact", lambda self: os.replace(
+        self._vector_path + ".tmp", self._vector_path
+    ))
+    store.compact()
+    monkeypatch.undo()
+
+    reloaded = VectorStore(store.path, 2)
+    assert _pairs(reloaded) == [(1, 1), (2, 0), (3, 1)]
+    assert not os.path.exists(reloaded._compact_path)
+
+
+def test_compact_interrupted_before_marker(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    monkeypatch.setattr(VectorStore, "_compact_path", property(lambda self: 1 / 0))
+    with pytest.raises(ZeroDivisionError):
+        store.compact()
+    monkeypatch.undo()
+
+    reloaded = VectorStore(store.path, 2)
+    assert _pairs(reloaded) == [(1, 1), (2, 0), (3, 1)]
+    assert not os.path.exists(reloaded._vector_path + ".tmp")
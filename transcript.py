@@ -0,0 +1,215 @@
+"""辩论共享记录
+
+原流程中主持人、双方辩手各有一份 InMemoryMemory，同一条发言被写进每个智能体的记忆，
+评委再整体借用主持人的记忆；断点续跑时每份记忆都要各自序列化一遍。
+
+这里整场辩论只有一份只追加的记录（Transcript），每条消息只存一次，附带发言者、所属环节等信息，
+每个智能体拿到的是这份记录上的视图（TranscriptView）：
+
+- 视图按发言者、角色、环节、加入时间过滤，读取时只拼出一个引用共享 Msg 的列表，不复制消息；
+- 写入视图即写入共享记录（按消息 id 去重），其他视图立即可见；
+  工具调用、工具结果这类消息只对写入它的智能体可见；
+- 删除、清空、折叠（自由辩论的滚动摘要）只改变本视图的可见范围，不影响共享记录和其他视图；
+- 评委直接拿一份完整视图，交接不需要复制记忆；断点只需保存一份记录和各视图的少量状态。
+"""
+from typing import Iterable
+from agentscope.memory import MemoryBase
+from agentscope.message import Msg
+import metrics
+
+
+class TranscriptEntry:
+    """共享记录中的一条消息"""
+
+    __slots__ = ("seq", "msg", "owner", "phase", "private")
+
+    def __init__(self, seq: int, msg: Msg, owner: str, phase: str) -> None:
+        self.seq = seq
+        self.msg = msg
+        # 写入该消息的智能体
+        self.owner = owner
+        self.phase = phase
+        # 工具调用 / 工具结果只对写入者可见
+        self.private = not isinstance(msg.content, str) and (
+            msg.has_content_blocks("tool_use") or msg.has_content_blocks("tool_result")
+        )
+
+
+class Transcript:
+    """只追加的共享消息记录"""
+
+    def __init__(self) -> None:
+        self.entries: list[TranscriptEntry] = []
+        # 消息 id -> 序号
+        self._seq: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, msg: Msg, owner: str) -> TranscriptEntry:
+        """追加一条消息，已存在的消息（相同 id）直接返回原记录"""
+        seq = self._seq.get(msg.id)
+        if seq is not None:
+            return self.entries[seq]
+        entry = TranscriptEntry(len(self.entries), msg, owner, metrics.current_phase())
+        self._seq[msg.id] = entry.seq
+        self.entries.append(entry)
+        return entry
+
+    def seq(self, msg_id: str) -> int | None:
+        return self._seq.get(msg_id)
+
+    def view(self, owner: str, **filters) -> "TranscriptView":
+        """创建 ``owner`` 的视图，``filters`` 见 TranscriptView"""
+        return TranscriptView(self, owner, **filters)
+
+    def state_dict(self) -> dict:
+        return {
+            "entries": [
+                {"msg": _.msg.to_dict(), "owner": _.owner, "phase": _.phase}
+                for _ in self.entries
+            ]
+        }
+
+    def load_state_dict(self, state_dict: dict) -> None:
+        self.entries = []
+        self._seq = {}
+        for item in state_dict.get("entries", []):
+            msg = Msg.from_dict(item["msg"])
+            entry = TranscriptEntry(len(self.entries), msg, item["owner"], item["phase"])
+            self._seq[msg.id] = entry.seq
+            self.entries.append(entry)
+
+
+class TranscriptView(MemoryBase):
+    """共享记录上某个智能体的记忆视图，可直接通过 ``memory=`` 参数替换 InMemoryMemory
+
+    Args:
+        transcript (``Transcript``):
+            共享记录
+        owner (``str``):
+            视图所属的智能体名称
+        speakers (``Iterable[str] | None``):
+            只看这些发言者的消息，为空时不限
+        roles (``Iterable[str] | None``):
+            只看这些角色（user / assistant / system）的消息，为空时不限
+        phases (``Iterable[str] | None``):
+            只看这些环节的消息，为空时不限
+        since (``int``):
+            只看序号不小于该值的消息（智能体中途加入时看不到此前的消息）
+    """
+
+    def __init__(
+        self,
+        transcript: Transcript,
+        owner: str,
+        speakers: Iterable[str] | None = None,
+        roles: Iterable[str] | None = None,
+        phases: Iterable[str] | None = None,
+        since: int = 0,
+    ) -> None:
+        super().__init__()
+        self.transcript = transcript
+        self.owner = owner
+        self.speakers = set(speakers) if speakers else None
+        self.roles = set(roles) if roles else None
+        self.phases = set(phases) if phases else None
+        self.since = since
+
+        # 显式写入本视图的消息不受过滤条件限制
+        self._pinned: set[str] = set()
+        # 在本视图中删除的消息
+        self._hidden: set[str] = set()
+        # 折叠区间 [start, end) 及代替它的消息
+        self._fold: tuple[int, int, Msg | None] | None = None
+
+    def _visible(self, entry: TranscriptEntry) -> bool:
+        msg = entry.msg
+        if msg.id in self._hidden:
+            return False
+        if entry.private and entry.owner != self.owner:
+            return False
+        if msg.id in self._pinned:
+            return True
+        return (
+            entry.seq >= self.since
+            and (self.speakers is None or msg.name in self.speakers)
+            and (self.roles is None or msg.role in self.roles)
+            and (self.phases is None or entry.phase in self.phases)
+        )
+
+    def _messages(self) -> list[Msg]:
+        entries = self.transcript.entries
+        if self._fold is None:
+            return [_.msg for _ in entries if self._visible(_)]
+        start, end, summary = self._fold
+        msgs = [_.msg for _ in entries[:start] if self._visible(_)]
+        if summary is not None and summary.id not in self._hidden:
+            msgs.append(summary)
+        msgs += [_.msg for _ in entries[end:] if self._visible(_)]
+        return msgs
+
+    def fold(self, start: int, end: int, summary: Msg | None) -> None:
+        """在本视图中用 ``summary`` 代替序号在 [start, end) 内的消息，``summary`` 为空时只隐藏"""
+        self._fold = (start, max(start, end), summary)
+
+    def unfold(self) -> None:
+        self._fold = None
+
+    async def add(self, memories: Msg | list[Msg] | None, allow_duplicates: bool = False) -> None:
+        if memories is None:
+            return
+        if isinstance(memories, Msg):
+            memories = [memories]
+        for msg in memories:
+            self.transcript.append(msg, self.owner)
+            self._pinned.add(msg.id)
+            self._hidden.discard(msg.id)
+
+    async def delete(self, index: Iterable | int) -> None:
+        """只在本视图中隐藏，不影响共享记录"""
+        msgs = self._messages()
+        for i in [index] if isinstance(index, int) else index:
+            self._hidden.add(msgs[i].id)
+
+    async def retrieve(self, query: str, limit: int | None = None) -> list[Msg]:
+        """本视图中文本包含 ``query`` 的消息，按时间顺序，``limit`` 不为空时只返回最近的 ``limit`` 条"""
+        msgs = [_ for _ in self._messages() if query in (_.get_text_content() or "")]
+        return msgs[-limit:] if limit else msgs
+
+    async def size(self) -> int:
+        return len(self._messages())
+
+    async def clear(self) -> None:
+        """本视图从此刻起重新开始，共享记录保持不变"""
+        self.since = len(self.transcript)
+        self._pinned.clear()
+        self._hidden.clear()
+        self._fold = None
+
+    async def get_memory(self) -> list[Msg]:
+        return self._messages()
+
+    def state_dict(self) -> dict:
+        """只导出视图自身的状态，共享记录由 Transcript.state_dict 单独保存"""
+        fold = None
+        if self._fold is not None:
+            start, end, summary = self._fold
+            fold = [start, end, summary.to_dict() if summary is not None else None]
+        return {
+            "owner": self.owner,
+            "since": self.since,
+            "pinned": sorted(self._pinned),
+            "hidden": sorted(self._hidden),
+            "fold": fold,
+        }
+
+    def load_state_dict(self, state_dict: dict, strict: bool = True) -> None:
+        self.since = state_dict.get("since", 0)
+        self._pinned = set(state_dict.get("pinned", []))
+        self._hidden = set(state_dict.get("hidden", []))
+        fold = state_dict.get("fold")
+        self._fold = None
+        if fold is not None:
+            start, end, summary = fold
+            self._fold = (start, end, Msg.from_dict(summary) if summary is not None else None)
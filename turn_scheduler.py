@@ -0,0 +1,115 @@
+"""辩论发言调度
+
+原流程中主持人的串场词（“请反方辩手陈述立场与主要论点。”）完全可以预知，却每次都要调用一次模型，
+而且下一位发言者要等上一位完整输出后才开始整理自己的上下文。这里的调度器：
+
+- 主持人的串场词按模板在本地生成，写入主持人记忆并转发给所有辩手，不调用模型；
+- 每条发言完成后立即转发给其他辩手（进入各自的待读队列，下次发言时一并作为输入）；
+- 当前发言者流式输出期间，提前把下一位发言者的待读消息写入其记忆并预先格式化上下文，
+  轮到它时格式化器只需追加最后一条消息。
+"""
+from agentscope.agent import ReActAgent
+from agentscope.message import Msg
+from formatter_cache import CachedDashScopeMultiAgentFormatter
+
+import asyncio
+
+
+async def prewarm_context(agent: ReActAgent) -> None:
+    """按 ``agent`` 当前的记忆预先格式化一次上下文，使用带前缀缓存的格式化器时，
+    真正调用时只需渲染新增的消息"""
+    if isinstance(agent.formatter, CachedDashScopeMultiAgentFormatter):
+        await agent.formatter.format(
+            [
+                Msg(name="system", content=agent.sys_prompt, role="system"),
+                *await agent.memory.get_memory(),
+            ]
+        )
+
+
+class HostScript:
+    """主持人串场词模板，与主持人系统提示词中的流程一致"""
+
+    OPENING = "第一轮开始，立论环节。请正方辩手首先陈述立场与主要论点。"
+    OPENING_NEGATIVE = "请反方辩手陈述立场与主要论点。"
+    CROSS = "第二轮开始，攻辩环节。请正方辩手向反方提出3-5个问题，要求反方正面回答，不得反问。"
+    CROSS_NEGATIVE = "请反方辩手向正方提出3-5个问题，要求正方正面回答，不得反问。"
+    FREE = "第三轮开始，自由辩论环节。双方将交替发言共 {rounds} 轮，由正方率先发言。"
+    CLOSING = "自由辩论结束，现在进入总结陈词环节，请双方辩手做最后陈述。"
+
+
+class TurnScheduler:
+    """按脚本推进发言：字符串为主持人串场词，智能体为一次发言
+
+    Args:
+        host (``ReActAgent``):
+            主持人，记录完整的辩论过程，但串场词不经过模型
+        speakers (``list[ReActAgent]``):
+            参与发言的辩手
+    """
+
+    def __init__(self, host: ReActAgent, speakers: list[ReActAgent]) -> None:
+        self.host = host
+        self._speakers = {_.name: _ for _ in speakers}
+        self._inbox: dict[str, list[Msg]] = {_.name: [] for _ in speakers}
+        self.announcements = 0
+
+    def _forward(self, msg: Msg, sender: str | None = None) -> None:
+        for name, inbox in self._inbox.items():
+            if name != sender:
+                inbox.append(msg)
+
+    async def announce(self, text: str) -> Msg:
+        """本地生成主持人串场词"""
+        msg = Msg(name=self.host.name, content=text, role="assistant")
+        await self.host.print(msg)
+        await self.host.memory.add(msg)
+        self._forward(msg)
+        self.announcements += 1
+        return msg
+
+    async def _prewarm(self, agent: ReActAgent) -> None:
+        """把已经到达的消息提前写入 ``agent`` 的记忆，并预先格式化其上下文"""
+        pending, self._inbox[agent.name] = self._inbox[agent.name], []
+        if pending:
+            await agent.observe(pending)
+        await prewarm_context(agent)
+
+    async def flush(self) -> None:
+        """把所有待读消息写入对应辩手的记忆（交给其他调度方式接管发言前调用）"""
+        for name, agent in self._speakers.items():
+            pending, self._inbox[name] = self._inbox[name], []
+            if pending:
+                await agent.observe(pending)
+
+    async def speak(self, agent: ReActAgent, next_agent: ReActAgent | None = None) -> Msg:
+        """让 ``agent`` 发言；同时为下一位发言者预热上下文"""
+        pending, self._inbox[agent.name] = self._inbox[agent.name], []
+        prewarm = None
+        if next_agent is not None and next_agent is not agent:
+            prewarm = asyncio.create_task(self._prewarm(next_agent))
+
+        try:
+            msg = await agent(pending or None)
+            await self.host.memory.add(msg)
+            self._forward(msg, sender=agent.name)
+            if prewarm is not None:
+                await prewarm
+        finally:
+            # 发言失败或被取消时不留下孤立的预热任务
+            if prewarm is not None and not prewarm.done():
+                prewarm.cancel()
+        return msg
+
+    async def run(self, steps: list[str | ReActAgent]) -> tuple[Msg | None, list[Msg]]:
+        """执行一段脚本，返回最后一条消息和其中的辩手发言"""
+        msg = None
+        speeches = []
+        for i, step in enumerate(steps):
+            if isinstance(step, str):
+                msg = await self.announce(step)
+                continue
+            next_agent = next((_ for _ in steps[i + 1:] if not isinstance(_, str)), None)
+            msg = await self.speak(step, next_agent)
+            speeches.append(msg)
+        return msg, speeches
@@ -0,0 +1,192 @@
+"""本地向量索引
+
+向量以 float32 连续追加到 ``<path>.f32``，每条向量对应的记录以 JSON Lines 追加到 ``<path>.jsonl``。
+读取时用 ``np.memmap`` 映射向量文件，不必整体读入内存；新增向量只追加写入，
+索引可以增量更新。删除时把行号追加到 ``<path>.dead``，重启后仍然生效，``compact`` 时重写文件真正移除：
+新文件写完后先创建 ``<path>.compact`` 标记再替换，加载时发现标记就把没做完的替换做完，
+没有标记的临时文件直接丢弃，两个文件不会出现一新一旧的组合。
+``path`` 为空时只保存在内存中。
+"""
+from typing import Callable
+import numpy as np
+
+import json, os
+
+
+class VectorStore:
+    """追加写入、内存映射读取的向量索引，按内积（归一化向量即余弦相似度）检索 top-k
+
+    Args:
+        path (``str | None``):
+            文件路径前缀，为空时不落盘
+        dim (``int``):
+            向量维度
+    """
+
+    def __init__(self, path: str | None, dim: int) -> None:
+        self.path = path
+        self.dim = dim
+        self.records: list[dict] = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._loaded = False
+
+    @property
+    def _vector_path(self) -> str:
+        return f"{self.path}.f32"
+
+    @property
+    def _record_path(self) -> str:
+        return f"{self.path}.jsonl"
+
+    @property
+    def _dead_path(self) -> str:
+        return f"{self.path}.dead"
+
+    @property
+    def _compact_path(self) -> str:
+        return f"{self.path}.compact"
+
+    def _finish_compact(self) -> None:
+        """有标记时完成中断的替换，否则丢弃写了一半的临时文件"""
+        committed = os.path.exists(self._compact_path)
+        for path in [self._vector_path, self._record_path]:
+            if os.path.exists(path + ".tmp"):
+                if committed:
+                    os.replace(path + ".tmp", path)
+                else:
+                    os.remove(path + ".tmp")
+        if committed:
+            # 行号在重写后失效
+            if os.path.exists(self._dead_path):
+                os.remove(self._dead_path)
+            os.remove(self._compact_path)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        self._finish_compact()
+        if not (os.path.exists(self._vector_path) and os.path.exists(self._record_path)):
+            # 只剩一个文件时无法对应，丢弃
+            for path in [self._vector_path, self._record_path, self._dead_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        clean = True
+        with open(self._record_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self.records.append(json.loads(line))
+                except ValueError:
+                    # 进程崩溃时可能留下写了一半的行
+                    clean = False
+                    break
+        rows = os.path.getsize(self._vector_path) // (self.dim * 4)
+        total = len(self.records)
+        n = min(rows, total)
+        self.records = self.records[:n]
+
+        # 两个文件不一致时截断到公共部分，保证之后的追加仍然一一对应
+        if os.path.getsize(self._vector_path) != n * self.dim * 4:
+            os.truncate(self._vector_path, n * self.dim * 4)
+        if not clean or total > n:
+            with open(self._record_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(_, ensure_ascii=False) + "\n" for _ in self.records)
+        if n:
+            self._vectors = np.memmap(self._vector_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        self._alive = np.ones(n, dtype=bool)
+        if os.path.exists(self._dead_path):
+            with open(self._dead_path, encoding="utf-8") as f:
+                for line in f:
+                    # 写了一半的行和截断后不存在的行号忽略
+                    if line.strip().isdigit() and int(line) < n:
+                        self._alive[int(line)] = False
+
+    def __len__(self) -> int:
+        self._load()
+        return int(self._alive.sum())
+
+    def alive_records(self) -> list[dict]:
+        """未删除的记录"""
+        self._load()
+        return [r for r, alive in zip(self.records, self._alive) if alive]
+
+    def add(self, vectors: np.ndarray, records: list[dict]) -> None:
+        """追加向量及其记录，落盘时只写入新增部分"""
+        self._load()
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(records):
+            raise ValueError("向量数与记录数不一致")
+        if not len(vectors):
+            return
+
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # 先写向量再写记录，加载时以两者中较短的为准
+            with open(self._vector_path, "ab") as f:
+                vectors.tofile(f)
+            with open(self._record_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(_, ensure_ascii=False) + "\n" for _ in records)
+            n = len(self.records) + len(records)
+            self._vectors = np.memmap(self._vector_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        else:
+            self._vectors = np.concatenate([self._vectors, vectors])
+        self.records.extend(records)
+        self._alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+
+    def search(self, query: np.ndarray, k: int = 5, start: int = 0) -> list[tuple[dict, float]]:
+        """返回相似度最高的 ``k`` 条 (记录, 相似度)，按相似度降序
+
+        ``start`` 大于 0 时只在第 ``start`` 条之后新增的记录中检索，用于增量更新已缓存的检索结果。
+        """
+        self._load()
+        if len(self.records) <= start:
+            return []
+        scores = np.asarray(self._vectors[start:] @ np.asarray(query, dtype=np.float32).reshape(self.dim))
+        alive = self._alive[start:]
+        scores = np.where(alive, scores, -np.inf)
+        k = min(k, int(alive.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.records[start + i], float(scores[i])) for i in top]
+
+    def remove(self, predicate: Callable[[dict], bool]) -> int:
+        """标记删除满足条件的记录并持久化删除标记，返回删除条数"""
+        self._load()
+        removed = []
+        for i, record in enumerate(self.records):
+            if self._alive[i] and predicate(record):
+                self._alive[i] = False
+                removed.append(i)
+        if removed and self.path:
+            with open(self._dead_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{i}\n" for i in removed)
+        return len(removed)
+
+    def compact(self) -> None:
+        """重写文件，移除已标记删除的记录"""
+        self._load()
+        keep = np.flatnonzero(self._alive)
+        if len(keep) == len(self.records):
+            return
+        vectors = np.array(self._vectors[keep], dtype=np.float32)
+        records = [self.records[i] for i in keep]
+        if self.path:
+            with open(self._vector_path + ".tmp", "wb") as f:
+                vectors.tofile(f)
+            with open(self._record_path + ".tmp", "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(_, ensure_ascii=False) + "\n" for _ in records)
+            # 两个新文件都写完后才创建标记，之后任何时刻崩溃，加载时都会把替换做完
+            open(self._compact_path, "w").close()
+            self._finish_compact()
+            if records:
+                vectors = np.memmap(self._vector_path, dtype=np.float32, mode="r", shape=(len(records), self.dim))
+        self._vectors = vectors
+        self.records = records
+        self._alive = np.ones(len(records), dtype=bool)
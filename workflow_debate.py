@@ -1,23 +1,23 @@
-from ast import arguments
 from agentscope.agent import ReActAgent
 from agentscope.formatter import DashScopeMultiAgentFormatter
 from agentscope.message import Msg, TextBlock
-from agentscope.model import DashScopeChatModel
 from agentscope.formatter import DashScopeMultiAgentFormatter, DashScopeChatFormatter
 from agentscope.memory import InMemoryMemory, MemoryBase
-from agentscope.tool import ToolResponse
-from agentscope.pipeline import sequential_pipeline
+from agentscope.tool import Toolkit, ToolResponse
+
+from model_router import ModelRouter
+from formatter_cache import CachedDashScopeMultiAgentFormatter
+from structured import generate_structured
+from semantic_cache import SemanticCache
+from agent_rag import knowledge_base, retrieve_knowledge
+from turn_scheduler import HostScript, TurnScheduler
+from free_debate import FreeDebateEngine
+from transcript import Transcript, TranscriptView
+from checkpoint import Checkpoint, dump_msg, load_msg, load_memory_states, memory_states
+import metrics
 
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-import os, asyncio, json
-
-load_dotenv()
-_dashscope_api_key_temp = os.getenv("DASHSCOPE_API_KEY")
-if not _dashscope_api_key_temp:
-    raise ValueError("请检查DASHSCOPE_API_KEY环境变量是否设置正确")
-# 确保类型安全，此时已经验证不为None
-_dashscope_api_key: str = _dashscope_api_key_temp
+import asyncio, json
 
 class DebateConfig:
     """辩论智能体配置类
@@ -28,12 +28,60 @@ class DebateConfig:
     # 自由辩论轮数
     DEBATE_ROUNDS = 4
 
-    # 模型配置
-    HOST_MODEL = "qwen-plus"
+    # 模型配置：主持人只负责宣布流程，用快速的小模型；评委保持强模型
+    HOST_MODEL = "qwen-turbo"
     JUDGE_MODEL = "qwen-plus-latest"
     TEACHER_MODEL = "qwen-plus"
     DEBATER_MODEL = "qwen-plus-latest"
+    SUMMARY_MODEL = "qwen-turbo"
+
+    # 模型路由（见 model_router.py）：按 角色 / 角色/环节 选择模型、思考模式和最大输出 token 数，
+    # 被限流或超时时依次换用 fallback 中更便宜的模型；MODEL_ROUTES 指向的配置文件可以覆盖
+    ROUTES = {
+        "host": {"model": HOST_MODEL, "fallback": ["qwen-flash"], "enable_thinking": False, "max_tokens": 300},
+        # 立场提取决定整场辩论的方向，用更强的模型
+        "host/立场提取": {"model": "qwen-plus", "fallback": ["qwen-turbo"], "max_tokens": 800},
+        "teacher": {"model": TEACHER_MODEL, "fallback": ["qwen-turbo"], "enable_thinking": True, "max_tokens": 2000},
+        "debater": {"model": DEBATER_MODEL, "fallback": ["qwen-plus", "qwen-turbo"], "enable_thinking": False, "max_tokens": 1000},
+        # 自由辩论每次发言不超过200字
+        "debater/自由辩论": {"max_tokens": 400},
+        "judge": {"model": JUDGE_MODEL, "fallback": ["qwen-plus"], "enable_thinking": True, "max_tokens": 2000},
+        # 评委始终开启思考（不走结构化快速通道），评分结果只是简短的 JSON
+        "judge/评委评分": {"max_tokens": 1000},
+        "summary": {"model": SUMMARY_MODEL, "fallback": ["qwen-flash"], "enable_thinking": False, "max_tokens": 500},
+    }
+
+    # 并行准备：教练分别为正反方并发生成建议，辩手在各自建议就绪后立即创建
+    PARALLEL_PREP = True
+
+    # 增量评分：评委在每个环节结束后于后台打分，最终结果由各环节得分汇总得出
+    INCREMENTAL_JUDGE = True
+
+    # 结构化快速通道：立场提取、教练建议、评委打分直接用一次非流式 JSON 调用完成，不走 ReAct 循环
+    STRUCTURED_FAST_PATH = True
+
+    # 评委是否也走结构化快速通道：JSON 模式不能开启思考，默认关闭，评委仍以思考模式评分
+    STRUCTURED_FAST_PATH_JUDGE = False
+
+    # 准备阶段语义缓存：相同的辩题（使用向量模型时也包括否定词一致的近似说法）复用之前的双方立场和教练建议，
+    # 直接进入立论；默认关闭
+    SEMANTIC_CACHE = False
+
+    # 知识库非空时为辩手注册本地检索工具，便于引用真实数据
+    DEBATER_RAG = True
+
+    # 发言调度：主持人串场词在本地按模板生成，发言完成后立即转发，并为下一位发言者预热上下文
+    LOCAL_HOST = True
+
+    # 自由辩论滚动上下文：每次发言只带入立论、攻辩的记忆 + 交锋要点摘要 + 最近几轮发言，提示词大小不随轮数增长
+    ROLLING_CONTEXT = True
+
+    # 共享记录：主持人、辩手、评委的记忆都是同一份只追加记录上的视图，每条发言只存一次，评委交接不复制记忆
+    SHARED_TRANSCRIPT = True
     
+# 辩论各角色共享的模型路由表
+debate_router = ModelRouter("debate", DebateConfig.ROUTES)
+
 class TemplateGetPOVs(BaseModel):
     """获取正反两方的POVs"""
 
@@ -54,6 +102,29 @@ class TemplateTeacherSuggestion(BaseModel):
         description="给反方辩手的建议，包含：【核心论证维度】、【关键论点】、【表达建议】和【可能出现的核心交锋点以及攻防建议】",
         )
 
+class TemplateSideSuggestion(BaseModel):
+    """指导老师给单方辩手的建议（并行准备模式）"""
+
+    suggestion: str= Field(
+        description="给本方辩手的建议，包含：【核心论证维度】、【关键论点】、【表达建议】和【可能出现的核心交锋点以及攻防建议】",
+        )
+
+class TemplateRoundScore(BaseModel):
+    """评委对单个环节的评分（增量评分模式）"""
+
+    scores_positive: list[float] = Field(
+        description="正方本环节在【立论清晰度、论据质量与充分性、反驳精准度与有效性、语言表达与逻辑连贯性】四个维度的得分，按顺序给出4个0-10的分数",
+        )
+    scores_negative: list[float] = Field(
+        description="反方本环节在【立论清晰度、论据质量与充分性、反驳精准度与有效性、语言表达与逻辑连贯性】四个维度的得分，按顺序给出4个0-10的分数",
+        )
+    points_positive: str = Field(
+        description="正方本环节最有说服力的论点，一句话概括",
+        )
+    points_negative: str = Field(
+        description="反方本环节最有说服力的论点，一句话概括",
+        )
+
 class TemplateDebateRusult(BaseModel):
     """辩论结果"""
 
@@ -84,40 +155,36 @@ class AgentFactory:
         return ReActAgent(
             name="主持人",
             sys_prompt=self._get_host_prompt(),
-            model=DashScopeChatModel(
-                model_name=DebateConfig.HOST_MODEL,
-                api_key=_dashscope_api_key,
-                stream=True,
-                enable_thinking=False,
-            ),
-            formatter=DashScopeMultiAgentFormatter(),
-            memory=InMemoryMemory(),
+            model=debate_router.model("host", stream=True),
+            formatter=CachedDashScopeMultiAgentFormatter(),
+            memory=self._memory("主持人"),
         )
 
     def create_agent_judge(self):
         return ReActAgent(
             name="评委",
             sys_prompt=self._get_judge_prompt(),
-            model=DashScopeChatModel(
-                model_name=DebateConfig.JUDGE_MODEL,
-                api_key=_dashscope_api_key,
-                stream=True,
-                enable_thinking=True,
-            ),
-            formatter=DashScopeMultiAgentFormatter(),
+            model=debate_router.model("judge", stream=True),
+            formatter=CachedDashScopeMultiAgentFormatter(),
+            memory=self._memory("评委"),
+        )
+
+    def create_agent_judge_round(self):
+        """创建只为单个环节打分的评委，每个环节一个，上下文只包含该环节的发言"""
+        return ReActAgent(
+            name="评委",
+            sys_prompt=self._get_judge_round_prompt(),
+            model=debate_router.model("judge", stream=True),
+            formatter=DashScopeChatFormatter(),
             memory=InMemoryMemory(),
         )
 
-    def create_agent_teacher(self):
+    def create_agent_teacher(self, side: str | None = None):
+        """创建辩论教练，指定 ``side``（"正方"/"反方"）时只为该方提供建议"""
         return ReActAgent(
-            name="辩论教练",
-            sys_prompt=self._get_teacher_prompt(),
-            model=DashScopeChatModel(
-                model_name=DebateConfig.TEACHER_MODEL,
-                api_key=_dashscope_api_key,
-                stream=True,
-                enable_thinking=True,
-            ),
+            name="辩论教练" if side is None else f"辩论教练（{side}）",
+            sys_prompt=self._get_teacher_prompt() if side is None else self._get_teacher_prompt_for_side(side),
+            model=debate_router.model("teacher", stream=True),
             formatter=DashScopeChatFormatter(),
             memory=InMemoryMemory(),
         )
@@ -126,30 +193,36 @@ class AgentFactory:
         return ReActAgent(
             name="正方辩手",
             sys_prompt=self._get_debater_prompt_positive(),
-            model=DashScopeChatModel(
-                model_name=DebateConfig.DEBATER_MODEL,
-                api_key=_dashscope_api_key,
-                stream=True,
-                enable_thinking=False,
-            ),
-            formatter=DashScopeMultiAgentFormatter(),
-            memory=InMemoryMemory(),
+            model=debate_router.model("debater", stream=True),
+            formatter=CachedDashScopeMultiAgentFormatter(),
+            memory=self._memory("正方辩手", join=True),
+            toolkit=self._debater_toolkit(),
         )
 
     def create_agent_debater_negative(self) -> ReActAgent:
         return ReActAgent(
             name="反方辩手",
             sys_prompt=self._get_debater_prompt_negative(),
-            model=DashScopeChatModel(
-                model_name=DebateConfig.DEBATER_MODEL,
-                api_key=_dashscope_api_key,
-                stream=True,
-                enable_thinking=False,
-            ),
+            model=debate_router.model("debater", stream=True),
             formatter=DashScopeChatFormatter(),
-            memory=InMemoryMemory(),
+            memory=self._memory("反方辩手", join=True),
+            toolkit=self._debater_toolkit(),
         )
 
+    def _memory(self, name: str, join: bool = False) -> MemoryBase:
+        """开启共享记录时返回 ``name`` 在其上的视图，``join`` 为真时只看此后的消息（准备阶段之后入场的辩手）"""
+        if self.transcript is None:
+            return InMemoryMemory()
+        return self.transcript.view(name, since=len(self.transcript) if join else 0)
+
+    def _debater_toolkit(self) -> Toolkit | None:
+        """知识库有内容时为辩手提供本地检索工具"""
+        if not DebateConfig.DEBATER_RAG or not len(knowledge_base):
+            return None
+        tk = Toolkit()
+        tk.register_tool_function(retrieve_knowledge)
+        return tk
+
     # 智能体配置
     debate_subject: str=""
     pov_positive: str=""
@@ -157,10 +230,26 @@ class AgentFactory:
     suggestion_positive: str=""
     suggestion_negative: str=""
 
+    # 本场辩论的共享记录，为空时各智能体使用独立的 InMemoryMemory
+    transcript: Transcript | None = None
+
+    STATE_FIELDS = ["debate_subject", "pov_positive", "pov_negative", "suggestion_positive", "suggestion_negative"]
+
+    def state_dict(self) -> dict:
+        """导出辩题、双方立场和教练建议，用于断点续跑"""
+        return {_: getattr(self, _) for _ in self.STATE_FIELDS}
+
+    def load_state_dict(self, state: dict) -> None:
+        for name in self.STATE_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+
+    # 系统提示词：固定的角色与流程说明在前，本场信息（辩题、立场、教练建议）统一放在末尾，
+    # 不同场次、不同轮次的请求共享尽可能长的相同前缀，便于命中 DashScope 的上下文缓存
     def _get_host_prompt(self) -> str:
         """获取主持人智能体的系统提示词。"""
         return f"""
-        你是一名专业、中立且具备丰富辩论经验的主持人，负责主持一场关于 **"{self.debate_subject}"** 的正式AI辩论赛。
+        你是一名专业、中立且具备丰富辩论经验的主持人，负责主持一场正式AI辩论赛，辩题见文末的【本场辩论信息】。
 
         本场辩论共有四个角色：
         - 主持人（你）
@@ -176,7 +265,7 @@ class AgentFactory:
         ### 【辩论流程指令】
 
         1. **开场与立场分配**
-        - 首先，清晰宣布辩论题目：“本次辩论的题目是：{self.debate_subject}。”
+        - 首先，清晰宣布辩论题目：“本次辩论的题目是：<辩题>。”
         - 为双方分配明确且对立的立场（无需解释原因）
 
         2. **邀请辩论教练提供建议**
@@ -215,8 +304,13 @@ class AgentFactory:
         ---
 
         **示例开场语：**
-        “各位好，欢迎来到本场辩论。本次辩论的题目是：{self.debate_subject}。
+        “各位好，欢迎来到本场辩论。本次辩论的题目是：<辩题>。
         现在请辩论教练为双方辩手提供准备建议。”
+
+        ---
+
+        ### 【本场辩论信息】
+        辩题：{self.debate_subject}
         """
 
     def _get_judge_prompt(self) -> str:
@@ -224,7 +318,6 @@ class AgentFactory:
         return f"""
         你是一位专业、中立的辩论赛评委智能体，具备深度语义理解、逻辑推理与多维度评估能力。
         你的任务是：在一场由两个AI辩手参与的标准辩论对战结束后，全面分析双方发言内容，从以下四个客观维度进行公正评分（每项满分10分，总分40分），并据此判定胜者。
-        本次辩论的题目为：“{self.debate_subject}”
 
         评分维度如下：
 
@@ -247,16 +340,44 @@ class AgentFactory:
         - 评判基于内容本身，不考虑语气、情感或表演性因素。  
         - 所有判断必须紧扣发言内容，避免主观臆断。  
         - 语言简洁、专业、条理清晰。
+
+        ---
+
+        ### 【本场辩论信息】
+        辩题：{self.debate_subject}
+        """
+
+    def _get_judge_round_prompt(self) -> str:
+        """获取环节评委智能体的系统提示词（增量评分模式）。"""
+        return f"""
+        你是一位专业、中立的辩论赛评委智能体，辩题与双方立场见文末的【本场辩论信息】。
+
+        辩论进行中，你每次只会收到一个环节的发言记录，请仅根据该环节的发言，为正反双方在以下四个维度上分别评分（每项0-10分）：
+
+        1. **立论清晰度**：立场是否明确，论证结构是否完整，核心观点是否条理清晰。
+        2. **论据质量与充分性**：事实、数据、案例或逻辑推理是否可靠、相关且有力。
+        3. **反驳精准度与有效性**：是否准确识别并有效驳斥对方论点中的漏洞。
+        4. **语言表达与逻辑连贯性**：语言是否准确严谨，推理是否无矛盾、无跳跃。
+
+        并分别用一句话概括双方本环节最有说服力的论点。
+
+        要求：
+        - 评判基于内容本身，不考虑语气、情感或表演性因素；
+        - 本环节未发言的一方，各维度按0分计；
+        - 语言简洁、专业。
+
+        ---
+
+        ### 【本场辩论信息】
+        辩题：{self.debate_subject}
+        正方立场：{self.pov_positive}
+        反方立场：{self.pov_negative}
         """
 
     def _get_teacher_prompt(self) -> str:
         """获取辩论教练智能体的系统提示词。"""
         return f"""
-        你是一位资深辩论教练，擅长逻辑分析、论点构建和策略指导。现在有一场正式辩论即将开始，你需要根据给定的辩题，为正方和反方辩手分别提供专业的辩论指导。
-
-        #辩论题目
-        辩论主题：{self.debate_subject}
-        官方给出的正方立场是：{self.pov_positive}，反方立场是：{self.pov_negative}
+        你是一位资深辩论教练，擅长逻辑分析、论点构建和策略指导。现在有一场正式辩论即将开始，你需要根据文末给定的辩题，为正方和反方辩手分别提供专业的辩论指导。
 
         请你完成以下任务：
         1. **为正方提供辩论策略指导**
@@ -298,22 +419,57 @@ class AgentFactory:
         交锋点2：……
         建议：……
         ……'''
+
+        #辩论题目
+        辩论主题：{self.debate_subject}
+        官方给出的正方立场是：{self.pov_positive}，反方立场是：{self.pov_negative}
         """
     
-    def _get_debater_prompt_positive(self) -> str:
-        """获取正方辩手智能体的系统提示词。"""
+    def _get_teacher_prompt_for_side(self, side: str) -> str:
+        """获取只为一方辩手提供建议的辩论教练系统提示词（并行准备模式）。"""
+        pov, pov_opponent = (
+            (self.pov_positive, self.pov_negative)
+            if side == "正方"
+            else (self.pov_negative, self.pov_positive)
+        )
         return f"""
-        你是一名逻辑严谨、富有说服力的辩论专家，作为正方参与本次辩论。
+        你是一位资深辩论教练，擅长逻辑分析、论点构建和策略指导。现在有一场正式辩论即将开始，你只负责为**{side}**辩手提供专业的辩论指导。
 
-        【辩题】
-        {self.debate_subject}
+        请你完成以下任务：
+        1. 【核心论证维度】：列出3–5个{side}可重点展开的价值、原则或事实维度（如效率、公平性、可行性、长期影响等）；
+        2. 【关键论点】：提供3–5条具体、有说服力的论点，要求结合事实依据、统计数据、典型案例或逻辑推理，避免空泛陈述；
+        3. 【表达建议】：建议适合{side}的发言风格（如理性论证 / 情感共鸣 / 制度批判），并提示可引用的权威来源类型；
+        4. 【可能出现的核心交锋点以及攻防建议】：列出2–3个最可能成为辩论焦点的争议点，预判对方的质疑，给出{side}的辩护与反击方式，以及建议使用的论证方式（类比、归谬、数据反驳等）。
 
-        【你的立场】
-        {self.pov_positive}
+        【输出要求】
+        - 所有论点必须基于事实或合理推论，禁止虚构数据；
+        - 语言简洁专业，适合直接传递给AI辩手作为策略输入。
+        - 结构化输出，格式如下:'''
+        ##核心论证纬度
+        纬度1、纬度2、纬度3、纬度4……
 
-        【辩论教练的建议】
-        辩论教练给出的参考建议如下：
-        {self.suggestion_positive}
+        ##关键论点
+        论点1：……
+        论点2：……
+        ……
+
+        ##表达建议
+        ……
+
+        ##可能出现的核心交锋点以及攻防建议
+        交锋点1：……
+        建议：……
+        ……'''
+
+        #辩论题目
+        辩论主题：{self.debate_subject}
+        {side}的立场是：{pov}，对方的立场是：{pov_opponent}
+        """
+
+    def _get_debater_prompt_positive(self) -> str:
+        """获取正方辩手智能体的系统提示词。"""
+        return f"""
+        你是一名逻辑严谨、富有说服力的辩论专家，作为正方参与本次辩论。
 
         【辩论流程】
         1. 一共进行4轮辩论，第一轮双方立论，以“总-分”形式表明各自的立场和主要观点，从正方开始；
@@ -328,22 +484,22 @@ class AgentFactory:
         3. 引用真实数据、评测结果或实际应用场景支撑论点；
         4. 精准回应反方质疑，体现交锋性；
         5. 辩论流程和秩序由主持人负责，不要在发言中谈及辩论流程。
-        """
-
-    def _get_debater_prompt_negative(self) -> str:
-        """获取反方辩手智能体的系统提示词。"""
-        return f"""
-        你是一名批判性强、思维敏捷的辩论专家，作为反方参与本次辩论。
 
         【辩题】
         {self.debate_subject}
 
         【你的立场】
-        {self.pov_negative}
+        {self.pov_positive}
 
         【辩论教练的建议】
         辩论教练给出的参考建议如下：
-        {self.suggestion_negative}
+        {self.suggestion_positive}
+        """
+
+    def _get_debater_prompt_negative(self) -> str:
+        """获取反方辩手智能体的系统提示词。"""
+        return f"""
+        你是一名批判性强、思维敏捷的辩论专家，作为反方参与本次辩论。
 
         【辩论流程】
         1. 一共进行4轮辩论，第一轮双方立论，以“总-分”形式表明各自的立场和主要观点，从正方开始；
@@ -358,16 +514,226 @@ class AgentFactory:
         3. 结合权威评测、技术特性或用户实践提供反证；
         4. 回应时紧扣对方逻辑漏洞，避免泛泛而谈；
         5. 辩论流程和秩序由主持人负责，不要在发言中谈及辩论流程。
+
+        【辩题】
+        {self.debate_subject}
+
+        【你的立场】
+        {self.pov_negative}
+
+        【辩论教练的建议】
+        辩论教练给出的参考建议如下：
+        {self.suggestion_negative}
         """
 
+class JudgeLedger:
+    """增量评分账本
+
+    每个环节结束后在后台交给一个新的环节评委打分，只保留紧凑的分数和要点，
+    辩论结束时由账本直接汇总出最终结果，不再把完整辩论记录交给评委。
+    """
+
+    DIMENSIONS = ["立论清晰度", "论据质量与充分性", "反驳精准度与有效性", "语言表达与逻辑连贯性"]
+
+    def __init__(self, factory: AgentFactory) -> None:
+        self.factory = factory
+        self.ledger: list[dict] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def score_round(self, phase: str, msgs: list[Msg]) -> None:
+        """登记一个环节，并在后台开始评分"""
+        entry: dict = {
+            "phase": phase,
+            "transcript": "\n\n".join(f"{m.name}：{m.get_text_content()}" for m in msgs),
+        }
+        self.ledger.append(entry)
+        self._tasks.append(asyncio.create_task(self._score(entry)))
+
+    def state_dict(self) -> list[dict]:
+        """导出账本（含已完成的评分和各环节发言），用于断点续跑"""
+        return [dict(_) for _ in self.ledger]
+
+    def load_state_dict(self, state: list[dict]) -> None:
+        """恢复账本，尚未评分或评分失败的环节重新在后台评分"""
+        for entry in state:
+            entry = dict(entry)
+            self.ledger.append(entry)
+            if "scores_positive" not in entry:
+                self._tasks.append(asyncio.create_task(self._score(entry)))
+
+    async def _score(self, entry: dict) -> None:
+        content = f"【{entry['phase']}】\n{entry['transcript']}"
+        with metrics.phase("评委评分"):
+            if DebateConfig.STRUCTURED_FAST_PATH and DebateConfig.STRUCTURED_FAST_PATH_JUDGE:
+                metadata = (await generate_structured(
+                    debate_router.model("judge", stream=False, enable_thinking=False),
+                    self.factory._get_judge_round_prompt(),
+                    content,
+                    TemplateRoundScore,
+                )).model_dump()
+            else:
+                judge = self.factory.create_agent_judge_round()
+                res = await judge(
+                    Msg(name="小元", content=content, role="user"),
+                    structured_model=TemplateRoundScore,
+                )
+                metadata = res.metadata or {}
+        for side in ["positive", "negative"]:
+            scores = [float(_) for _ in metadata.get(f"scores_{side}", [])][:4]
+            entry[f"scores_{side}"] = scores + [0.0] * (4 - len(scores))
+            entry[f"points_{side}"] = str(metadata.get(f"points_{side}", ""))
+
+    async def verdict(self) -> TemplateDebateRusult:
+        """等待所有环节评分完成，并汇总出最终结果"""
+        # 个别环节评分失败时跳过该环节，不影响整场结果
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        scored = [e for e in self.ledger if "scores_positive" in e]
+        if not scored:
+            raise RuntimeError("所有环节评分均失败，无法给出辩论结果")
+
+        # 各维度取所有环节的平均分，总分满分40分
+        avg = {
+            side: [
+                round(sum(e[f"scores_{side}"][i] for e in scored) / len(scored), 1)
+                for i in range(4)
+            ]
+            for side in ["positive", "negative"]
+        }
+        total = {side: round(sum(avg[side]), 1) for side in avg}
+
+        scores = "\n".join(
+            f"{name}：正方 {avg['positive'][i]}，反方 {avg['negative'][i]}"
+            for i, name in enumerate(self.DIMENSIONS)
+        ) + f"\n总分：正方 {total['positive']}，反方 {total['negative']}"
+
+        if total["positive"] == total["negative"]:
+            return TemplateDebateRusult(
+                scores=scores,
+                winner="表现相当，难分胜负",
+                pov_winner="",
+                key_arguments="",
+                score_details="双方总分相同",
+            )
+
+        side, other = (
+            ("positive", "negative")
+            if total["positive"] > total["negative"]
+            else ("negative", "positive")
+        )
+        leads = [
+            f"{name}领先{round(avg[side][i] - avg[other][i], 1)}分"
+            for i, name in enumerate(self.DIMENSIONS)
+            if avg[side][i] > avg[other][i]
+        ]
+        return TemplateDebateRusult(
+            scores=scores,
+            winner="正方" if side == "positive" else "反方",
+            pov_winner=self.factory.pov_positive if side == "positive" else self.factory.pov_negative,
+            key_arguments="\n".join(
+                f"【{e['phase']}】{e[f'points_{side}']}" for e in scored if e[f"points_{side}"]
+            ),
+            score_details="；".join(leads),
+        )
+
+
+# 辩题 -> AgentFactory.state_dict()（双方立场与教练建议）
+prep_cache = SemanticCache("debate_prep")
+
+
+def _structured_msg(name: str, result: BaseModel) -> Msg:
+    """把快速通道的结构化结果包装成与 ReAct 路径相同形式的消息（内容为 JSON，结果放在 metadata）"""
+    return Msg(
+        name=name,
+        content=json.dumps(result.model_dump(), ensure_ascii=False, indent=4),
+        role="assistant",
+        metadata=result.model_dump(),
+    )
+
+
+async def _run_phase(
+    agents: list[ReActAgent],
+    msg: Msg | None,
+    phase: str,
+    ledger: JudgeLedger | None = None,
+) -> Msg:
+    """依次执行一个辩论环节（同 sequential_pipeline），并将辩手发言交给评分账本"""
+    speeches = []
+    with metrics.phase(phase):
+        for agent in agents:
+            msg = await agent(msg)
+            if agent.name != "主持人":
+                speeches.append(msg)
+    if ledger is not None:
+        ledger.score_round(phase, speeches)
+    return msg
+
+async def _run_script(
+    scheduler: TurnScheduler,
+    steps: list[str | ReActAgent],
+    phase: str,
+    ledger: JudgeLedger | None = None,
+) -> Msg | None:
+    """由发言调度器执行一个辩论环节，并将辩手发言交给评分账本"""
+    with metrics.phase(phase):
+        msg, speeches = await scheduler.run(steps)
+    if ledger is not None and speeches:
+        ledger.score_round(phase, speeches)
+    return msg
+
+async def _run_free_round(
+    engine: FreeDebateEngine,
+    phase: str,
+    ledger: JudgeLedger | None = None,
+) -> Msg:
+    """由自由辩论引擎执行一轮交锋，并将辩手发言交给评分账本"""
+    with metrics.phase(phase):
+        speeches = await engine.run_round()
+    if ledger is not None:
+        ledger.score_round(phase, speeches)
+    return speeches[-1]
+
+async def _prepare_debater(factory: AgentFactory, side: str, msg: Msg) -> ReActAgent:
+    """并行准备模式：教练为一方生成建议，随后立即创建该方辩手
+
+    Args:
+        factory (``AgentFactory``):
+            已填好辩题和双方立场的智能体工厂
+        side (``str``):
+            "正方" 或 "反方"
+        msg (``Msg``):
+            主持人提取立场后的消息
+    """
+    with metrics.phase("教练建议"):
+        if DebateConfig.STRUCTURED_FAST_PATH:
+            metadata = (await generate_structured(
+                debate_router.model("teacher", stream=False, enable_thinking=False),
+                factory._get_teacher_prompt_for_side(side),
+                msg.get_text_content() or "",
+                TemplateSideSuggestion,
+            )).model_dump()
+        else:
+            teacher = factory.create_agent_teacher(side)
+            metadata = (await teacher(msg, structured_model=TemplateSideSuggestion)).metadata or {}
+
+    print(json.dumps(metadata, indent=4, ensure_ascii=False))
+    suggestion = str(metadata.get("suggestion", ""))
+    if side == "正方":
+        factory.suggestion_positive = suggestion
+        return factory.create_agent_debater_positive()
+    factory.suggestion_negative = suggestion
+    return factory.create_agent_debater_negative()
+
 async def start_debate(
     debate_subject: str,
+    run_id: str | None = None,
 ) -> ToolResponse:
     """开始一场辩论
     
     Args:
         debate_subject (``str``):
             辩论的主题
+        run_id (``str | None``):
+            运行编号，传入上次中断时打印的编号可以从断点继续，为空时开始新的运行
     """
 
     # # 引导词
@@ -379,33 +745,150 @@ async def start_debate(
 
     msg = None
 
+    # 每个环节结束后保存断点，传入同一运行编号重新运行时从最后完成的环节继续
+    checkpoint = Checkpoint("debate", debate_subject, run_id)
+    resumed = checkpoint.resumed
+    if checkpoint.path and not resumed:
+        print(f"运行编号：{checkpoint.run_id}（中断后传入该编号可从断点继续）")
+
     # 创建辩论需要的所有智能体，包括1个主持人、1个指导老师、2位辩手
     factory = AgentFactory()
+    factory.load_state_dict(checkpoint.get("factory", {}))
+    if DebateConfig.SHARED_TRANSCRIPT:
+        factory.transcript = Transcript()
+        factory.transcript.load_state_dict(checkpoint.get("transcript") or {})
+
+    def transcript_state() -> dict | None:
+        return factory.transcript.state_dict() if factory.transcript is not None else None
 
     # 主持人分析辩论主题并提取正反双方的主观点
     factory.debate_subject = debate_subject
     host = factory.create_agent_host()
+    if DebateConfig.PARALLEL_PREP:
+        # 评委只依赖辩题，提前入场
+        judge = factory.create_agent_judge()
+
+    prep_cached = False
+    if DebateConfig.SEMANTIC_CACHE and not checkpoint.done("立场提取"):
+        hit = await prep_cache.lookup(debate_subject)
+        if hit is not None:
+            prep, score = hit
+            print(f"复用近似辩题“{prep['debate_subject']}”的立场与教练建议（相似度 {score:.3f}）")
+            factory.load_state_dict(prep)
+            factory.debate_subject = debate_subject
+            msg = _structured_msg(
+                "主持人",
+                TemplateGetPOVs(pov_positive=factory.pov_positive, pov_negative=factory.pov_negative),
+            )
+            await host.memory.add(msg)
+            checkpoint.save(
+                "立场提取",
+                factory=factory.state_dict(),
+                memories=memory_states({"host": host}),
+                transcript=transcript_state(),
+                msg=dump_msg(msg),
+            )
+            prep_cached = True
+
+    if not checkpoint.done("立场提取"):
+        with metrics.phase("立场提取"):
+            if DebateConfig.STRUCTURED_FAST_PATH:
+                povs = await generate_structured(
+                    debate_router.model("host", stream=False, enable_thinking=False),
+                    factory._get_host_prompt(),
+                    "请根据辩题提取正反双方的立场观点。",
+                    TemplateGetPOVs,
+                )
+                msg = _structured_msg("主持人", povs)
+                # 与 ReAct 路径一致，把结果记入主持人的记忆
+                await host.memory.add(msg)
+            else:
+                msg = await host(msg, structured_model=TemplateGetPOVs)
+
+        print(json.dumps(msg.metadata, indent=4, ensure_ascii=False))
+        factory.pov_positive = str((msg.metadata or {}).get("pov_positive", ""))
+        factory.pov_negative = str((msg.metadata or {}).get("pov_negative", ""))
+        checkpoint.save(
+            "立场提取",
+            factory=factory.state_dict(),
+            memories=memory_states({"host": host}),
+            transcript=transcript_state(),
+            msg=dump_msg(msg),
+        )
+    else:
+        load_memory_states({"host": host}, checkpoint.get("memories", {}))
+        msg = load_msg(checkpoint.get("msg"))
+
+    if checkpoint.done("教练建议") or prep_cached:
+        # 立场和建议已恢复到工厂中，直接创建双方辩手
+        if not DebateConfig.PARALLEL_PREP:
+            judge = factory.create_agent_judge()
+        debater_positive = factory.create_agent_debater_positive()
+        debater_nagative = factory.create_agent_debater_negative()
+    elif DebateConfig.PARALLEL_PREP:
+        # 教练分别为正反方并发生成建议，每方辩手在本方建议就绪后立即入场
+        debater_positive, debater_nagative = await asyncio.gather(
+            _prepare_debater(factory, "正方", msg),
+            _prepare_debater(factory, "反方", msg),
+        )
+    else:
+        # 指导老师为双方辩手分析各自的主观点以及可供参考的主要论点
+        with metrics.phase("教练建议"):
+            if DebateConfig.STRUCTURED_FAST_PATH:
+                msg = _structured_msg("辩论教练", await generate_structured(
+                    debate_router.model("teacher", stream=False, enable_thinking=False),
+                    factory._get_teacher_prompt(),
+                    msg.get_text_content() or "",
+                    TemplateTeacherSuggestion,
+                ))
+            else:
+                teacher = factory.create_agent_teacher()
+                msg = await teacher(msg, structured_model=TemplateTeacherSuggestion)
+
+        print(json.dumps(msg.metadata, indent=4, ensure_ascii=False))
+        factory.suggestion_positive = str((msg.metadata or {}).get("suggestion_positive", ""))
+        factory.suggestion_negative = str((msg.metadata or {}).get("suggestion_negative", ""))
+
+        # 双方辩手入场
+        judge = factory.create_agent_judge()
+        debater_positive = factory.create_agent_debater_positive()
+        debater_nagative = factory.create_agent_debater_negative()
+
+    agents = {"host": host, "debater_positive": debater_positive, "debater_negative": debater_nagative}
+    if checkpoint.done("教练建议"):
+        load_memory_states(agents, checkpoint.get("memories", {}))
+        msg = load_msg(checkpoint.get("msg"))
+
+    # 增量评分账本
+    ledger = JudgeLedger(factory) if DebateConfig.INCREMENTAL_JUDGE else None
+    if ledger is not None:
+        ledger.load_state_dict(checkpoint.get("ledger") or [])
+
+    def save_checkpoint(phase: str) -> None:
+        checkpoint.save(
+            phase,
+            factory=factory.state_dict(),
+            memories=memory_states(agents),
+            transcript=transcript_state(),
+            msg=dump_msg(msg),
+            ledger=ledger.state_dict() if ledger is not None else None,
+            free_debate=engine.state_dict() if engine is not None else None,
+        )
 
-    msg = await host(msg, structured_model=TemplateGetPOVs)
-
-    print(json.dumps(msg.metadata, indent=4, ensure_ascii=False))
-    factory.pov_positive = str((msg.metadata or {}).get("pov_positive", ""))
-    factory.pov_negative = str((msg.metadata or {}).get("pov_negative", ""))
-
-    # 指导老师为双方辩手分析各自的主观点以及可供参考的主要论点
-    teacher = factory.create_agent_teacher()
-
-    msg = await teacher(msg, structured_model=TemplateTeacherSuggestion)
+    scheduler = TurnScheduler(host, [debater_positive, debater_nagative]) if DebateConfig.LOCAL_HOST else None
+    engine = FreeDebateEngine(
+        [debater_positive, debater_nagative],
+        host,
+        summary_model=debate_router.model("summary", stream=False),
+    ) if DebateConfig.ROLLING_CONTEXT else None
 
-    print(json.dumps(msg.metadata, indent=4, ensure_ascii=False))
-    factory.suggestion_positive = str((msg.metadata or {}).get("suggestion_positive", ""))
-    factory.suggestion_negative = str((msg.metadata or {}).get("suggestion_negative", ""))
+    if not checkpoint.done("教练建议"):
+        save_checkpoint("教练建议")
+        if DebateConfig.SEMANTIC_CACHE and not prep_cached:
+            await prep_cache.store_value(debate_subject, factory.state_dict())
+    if resumed:
+        print(f"从断点恢复，已完成的环节：{'、'.join(checkpoint.get('completed'))}")
 
-    # 双方辩手入场
-    judge = factory.create_agent_judge()
-    debater_positive = factory.create_agent_debater_positive()
-    debater_nagative = factory.create_agent_debater_negative()
-    
     # 正式开始辩论
     # 立论
     # print(f"辩论比赛正式开始！辩论的主题是：{debate_subject}")
@@ -421,14 +904,26 @@ async def start_debate(
     # msg = await debater_nagative(msg)
     # await judge.observe(msg)
     # Pipeline
-    msg = await sequential_pipeline(
-        agents=[host, debater_positive, host, debater_nagative],
-        msg=Msg(
-            name="小元",
-            content=f"教练陈述完毕，双方辩手准备完毕，请主持人开始本场场关于“{debate_subject}”的辩论！",
-            role="user",
-        ),
-    )
+    if not checkpoint.done("立论") and scheduler is not None:
+        msg = await _run_script(
+            scheduler,
+            [HostScript.OPENING, debater_positive, HostScript.OPENING_NEGATIVE, debater_nagative],
+            phase="立论",
+            ledger=ledger,
+        )
+        save_checkpoint("立论")
+    elif not checkpoint.done("立论"):
+        msg = await _run_phase(
+            agents=[host, debater_positive, host, debater_nagative],
+            msg=Msg(
+                name="小元",
+                content=f"教练陈述完毕，双方辩手准备完毕，请主持人开始本场场关于“{debate_subject}”的辩论！",
+                role="user",
+            ),
+            phase="立论",
+            ledger=ledger,
+        )
+        save_checkpoint("立论")
     print("\n\n")
 
     # 攻辩
@@ -449,35 +944,85 @@ async def start_debate(
     # print(f"🔵正方辩手回应：")
     # msg = await debater_positive(msg)
     # await judge.observe(msg)
-    msg = await sequential_pipeline(
-        agents=[host, debater_positive, debater_nagative, host, debater_nagative, debater_positive],
-        msg=Msg(
-            name="小元",
-            content="请开始第二轮攻辩环节！",
-            role="user",
-        ),
-    )
+    if not checkpoint.done("攻辩") and scheduler is not None:
+        msg = await _run_script(
+            scheduler,
+            [HostScript.CROSS, debater_positive, debater_nagative, HostScript.CROSS_NEGATIVE, debater_nagative, debater_positive],
+            phase="攻辩",
+            ledger=ledger,
+        )
+        save_checkpoint("攻辩")
+    elif not checkpoint.done("攻辩"):
+        msg = await _run_phase(
+            agents=[host, debater_positive, debater_nagative, host, debater_nagative, debater_positive],
+            msg=Msg(
+                name="小元",
+                content="请开始第二轮攻辩环节！",
+                role="user",
+            ),
+            phase="攻辩",
+            ledger=ledger,
+        )
+        save_checkpoint("攻辩")
     print("\n\n")
 
     # 自由辩论
     print("="*100)
-    print("🛎️ 主持人发言：")
-    msg = await host(msg)
-    for _ in range(DebateConfig.DEBATE_ROUNDS):
+    if not checkpoint.done("自由辩论"):
+        print("🛎️ 主持人发言：")
+        with metrics.phase("自由辩论"):
+            if scheduler is not None:
+                msg = await scheduler.announce(HostScript.FREE.format(rounds=DebateConfig.DEBATE_ROUNDS))
+            else:
+                msg = await host(msg)
+            if engine is not None:
+                # 之后由引擎接管发言：调度器中的待读消息（含主持人宣布）先写入辩手记忆
+                if scheduler is not None:
+                    await scheduler.flush()
+                    await engine.start()
+                else:
+                    await engine.start(msg)
+        save_checkpoint("自由辩论")
+    elif engine is not None and checkpoint.get("free_debate"):
+        engine.load_state_dict(checkpoint.get("free_debate"))
+    elif engine is not None:
+        # 断点中没有引擎状态（由关闭滚动上下文的运行保存），以恢复后的记忆为起点
+        await engine.start()
+    for i in range(DebateConfig.DEBATE_ROUNDS):
+        if checkpoint.done(f"自由辩论第{i + 1}轮"):
+            continue
+        if engine is not None:
+            msg = await _run_free_round(engine, f"自由辩论第{i + 1}轮", ledger)
+            save_checkpoint(f"自由辩论第{i + 1}轮")
+            continue
         # print(f"🔵正方发言：")
         # msg = await debater_positive(msg)
         # # await judge.observe(msg)
         # print(f"🔴反方发言：")
         # msg = await debater_nagative(msg)
         # await judge.observe(msg)
-        msg = await sequential_pipeline(
+        if scheduler is not None:
+            msg = await _run_script(
+                scheduler,
+                [debater_positive, debater_nagative],
+                phase=f"自由辩论第{i + 1}轮",
+                ledger=ledger,
+            )
+            save_checkpoint(f"自由辩论第{i + 1}轮")
+            continue
+        msg = await _run_phase(
             agents=[debater_positive, debater_nagative],
             msg=Msg(
                 name="小元",
                 content="请开始第三轮自由辩论环节！",
                 role="user",
             ),
+            phase=f"自由辩论第{i + 1}轮",
+            ledger=ledger,
         )
+        save_checkpoint(f"自由辩论第{i + 1}轮")
+    if engine is not None and not checkpoint.done("总结陈词"):
+        await engine.finish()
     print("\n\n")
     
 
@@ -496,31 +1041,76 @@ async def start_debate(
     # print(f"🔵正方总结：")
     # msg = await debater_positive(msg)
     # await judge.observe(msg)
-    msg = await sequential_pipeline(
-        agents = [host, debater_nagative, debater_positive],
-        msg=Msg(
-            name="小元",
-            content="请开始第四轮总结陈词环节！",
-            role="user",
-        ),
-    )
+    if not checkpoint.done("总结陈词") and scheduler is not None:
+        msg = await _run_script(
+            scheduler,
+            [HostScript.CLOSING, debater_nagative, debater_positive],
+            phase="总结陈词",
+            ledger=ledger,
+        )
+        save_checkpoint("总结陈词")
+    elif not checkpoint.done("总结陈词"):
+        msg = await _run_phase(
+            agents = [host, debater_nagative, debater_positive],
+            msg=Msg(
+                name="小元",
+                content="请开始第四轮总结陈词环节！",
+                role="user",
+            ),
+            phase="总结陈词",
+            ledger=ledger,
+        )
+        save_checkpoint("总结陈词")
     print("\n\n")
     
     #评委评定结果
     print("="*100)
+    if ledger is not None:
+        # 各环节已在后台评分，这里只需汇总账本
+        print("⚖️ 评委宣布结果：")
+        try:
+            with metrics.phase("评委评分"):
+                result = await ledger.verdict()
+        except Exception:
+            # 保存已完成的评分，重新运行时只补评失败的环节
+            checkpoint.save(ledger=ledger.state_dict())
+            raise
+        checkpoint.clear()
+        print(json.dumps(result.model_dump(), indent=4, ensure_ascii=False))
+        return ToolResponse(
+            content=[TextBlock(type="text", text=json.dumps(result.model_dump(), ensure_ascii=False))],
+            metadata=result.model_dump(),
+        )
+
     msg=Msg(name="小元",content="请主持人引导评委开始评分环节！",role="user",)
-    msg = await host(msg)
+    with metrics.phase("评委评分"):
+        msg = await host(msg)
     # print(await host.memory.get_memory())
     debater_history = host.memory.get_memory()
     print(debater_history)
     # judge.memory.load_state_dict(debater_history)
-    judge.memory = host.memory
+    if not isinstance(judge.memory, TranscriptView):
+        judge.memory = host.memory
     
     print("⚖️ 评委宣布结果：")
-    msg = await judge(msg, structured_model=TemplateDebateRusult)
+    with metrics.phase("评委评分"):
+        if DebateConfig.STRUCTURED_FAST_PATH and DebateConfig.STRUCTURED_FAST_PATH_JUDGE:
+            transcript = "\n\n".join(
+                f"{m.name}：{m.get_text_content()}" for m in await judge.memory.get_memory()
+            )
+            msg = _structured_msg("评委", await generate_structured(
+                debate_router.model("judge", stream=False, enable_thinking=False),
+                factory._get_judge_prompt(),
+                f"{transcript}\n\n{msg.get_text_content()}",
+                TemplateDebateRusult,
+            ))
+        else:
+            msg = await judge(msg, structured_model=TemplateDebateRusult)
+    checkpoint.clear()
 
     # 返回辩论结果
     msg_res=msg.get_content_blocks("text")[0]
     return ToolResponse(
-        content=[msg_res]
+        content=[msg_res],
+        metadata=msg.metadata,
     )